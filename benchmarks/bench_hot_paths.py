@@ -0,0 +1,226 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import RESOLUTIONS, make_page, scroll_positions  # noqa: E402
+from core.capture_backend import FakeCaptureBackend  # noqa: E402
+from core.export import ExportOptions, encode_image  # noqa: E402
+from core.frame_signature import (  # noqa: E402
+    compute_signature,
+    is_new_content,
+    scroll_delta,
+)
+from core.metrics import peak_rss_bytes  # noqa: E402
+from core.stitcher import VerticalStitcher  # noqa: E402
+
+BENCHMARKS = ("capture", "diff", "stitch", "export")
+DEFAULT_FRAMES = (10, 100, 500)
+
+
+def percentiles(samples):
+    ms = np.asarray(samples) * 1000.0
+    return {
+        "p50": float(np.percentile(ms, 50)),
+        "p90": float(np.percentile(ms, 90)),
+        "p99": float(np.percentile(ms, 99)),
+        "max": float(ms.max()),
+    }
+
+
+def _frames(resolution, count):
+    # Yields the backend scrolled to each position; frames are grabbed lazily
+    page, positions = make_page(resolution, count)
+    width, height = RESOLUTIONS[resolution]
+    backend = FakeCaptureBackend(page)
+    for y in positions:
+        backend.scroll_y = y
+        yield backend, (0, 0, width, height)
+
+
+def bench_capture(resolution, count):
+    samples = []
+    for backend, region in _frames(resolution, count):
+        start = time.perf_counter()
+        frame = backend.grab(region)
+        compute_signature(frame)
+        samples.append(time.perf_counter() - start)
+    return samples, {}
+
+
+def bench_diff(resolution, count):
+    samples = []
+    prev = None
+    for backend, region in _frames(resolution, count):
+        sig = compute_signature(backend.grab(region))
+        if prev is not None:
+            start = time.perf_counter()
+            is_new_content(prev, sig)
+            scroll_delta(prev, sig)
+            samples.append(time.perf_counter() - start)
+        prev = sig
+    return samples, {}
+
+
+def bench_stitch(resolution, count):
+    samples = []
+    stitcher = VerticalStitcher()
+    for backend, region in _frames(resolution, count):
+        frame = backend.grab(region)
+        start = time.perf_counter()
+        stitcher.add(frame)
+        samples.append(time.perf_counter() - start)
+    return samples, {"output_shape": list(stitcher.result().shape)}
+
+
+def bench_export(resolution, count, repeat=3, compression=3, out_dir=None):
+    stitcher = VerticalStitcher()
+    for backend, region in _frames(resolution, count):
+        stitcher.add(backend.grab(region))
+    final = np.ascontiguousarray(stitcher.result())
+
+    out_path = os.path.join(out_dir or ".", f"bench-{os.getpid()}.png")
+    options = ExportOptions(png_compression=compression)
+    samples = []
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            encode_image(final, out_path, options)
+            samples.append(time.perf_counter() - start)
+        size = os.path.getsize(out_path)
+    finally:
+        if os.path.exists(out_path):
+            os.remove(out_path)
+    return samples, {"output_shape": list(final.shape), "file_bytes": size}
+
+
+def run_case(name, resolution, count, export_kwargs):
+    bench = globals()[f"bench_{name}"]
+    kwargs = export_kwargs if name == "export" else {}
+    rss_before = peak_rss_bytes()
+
+    start = time.perf_counter()
+    samples, extra = bench(resolution, count, **kwargs)
+    wall = time.perf_counter() - start
+
+    width, height = RESOLUTIONS[resolution]
+    busy = sum(samples)
+    units = len(samples) if name != "export" else 1
+    pixels = width * height * (count if name != "export" else 1)
+    if name == "export":
+        pixels = int(np.prod(extra["output_shape"][:2]))
+        busy = float(np.median(samples))
+
+    result = {
+        "bench": name,
+        "resolution": resolution,
+        "frames": count,
+        "frames_per_s": units / busy if busy else None,
+        "megapixels_per_s": pixels / 1e6 / busy if busy else None,
+        "latency_ms": percentiles(samples),
+        "wall_s": wall,
+        "peak_rss_mb": peak_rss_bytes() / 2**20,
+        "start_rss_mb": rss_before / 2**20,
+    }
+    result.update(extra)
+    return result
+
+
+def estimated_output_bytes(resolution, count):
+    width, height = RESOLUTIONS[resolution]
+    positions, _ = scroll_positions(height, count)
+    return (positions[-1] + height) * width * 3
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark capture, diff, stitch and export on synthetic pages"
+    )
+    parser.add_argument("--bench", default=",".join(BENCHMARKS))
+    parser.add_argument("--resolutions", default=",".join(RESOLUTIONS))
+    parser.add_argument(
+        "--frames", default=",".join(map(str, DEFAULT_FRAMES)), help="frame counts"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="export repetitions")
+    parser.add_argument("--compression", type=int, default=3)
+    parser.add_argument(
+        "--max-output-mb",
+        type=float,
+        default=2048,
+        help="skip stitch/export cases whose output would exceed this",
+    )
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    export_kwargs = {
+        "repeat": args.repeat,
+        "compression": args.compression,
+        "out_dir": os.path.dirname(os.path.abspath(args.out)) if args.out else None,
+    }
+    cases = [
+        (name, resolution, int(count))
+        for name in args.bench.split(",")
+        for resolution in args.resolutions.split(",")
+        for count in args.frames.split(",")
+    ]
+
+    # Every case runs in a fresh process so peak RSS belongs to that case
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for name, resolution, count in cases:
+        limit = args.max_output_mb * 2**20
+        if name in ("stitch", "export") and (
+            estimated_output_bytes(resolution, count) > limit
+        ):
+            results.append(
+                {
+                    "bench": name,
+                    "resolution": resolution,
+                    "frames": count,
+                    "skipped": "output larger than --max-output-mb",
+                }
+            )
+            continue
+
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(
+                run_case, name, resolution, count, export_kwargs
+            ).result()
+        results.append(result)
+        print(
+            f"{name:8} {resolution:6} {count:4} frames: "
+            f"{result['frames_per_s']:.1f} frames/s, "
+            f"p50 {result['latency_ms']['p50']:.2f} ms",
+            file=sys.stderr,
+        )
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import numpy as np
+
+RESOLUTIONS = {
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4k": (3840, 2160),
+}
+
+# Distinct row patterns; prime and taller than any viewport, so rows inside
+# one frame never repeat except for the blank line spacing
+BANK_ROWS = 4099
+LINE_HEIGHT = 24
+GLYPH_ROWS = 16
+
+
+class SyntheticPage:
+    # Endless text-like page, generated from a bank of rows on access so a
+    # 500-frame 4K scroll never needs the whole page in memory. Supports the
+    # `page[rows, cols]` slicing and `.shape` that FakeCaptureBackend uses.
+    def __init__(self, width, height, seed=0):
+        self.shape = (height, width, 3)
+        rng = np.random.default_rng(seed)
+
+        ink = rng.random((BANK_ROWS, -(-width // 4))) < 0.25
+        ink[np.arange(BANK_ROWS) % LINE_HEIGHT >= GLYPH_ROWS] = False
+        ink = np.repeat(ink, 4, axis=1)[:, :width]
+
+        self._bank = np.full((BANK_ROWS, width, 3), 255, np.uint8)
+        self._bank[ink] = (40, 40, 40)
+
+    def __getitem__(self, key):
+        rows, cols = key
+        ys = np.arange(self.shape[0])[rows]
+        return self._bank[ys % BANK_ROWS][:, cols]
+
+
+def scroll_positions(frame_height, count, step_fraction=0.25):
+    step = max(1, int(frame_height * step_fraction))
+    return [i * step for i in range(count)], step
+
+
+def make_page(resolution, count, step_fraction=0.25, seed=0):
+    width, height = RESOLUTIONS[resolution]
+    positions, step = scroll_positions(height, count, step_fraction)
+    return SyntheticPage(width, positions[-1] + height, seed), positions
@@ -0,0 +1,58 @@
+import math
+
+from core.frame_signature import scroll_delta
+
+# Auto-arrange works only from cached frame signatures: consecutive parts
+# that overlap by a vertical scroll are chained into one stack at their
+# detected offsets, and the resulting stacks (including lone shots) are
+# shelf-packed into a roughly square mosaic.
+
+RECENT_CHAINS = 8  # Open stacks a new part may continue
+
+
+def build_chains(items):
+    # items: (image_id, width, height, signature) in capture order.
+    # Returns stacks as lists of (image_id, y_offset_within_stack).
+    chains = []
+    for image_id, width, height, signature in items:
+        placed = False
+        for chain in reversed(chains[-RECENT_CHAINS:]):
+            tail_id, tail_y, tail_sig = chain[-1]
+            delta = scroll_delta(tail_sig, signature)
+            if delta:
+                chain.append((image_id, tail_y + delta, signature))
+                placed = True
+                break
+        if not placed:
+            chains.append([(image_id, 0, signature)])
+    return [[(image_id, y) for image_id, y, _ in chain] for chain in chains]
+
+
+def arrange(items, gap=20):
+    # Returns {image_id: (x, y)} in world pixels, starting at (0, 0)
+    sizes = {image_id: (width, height) for image_id, width, height, _ in items}
+    blocks = []
+    for chain in build_chains(items):
+        width = max(sizes[image_id][0] for image_id, _ in chain)
+        height = max(y + sizes[image_id][1] for image_id, y in chain)
+        blocks.append((chain, width, height))
+    if not blocks:
+        return {}
+
+    # Shelf packing, tallest blocks first, wrapping at a roughly square width
+    area = sum(width * height for _, width, height in blocks)
+    row_width = max(max(width for _, width, _ in blocks), math.sqrt(area))
+    blocks.sort(key=lambda block: block[2], reverse=True)
+
+    positions = {}
+    x = y = shelf_height = 0
+    for chain, width, height in blocks:
+        if x and x + width > row_width:
+            x = 0
+            y += shelf_height + gap
+            shelf_height = 0
+        for image_id, offset in chain:
+            positions[image_id] = (x, y + offset)
+        x += width + gap
+        shelf_height = max(shelf_height, height)
+    return positions
@@ -0,0 +1,603 @@
+import ctypes
+import ctypes.util
+import os
+import sys
+import threading
+
+import cv2
+import numpy as np
+
+from core.screen_geometry import get_screen_geometry, physical_pixels
+
+# Every backend grabs only the requested region (x1, y1, x2, y2) in physical
+# screen pixels and returns it as a BGR uint8 numpy array.
+
+
+class _POINT(ctypes.Structure):
+    _fields_ = [("x", ctypes.c_long), ("y", ctypes.c_long)]
+
+
+_GA_ROOT = 2
+
+
+class CaptureBackend:
+    name = "base"
+
+    def grab(self, region):
+        # The region is read once, clipped to the bounding box of all
+        # monitors, so it may span several of them. Parts outside every
+        # monitor come back black: reading there is an error on X11, and
+        # gaps between monitors of different sizes hold undefined pixels.
+        x1, y1, x2, y2 = region
+        geometry = get_screen_geometry()
+        frame = np.zeros((y2 - y1, x2 - x1, 3), np.uint8)
+        visible = geometry.clip(region)
+        if visible is None:
+            return frame
+        parts = geometry.visible_parts(visible)
+        if parts == [visible] and visible == (x1, y1, x2, y2):
+            return self._grab_visible(region)  # All on one monitor
+
+        cx1, cy1, cx2, cy2 = visible
+        pixels = self._grab_visible(visible)
+        for px1, py1, px2, py2 in parts:
+            frame[py1 - y1 : py2 - y1, px1 - x1 : px2 - x1] = pixels[
+                py1 - cy1 : py2 - cy1, px1 - cx1 : px2 - cx1
+            ]
+        return frame
+
+    def _grab_visible(self, region):
+        raise NotImplementedError
+
+    def focus(self, region):
+        # Gives keyboard focus to the window under the region's centre, so
+        # PageDown reaches it rather than whichever window had focus (often
+        # ours, after its button was pressed). Windows raises that window
+        # directly; elsewhere it is clicked, as a person would.
+        x1, y1, x2, y2 = region
+        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+        if hasattr(ctypes, "windll"):
+            user32 = ctypes.windll.user32
+            user32.WindowFromPoint.restype = ctypes.c_void_p
+            user32.WindowFromPoint.argtypes = [_POINT]
+            user32.GetAncestor.restype = ctypes.c_void_p
+            user32.GetAncestor.argtypes = [ctypes.c_void_p, ctypes.c_uint]
+            user32.SetForegroundWindow.argtypes = [ctypes.c_void_p]
+            with physical_pixels():
+                window = user32.WindowFromPoint(_POINT(cx, cy))
+            if window:
+                user32.SetForegroundWindow(user32.GetAncestor(window, _GA_ROOT))
+        else:
+            import pyautogui
+
+            pyautogui.click(cx, cy)
+
+    def send_scroll(self, region, amount, mode="wheel"):
+        # Scrolls the content under the region down by `amount` wheel clicks,
+        # or PageDown presses in "page" mode (to the focused window, see
+        # focus()); negative amounts scroll up
+        import pyautogui
+
+        if mode == "page":
+            pyautogui.press("pagedown" if amount > 0 else "pageup", presses=abs(amount))
+        else:
+            x1, y1, x2, y2 = region
+            pyautogui.scroll(-amount, x=(x1 + x2) // 2, y=(y1 + y2) // 2)
+
+    def close(self):
+        pass
+
+
+class PyAutoGUIBackend(CaptureBackend):
+    # Portable fallback. On Windows PIL reads the whole virtual desktop for
+    # every grab and crops it; GDIBackend reads only the region there.
+    name = "pyautogui"
+
+    def _grab_visible(self, region):
+        x1, y1, x2, y2 = region
+        if hasattr(ctypes, "windll"):
+            # pyautogui only sees the primary monitor on Windows
+            from PIL import ImageGrab
+
+            shot = ImageGrab.grab(bbox=region, all_screens=True)
+        else:
+            import pyautogui
+
+            shot = pyautogui.screenshot(region=(x1, y1, x2 - x1, y2 - y1))
+        return cv2.cvtColor(np.asarray(shot.convert("RGB")), cv2.COLOR_RGB2BGR)
+
+
+class _XImage(ctypes.Structure):
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+        ("red_mask", ctypes.c_ulong),
+        ("green_mask", ctypes.c_ulong),
+        ("blue_mask", ctypes.c_ulong),
+    ]
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+
+_ZPIXMAP = 2
+_ALL_PLANES = 0xFFFFFFFF
+_IPC_PRIVATE = 0
+_IPC_CREAT = 0o1000
+_IPC_RMID = 0
+_SHMAT_FAILED = ctypes.c_void_p(-1).value  # (void *) -1
+
+
+class X11Backend(CaptureBackend):
+    # Region grab straight from the X server through libX11 via ctypes. Uses
+    # a MIT-SHM segment when the extension is available (no copy through the
+    # X socket), falling back to plain XGetImage.
+    name = "x11"
+
+    def __init__(self, use_shm=True):
+        x11_path = ctypes.util.find_library("X11")
+        if not x11_path:
+            raise OSError("libX11 not found")
+        self._x11 = ctypes.CDLL(x11_path)
+        self._declare_x11()
+
+        self._display = self._x11.XOpenDisplay(None)
+        if not self._display:
+            raise OSError("Cannot open X display")
+        screen = self._x11.XDefaultScreen(self._display)
+        self._root = self._x11.XDefaultRootWindow(self._display)
+        self._visual = self._x11.XDefaultVisual(self._display, screen)
+        self._depth = self._x11.XDefaultDepth(self._display, screen)
+
+        self._lock = threading.Lock()
+        self._xext = None
+        self._shm_image = None
+        self._shm_info = None
+        self._shm_size = None
+        if use_shm:
+            self._init_shm()
+
+    def _declare_x11(self):
+        x11 = self._x11
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        x11.XDefaultRootWindow.restype = ctypes.c_ulong
+        x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        x11.XDefaultVisual.restype = ctypes.c_void_p
+        x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XGetImage.restype = ctypes.POINTER(_XImage)
+        x11.XGetImage.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_ulong,
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_uint,
+            ctypes.c_uint,
+            ctypes.c_ulong,
+            ctypes.c_int,
+        ]
+        x11.XDestroyImage.argtypes = [ctypes.POINTER(_XImage)]
+        x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+
+    def _init_shm(self):
+        xext_path = ctypes.util.find_library("Xext")
+        libc_path = ctypes.util.find_library("c")
+        if not xext_path or not libc_path:
+            return
+        xext = ctypes.CDLL(xext_path)
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        if not xext.XShmQueryExtension(self._display):
+            return
+
+        xext.XShmCreateImage.restype = ctypes.POINTER(_XImage)
+        xext.XShmCreateImage.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            ctypes.c_uint,
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.POINTER(_XShmSegmentInfo),
+            ctypes.c_uint,
+            ctypes.c_uint,
+        ]
+        xext.XShmAttach.argtypes = [
+            ctypes.c_void_p,
+            ctypes.POINTER(_XShmSegmentInfo),
+        ]
+        xext.XShmDetach.argtypes = [
+            ctypes.c_void_p,
+            ctypes.POINTER(_XShmSegmentInfo),
+        ]
+        xext.XShmGetImage.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_ulong,
+            ctypes.POINTER(_XImage),
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_ulong,
+        ]
+
+        libc = ctypes.CDLL(libc_path, use_errno=True)
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+
+        self._xext = xext
+        self._libc = libc
+
+    def _release_shm(self):
+        if self._shm_image is None:
+            return
+        self._xext.XShmDetach(self._display, ctypes.byref(self._shm_info))
+        self._x11.XDestroyImage(self._shm_image)  # Frees only the struct
+        self._libc.shmdt(ctypes.c_void_p(self._shm_info.shmaddr))
+        self._shm_image = None
+        self._shm_info = None
+        self._shm_size = None
+
+    def _ensure_shm(self, width, height):
+        if self._shm_size == (width, height):
+            return True
+        self._release_shm()
+
+        info = _XShmSegmentInfo()
+        image = self._xext.XShmCreateImage(
+            self._display,
+            self._visual,
+            self._depth,
+            _ZPIXMAP,
+            None,
+            ctypes.byref(info),
+            width,
+            height,
+        )
+        if not image:
+            return False
+
+        size = image.contents.bytes_per_line * image.contents.height
+        info.shmid = self._libc.shmget(_IPC_PRIVATE, size, _IPC_CREAT | 0o600)
+        if info.shmid < 0:
+            self._x11.XDestroyImage(image)
+            return False
+        address = self._libc.shmat(info.shmid, None, 0)
+        if address is None or address == _SHMAT_FAILED:
+            # Not mapped: drop the segment; the caller falls back to XGetImage
+            self._libc.shmctl(info.shmid, _IPC_RMID, None)
+            self._x11.XDestroyImage(image)
+            return False
+        info.shmaddr = address
+        image.contents.data = info.shmaddr
+        info.readOnly = 0
+
+        attached = self._xext.XShmAttach(self._display, ctypes.byref(info))
+        self._x11.XSync(self._display, 0)
+        # Mark for removal now; the segment lives until the last detach
+        self._libc.shmctl(info.shmid, _IPC_RMID, None)
+        if not attached:
+            self._x11.XDestroyImage(image)
+            self._libc.shmdt(ctypes.c_void_p(info.shmaddr))
+            return False
+
+        self._shm_image = image
+        self._shm_info = info
+        self._shm_size = (width, height)
+        return True
+
+    def _to_bgr(self, image):
+        ximage = image.contents
+        if ximage.bits_per_pixel != 32:
+            raise OSError(f"Unsupported X visual: {ximage.bits_per_pixel} bpp")
+        size = ximage.bytes_per_line * ximage.height
+        buffer = (ctypes.c_ubyte * size).from_address(ximage.data)
+        pixels = np.frombuffer(buffer, dtype=np.uint8).reshape(
+            ximage.height, ximage.bytes_per_line // 4, 4
+        )
+        # ZPixmap at 32 bpp is BGRX on little-endian servers
+        return cv2.cvtColor(pixels[:, : ximage.width], cv2.COLOR_BGRA2BGR)
+
+    def _grab_visible(self, region):
+        x1, y1, x2, y2 = region
+        width, height = x2 - x1, y2 - y1
+
+        with self._lock:
+            if self._xext is not None and not self._ensure_shm(width, height):
+                self._xext = None  # Shm unusable here; stop retrying
+            if self._xext is not None:
+                if self._xext.XShmGetImage(
+                    self._display, self._root, self._shm_image, x1, y1, _ALL_PLANES
+                ):
+                    return self._to_bgr(self._shm_image)
+
+            image = self._x11.XGetImage(
+                self._display, self._root, x1, y1, width, height, _ALL_PLANES, _ZPIXMAP
+            )
+            if not image:
+                raise OSError(f"XGetImage failed for region {region}")
+            try:
+                return self._to_bgr(image)
+            finally:
+                self._x11.XDestroyImage(image)
+
+    def close(self):
+        with self._lock:
+            if self._display:
+                self._release_shm()
+                self._x11.XCloseDisplay(self._display)
+                self._display = None
+
+
+class _BitmapInfoHeader(ctypes.Structure):
+    _fields_ = [
+        ("biSize", ctypes.c_uint32),
+        ("biWidth", ctypes.c_int32),
+        ("biHeight", ctypes.c_int32),
+        ("biPlanes", ctypes.c_uint16),
+        ("biBitCount", ctypes.c_uint16),
+        ("biCompression", ctypes.c_uint32),
+        ("biSizeImage", ctypes.c_uint32),
+        ("biXPelsPerMeter", ctypes.c_int32),
+        ("biYPelsPerMeter", ctypes.c_int32),
+        ("biClrUsed", ctypes.c_uint32),
+        ("biClrImportant", ctypes.c_uint32),
+    ]
+
+
+_SRCCOPY = 0x00CC0020
+_CAPTUREBLT = 0x40000000  # Include layered windows, as PIL does
+_BI_RGB = 0
+_DIB_RGB_COLORS = 0
+
+
+class GDIBackend(CaptureBackend):
+    # Region grab on Windows through GDI via ctypes: one BitBlt of just the
+    # region from the screen into a bitmap kept across grabs of the same
+    # size, read back as top-down 32 bpp BGRX.
+    name = "gdi"
+
+    def __init__(self):
+        if not hasattr(ctypes, "windll"):
+            raise OSError("GDI is only available on Windows")
+        self._user32 = ctypes.windll.user32
+        self._gdi32 = ctypes.windll.gdi32
+        self._declare_gdi()
+
+        self._lock = threading.Lock()
+        self._memory_dc = None
+        self._bitmap = None
+        self._previous_bitmap = None
+        self._size = None
+
+    def _declare_gdi(self):
+        user32, gdi32 = self._user32, self._gdi32
+        user32.GetDC.restype = ctypes.c_void_p
+        user32.GetDC.argtypes = [ctypes.c_void_p]
+        user32.ReleaseDC.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        gdi32.CreateCompatibleDC.restype = ctypes.c_void_p
+        gdi32.CreateCompatibleDC.argtypes = [ctypes.c_void_p]
+        gdi32.CreateCompatibleBitmap.restype = ctypes.c_void_p
+        gdi32.CreateCompatibleBitmap.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_int,
+            ctypes.c_int,
+        ]
+        gdi32.SelectObject.restype = ctypes.c_void_p
+        gdi32.SelectObject.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        gdi32.DeleteObject.argtypes = [ctypes.c_void_p]
+        gdi32.DeleteDC.argtypes = [ctypes.c_void_p]
+        gdi32.BitBlt.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_void_p,
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_uint32,
+        ]
+        gdi32.GetDIBits.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            ctypes.c_uint,
+            ctypes.c_uint,
+            ctypes.c_void_p,
+            ctypes.POINTER(_BitmapInfoHeader),
+            ctypes.c_uint,
+        ]
+
+    def _release_bitmap(self):
+        if self._memory_dc is None:
+            return
+        self._gdi32.SelectObject(self._memory_dc, self._previous_bitmap)
+        self._gdi32.DeleteObject(self._bitmap)
+        self._gdi32.DeleteDC(self._memory_dc)
+        self._memory_dc = None
+        self._bitmap = None
+        self._previous_bitmap = None
+        self._size = None
+
+    def _ensure_bitmap(self, screen_dc, width, height):
+        if self._size == (width, height):
+            return
+        self._release_bitmap()
+        memory_dc = self._gdi32.CreateCompatibleDC(screen_dc)
+        if not memory_dc:
+            raise OSError("CreateCompatibleDC failed")
+        bitmap = self._gdi32.CreateCompatibleBitmap(screen_dc, width, height)
+        if not bitmap:
+            self._gdi32.DeleteDC(memory_dc)
+            raise OSError(f"CreateCompatibleBitmap failed for {width}x{height}")
+        self._memory_dc = memory_dc
+        self._bitmap = bitmap
+        self._previous_bitmap = self._gdi32.SelectObject(memory_dc, bitmap)
+        self._size = (width, height)
+
+    def _grab_visible(self, region):
+        x1, y1, x2, y2 = region
+        width, height = x2 - x1, y2 - y1
+        header = _BitmapInfoHeader(
+            biSize=ctypes.sizeof(_BitmapInfoHeader),
+            biWidth=width,
+            biHeight=-height,  # Negative: rows top-down
+            biPlanes=1,
+            biBitCount=32,
+            biCompression=_BI_RGB,
+        )
+        pixels = np.empty((height, width, 4), np.uint8)
+
+        # Region coordinates are physical, so the screen DC must be too
+        with self._lock, physical_pixels():
+            screen_dc = self._user32.GetDC(None)
+            if not screen_dc:
+                raise OSError("GetDC failed")
+            try:
+                self._ensure_bitmap(screen_dc, width, height)
+                if not self._gdi32.BitBlt(
+                    self._memory_dc,
+                    0,
+                    0,
+                    width,
+                    height,
+                    screen_dc,
+                    x1,
+                    y1,
+                    _SRCCOPY | _CAPTUREBLT,
+                ):
+                    raise OSError(f"BitBlt failed for region {region}")
+            finally:
+                self._user32.ReleaseDC(None, screen_dc)
+            rows = self._gdi32.GetDIBits(
+                self._memory_dc,
+                self._bitmap,
+                0,
+                height,
+                pixels.ctypes.data,
+                ctypes.byref(header),
+                _DIB_RGB_COLORS,
+            )
+            if rows != height:
+                raise OSError(f"GetDIBits failed for region {region}")
+        return cv2.cvtColor(pixels, cv2.COLOR_BGRA2BGR)
+
+    def close(self):
+        with self._lock:
+            self._release_bitmap()
+
+
+class FakeCaptureBackend(CaptureBackend):
+    # In-memory "screen" for headless runs: the region is read out of a BGR
+    # document whose top-left sits at `origin`, scrolled down by `scroll_y`.
+    # Injected scrolls move `wheel_step` pixels per click (a page is 7/8 of
+    # the region) and, like smooth scrolling, play out over `smooth_grabs`.
+    # Without a document, the image at $SCREENSHOT_FAKE_DOCUMENT is used.
+    name = "fake"
+
+    def __init__(self, document=None, origin=(0, 0), wheel_step=40, smooth_grabs=0):
+        if document is None:
+            path = os.environ.get("SCREENSHOT_FAKE_DOCUMENT")
+            document = cv2.imread(path, cv2.IMREAD_COLOR) if path else None
+            if document is None:
+                raise ValueError(
+                    "The fake backend needs a document image "
+                    "($SCREENSHOT_FAKE_DOCUMENT)"
+                )
+        self.document = document
+        self.origin = origin
+        self.wheel_step = wheel_step
+        self.smooth_grabs = smooth_grabs
+        self.scroll_y = 0
+        self.grab_count = 0
+        self.focused = None
+        self._pending_dy = 0
+        self._pending_grabs = 0
+        self._max_scroll = max(0, document.shape[0] - 1)
+
+    def scroll(self, dy):
+        self.scroll_y = int(min(max(self.scroll_y + dy, 0), self._max_scroll))
+
+    def focus(self, region):
+        self.focused = region
+
+    def send_scroll(self, region, amount, mode="wheel"):
+        x1, y1, x2, y2 = region
+        # Like a real page, injected scrolling stops once the bottom is in view
+        self._max_scroll = max(0, self.document.shape[0] - (y2 - self.origin[1]))
+        step = (y2 - y1) * 7 // 8 if mode == "page" else self.wheel_step
+        if self.smooth_grabs:
+            self._pending_dy += amount * step
+            self._pending_grabs = self.smooth_grabs
+        else:
+            self.scroll(amount * step)
+
+    def grab(self, region):
+        if self._pending_grabs:
+            dy = round(self._pending_dy / self._pending_grabs)
+            self.scroll(dy)
+            self._pending_dy -= dy
+            self._pending_grabs -= 1
+
+        x1, y1, x2, y2 = region
+        ox, oy = self.origin
+        top = y1 - oy + self.scroll_y
+        height, width = y2 - y1, x2 - x1
+
+        frame = np.zeros((height, width) + self.document.shape[2:], np.uint8)
+        rows = self.document[max(top, 0) : top + height, x1 - ox : x2 - ox]
+        frame[max(-top, 0) : max(-top, 0) + rows.shape[0], : rows.shape[1]] = rows
+        self.grab_count += 1
+        return frame
+
+
+BACKENDS = {
+    X11Backend.name: X11Backend,
+    GDIBackend.name: GDIBackend,
+    PyAutoGUIBackend.name: PyAutoGUIBackend,
+    FakeCaptureBackend.name: FakeCaptureBackend,
+}
+
+_default_backend = None
+
+
+def create_backend(name=None, **options):
+    # Explicit name, then $SCREENSHOT_BACKEND, then the fastest that works.
+    # Options go to the named backend's constructor.
+    name = name or os.environ.get("SCREENSHOT_BACKEND")
+    if name:
+        return BACKENDS[name](**options)
+
+    if sys.platform.startswith("linux") and os.environ.get("DISPLAY"):
+        try:
+            return X11Backend()
+        except OSError:
+            pass
+    if hasattr(ctypes, "windll"):
+        return GDIBackend()
+    return PyAutoGUIBackend()
+
+
+def get_capture_backend():
+    global _default_backend
+    if _default_backend is None:
+        _default_backend = create_backend()
+    return _default_backend
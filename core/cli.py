@@ -0,0 +1,312 @@
+import argparse
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import cv2
+
+from core.capture_backend import BACKENDS, create_backend
+from core.export import ExportOptions, encode_image
+from core.frame_store import FrameStore, is_journal
+from core.panorama import LAYOUTS, create_stitcher, stitch_panorama
+from core.pipeline import CapturePipeline
+from core.screenshot_auto import (
+    AutoCaptureSettings,
+    start_auto_scroll_screenshot,
+    start_driven_scroll_screenshot,
+)
+from core.stitcher import VerticalStitcher, band_hashes, stitch_vertical
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".webp", ".tif", ".tiff")
+FEATHER_HELP = "rows blended across each seam (vertical layout)"
+
+
+class _Dispatcher:
+    # Stands in for the Tk root: `after` callbacks run immediately
+    def after(self, ms, func, *args):
+        func(*args)
+
+
+def _parse_region(text):
+    try:
+        x1, y1, x2, y2 = map(int, text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError("region must be x1,y1,x2,y2")
+    if x2 <= x1 or y2 <= y1:
+        raise argparse.ArgumentTypeError("region must have x2 > x1 and y2 > y1")
+    return x1, y1, x2, y2
+
+
+def _natural_key(name):
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+
+
+def _frame_paths(directory):
+    names = [
+        name
+        for name in os.listdir(directory)
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+    ]
+    return [os.path.join(directory, name) for name in sorted(names, key=_natural_key)]
+
+
+def _read_frame(path):
+    frame = cv2.imread(path, cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError(f"Could not read image: {path}")
+    return frame
+
+
+def _load_frame(path):
+    frame = _read_frame(path)
+    return frame, band_hashes(frame)
+
+
+def _bounded_map(pool, func, items, ahead):
+    # Like pool.map, but keeps at most `ahead` results in flight
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(func, item))
+        if len(pending) >= ahead:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def stitch_directory(directory, workers=None, layout="vertical", feather=0):
+    # Decoding and hashing run across processes; offsets are found in order
+    if layout == "vertical":
+        stitch = partial(stitch_vertical, feather=feather)
+    else:
+        stitch = stitch_panorama
+    if is_journal(directory):
+        # A capture session journal: frames are memmapped, nothing to decode
+        frames = FrameStore(journal_dir=directory)
+        try:
+            return stitch(frames)
+        finally:
+            frames.close()
+
+    paths = _frame_paths(directory)
+    if not paths:
+        raise ValueError(f"No images found in {directory}")
+
+    if layout != "vertical":
+        # Panorama offsets are searched on the frames themselves
+        if workers == 1:
+            return stitch(map(_read_frame, paths))
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return stitch(_bounded_map(pool, _read_frame, paths, 2 * workers))
+
+    stitcher = VerticalStitcher(feather=feather)
+    if workers == 1:
+        frames = map(_load_frame, paths)
+        for frame, hashes in frames:
+            stitcher.add(frame, hashes)
+        return stitcher.result()
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for frame, hashes in _bounded_map(pool, _load_frame, paths, 2 * workers):
+            stitcher.add(frame, hashes)
+    return stitcher.result()
+
+
+def _stitch_to_file(directory, out_path, options, layout, feather):
+    encode_image(stitch_directory(directory, 1, layout, feather), out_path, options)
+    return out_path
+
+
+def _drive_scroll(backend, pipeline, region, steps, clicks, delay):
+    for step in range(steps + 1):
+        if step:
+            backend.send_scroll(region, clicks)
+            time.sleep(delay)
+        with pipeline.metrics.span("grab"):
+            frame = backend.grab(region)
+        pipeline.submit(frame)
+
+
+def cmd_capture(args):
+    dispatcher = _Dispatcher()
+    if args.document and args.backend != "fake":
+        print("--document needs --backend fake", file=sys.stderr)
+        return 2
+    options = {"document": _read_frame(args.document)} if args.document else {}
+    backend = create_backend(args.backend, **options)
+    stitcher = create_stitcher(args.layout, args.feather)
+    frames = FrameStore()
+
+    def on_frame(index, thumb, signature):
+        print(f"captured part {index + 1}", flush=True)
+
+    pipeline = CapturePipeline(dispatcher, stitcher, frames, on_frame)
+    try:
+        if args.watch:
+            # Same loop as "Start Auto Scroll": follows manual scrolling
+            token = start_auto_scroll_screenshot(
+                dispatcher, args.region, pipeline, backend, on_done=lambda: None
+            )
+            time.sleep(args.watch)
+            token.cancel()
+            token.join()
+        elif args.drive:
+            # Same loop as "Scroll For Me": runs until the end of the page
+            settings = AutoCaptureSettings(
+                scroll_mode=args.mode,
+                initial_clicks=args.step,
+                settle_time=args.delay,
+            )
+            token = start_driven_scroll_screenshot(
+                dispatcher,
+                args.region,
+                pipeline,
+                backend,
+                settings,
+                on_done=lambda: None,
+            )
+            token.join()
+        else:
+            _drive_scroll(
+                backend, pipeline, args.region, args.scroll, args.step, args.delay
+            )
+        pipeline.drain()
+    finally:
+        pipeline.close()
+
+    final = stitcher.image()
+    frames.close()
+    try:
+        if final is None:
+            print("No frames captured", file=sys.stderr)
+            return 1
+        with pipeline.metrics.span("export"):
+            options = ExportOptions(png_compression=args.compression)
+            encode_image(final, args.out, options)
+        print(f"Saved {final.shape[1]}x{final.shape[0]} to {args.out}")
+        return 0
+    finally:
+        if args.trace:
+            pipeline.metrics.save_trace(args.trace)
+
+
+def cmd_stitch(args):
+    options = ExportOptions(png_compression=args.compression)
+
+    if len(args.directories) == 1:
+        final = stitch_directory(
+            args.directories[0], args.workers, args.layout, args.feather
+        )
+        encode_image(final, args.out, options)
+        print(f"Saved {final.shape[1]}x{final.shape[0]} to {args.out}")
+        return 0
+
+    # Several directories: one process per directory
+    os.makedirs(args.out, exist_ok=True)
+    jobs = [
+        (
+            directory,
+            os.path.join(args.out, os.path.basename(os.path.normpath(directory)))
+            + ".png",
+        )
+        for directory in args.directories
+    ]
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(
+                _stitch_to_file,
+                directory,
+                out_path,
+                options,
+                args.layout,
+                args.feather,
+            )
+            for directory, out_path in jobs
+        ]
+        for future in futures:
+            print(f"Saved {future.result()}", flush=True)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="screenshot_app", description="Headless long screenshot capture"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    capture = subparsers.add_parser("capture", help="capture a scrolling region")
+    capture.add_argument("--region", type=_parse_region, required=True)
+    capture.add_argument(
+        "--scroll", type=int, default=0, help="number of scroll steps to drive"
+    )
+    capture.add_argument(
+        "--step",
+        type=int,
+        default=5,
+        help="wheel clicks per step (first step with --drive)",
+    )
+    capture.add_argument(
+        "--delay", type=float, default=0.3, help="seconds to settle after scrolling"
+    )
+    capture.add_argument(
+        "--drive",
+        action="store_true",
+        help="scroll until the end of the page, sizing each step from the overlap",
+    )
+    capture.add_argument(
+        "--mode",
+        choices=("wheel", "page"),
+        default="wheel",
+        help="what --drive sends: wheel clicks or PageDown",
+    )
+    capture.add_argument(
+        "--watch",
+        type=float,
+        default=0,
+        help="follow manual scrolling for this many seconds instead of driving",
+    )
+    capture.add_argument(
+        "--layout",
+        choices=sorted(LAYOUTS),
+        default="vertical",
+        help="vertical scrolling, or panorama for sideways and 2D scrolling",
+    )
+    capture.add_argument("--feather", type=int, default=0, help=FEATHER_HELP)
+    capture.add_argument("--backend", choices=sorted(BACKENDS))
+    capture.add_argument(
+        "--document",
+        help="image the fake backend shows as the screen, for runs without a display",
+    )
+    capture.add_argument("--compression", type=int, default=3, choices=range(10))
+    capture.add_argument(
+        "--trace", help="write a Chrome trace of the capture stages to this file"
+    )
+    capture.add_argument("--out", required=True)
+    capture.set_defaults(func=cmd_capture)
+
+    stitch = subparsers.add_parser(
+        "stitch", help="stitch directories of frames or capture session journals"
+    )
+    stitch.add_argument("directories", nargs="+")
+    stitch.add_argument(
+        "--out",
+        required=True,
+        help="output file, or output directory when stitching several",
+    )
+    stitch.add_argument("--layout", choices=sorted(LAYOUTS), default="vertical")
+    stitch.add_argument("--feather", type=int, default=0, help=FEATHER_HELP)
+    stitch.add_argument("--workers", type=int, default=None)
+    stitch.add_argument("--compression", type=int, default=3, choices=range(10))
+    stitch.set_defaults(func=cmd_stitch)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,107 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+BAND_ROWS = 256
+
+# Layers are (pixels, x, y), bottom to top, where pixels is an RGB or RGBA
+# uint8 array (e.g. np.asarray of a PIL image). Bands are composited in RGB
+# and swapped to BGR in place, so the output is ready for cv2.imencode. The
+# output is split into horizontal bands that are composited in parallel; each
+# band only touches the layers crossing it.
+
+
+def _scaled(pixels, scale):
+    if scale == 1.0:
+        return pixels  # Identity: no resize, no copy
+    size = (
+        max(1, round(pixels.shape[1] * scale)),
+        max(1, round(pixels.shape[0] * scale)),
+    )
+    interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LANCZOS4
+    return cv2.resize(pixels, size, interpolation=interpolation)
+
+
+def _blit_band(out, band_top, band_bottom, layers, blend, background):
+    band = out[band_top:band_bottom]
+    band[...] = background  # A full row, so the fill broadcasts row by row
+    accum = weight = None
+    if blend == "average":
+        accum = np.zeros(band.shape, np.float32)
+        weight = np.zeros(band.shape[:2] + (1,), np.float32)
+
+    for pixels, x, y in layers:
+        top = max(y, band_top)
+        bottom = min(y + pixels.shape[0], band_bottom)
+        if bottom <= top:
+            continue
+
+        src = pixels[top - y : bottom - y, :, :3]
+        dst = band[top - band_top : bottom - band_top, x : x + pixels.shape[1]]
+        alpha = None
+        if pixels.shape[2] == 4:
+            alpha = pixels[top - y : bottom - y, :, 3:4].astype(np.float32) / 255.0
+
+        if blend == "average":
+            a = 1.0 if alpha is None else alpha
+            region = (
+                slice(top - band_top, bottom - band_top),
+                slice(x, x + pixels.shape[1]),
+            )
+            accum[region] += src * a
+            weight[region] += a
+        elif alpha is None:
+            dst[...] = src
+        else:
+            dst[...] = (src * alpha + dst * (1.0 - alpha) + 0.5).astype(np.uint8)
+
+    if blend == "average":
+        covered = weight[..., 0] > 0
+        band[covered] = (accum[covered] / weight[covered] + 0.5).astype(np.uint8)
+
+    # Full-width bands are contiguous, so the swap to BGR happens in place
+    cv2.cvtColor(band, cv2.COLOR_RGB2BGR, dst=band)
+
+
+def composite(layers, scale=1.0, background=(0, 0, 0), blend="replace", workers=None):
+    # blend: "replace" (top layer wins, alpha-blended if it has alpha) or
+    # "average" (overlapping layers are averaged, weighted by alpha)
+    scaled = []
+    for pixels, x, y in layers:
+        if pixels.ndim == 2:
+            pixels = np.repeat(pixels[:, :, None], 3, axis=2)
+        scaled.append((_scaled(pixels, scale), round(x * scale), round(y * scale)))
+    if not scaled:
+        return None
+
+    min_x = min(x for _, x, _ in scaled)
+    min_y = min(y for _, _, y in scaled)
+    max_x = max(x + p.shape[1] for p, x, _ in scaled)
+    max_y = max(y + p.shape[0] for p, _, y in scaled)
+    shifted = [(p, x - min_x, y - min_y) for p, x, y in scaled]
+
+    out = np.empty((max_y - min_y, max_x - min_x, 3), np.uint8)
+    background_row = np.tile(np.asarray(background, np.uint8), (out.shape[1], 1))
+
+    bands = [
+        (top, min(top + BAND_ROWS, out.shape[0]))
+        for top in range(0, out.shape[0], BAND_ROWS)
+    ]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(bands) == 1:
+        for top, bottom in bands:
+            _blit_band(out, top, bottom, shifted, blend, background_row)
+        return out
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(
+            pool.map(
+                lambda band: _blit_band(
+                    out, band[0], band[1], shifted, blend, background_row
+                ),
+                bands,
+            )
+        )
+    return out
@@ -0,0 +1,97 @@
+from itertools import islice
+
+import cv2
+import numpy as np
+
+from core.frame_signature import is_new_content
+
+HASH_BITS = 64
+
+
+def dhash(gray):
+    # 64-bit difference hash: each bit says whether a cell of a 9x8 shrink
+    # is brighter than its right neighbour. Works on a signature's thumbnail.
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = np.packbits(small[:, 1:] > small[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big")
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class DuplicateIndex:
+    # Finds an earlier frame that shows the same view as a new one. Hashes
+    # are split into max_distance + 1 chunks, each looked up in its own
+    # table: two hashes within max_distance bits must agree exactly on at
+    # least one chunk, so only frames sharing a chunk are ever compared.
+    # Hash neighbours are then confirmed on the thumbnails, which keeps
+    # low-detail frames (blank pages, flat colour) from matching by accident.
+    # Those also hash alike, so crowded buckets are only searched newest first.
+    def __init__(self, max_distance=6, max_checks=16, max_bucket=64):
+        self.max_distance = max_distance
+        self.max_checks = max_checks  # Thumbnail comparisons per lookup
+        self.max_bucket = max_bucket  # Entries read from each bucket
+        chunks = max_distance + 1
+        self._bounds = [
+            (HASH_BITS * i // chunks, HASH_BITS * (i + 1) // chunks)
+            for i in range(chunks)
+        ]
+        self._tables = [{} for _ in self._bounds]  # chunk value → {index: None}
+        self._entries = {}  # index → (hash, FrameSignature)
+        self._last = None  # Newest index, always checked first
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _keys(self, value):
+        for lo, hi in self._bounds:
+            yield (value >> lo) & ((1 << (hi - lo)) - 1)
+
+    def add(self, index, signature):
+        value = dhash(signature.thumb)
+        self._entries[index] = (value, signature)
+        for table, key in zip(self._tables, self._keys(value)):
+            table.setdefault(key, {})[index] = None
+        self._last = index
+
+    def remove(self, index):
+        value, _ = self._entries.pop(index)
+        for table, key in zip(self._tables, self._keys(value)):
+            bucket = table[key]
+            del bucket[index]
+            if not bucket:
+                del table[key]
+        if index == self._last:
+            self._last = max(self._entries, default=None)
+
+    def clear(self):
+        for table in self._tables:
+            table.clear()
+        self._entries.clear()
+        self._last = None
+
+    def find(self, signature, threshold=0.0):
+        # Index of a stored frame the new one duplicates, or None
+        if self._last is not None:
+            _, last = self._entries[self._last]
+            if not is_new_content(last, signature, threshold):
+                return self._last
+
+        value = dhash(signature.thumb)
+        candidates = set()
+        for table, key in zip(self._tables, self._keys(value)):
+            bucket = table.get(key, {})
+            candidates.update(islice(reversed(bucket), self.max_bucket))
+        candidates.discard(self._last)
+
+        near = []
+        for index in candidates:
+            distance = hamming(value, self._entries[index][0])
+            if distance <= self.max_distance:
+                near.append((distance, index))
+        near.sort()
+        for _, index in near[: self.max_checks]:
+            if not is_new_content(self._entries[index][1], signature, threshold):
+                return index
+        return None
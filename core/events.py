@@ -0,0 +1,83 @@
+import queue
+import threading
+import tkinter as tk
+import traceback
+
+DRAIN_INTERVAL_MS = 16
+
+# Tk is only ever touched from the thread running mainloop. Workers post
+# callbacks to the root's EventBus instead of calling root.after themselves;
+# the Tk thread drains the queue at a fixed cadence and runs them in order.
+
+
+class EventBus:
+    def __init__(self, root, interval_ms=DRAIN_INTERVAL_MS):
+        # Must be created on the Tk thread
+        self.root = root
+        self.interval_ms = interval_ms
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self.root.after(self.interval_ms, self._drain)
+
+    def post(self, func, *args):
+        # Safe from any thread
+        self._queue.put((func, args))
+
+    def after(self, ms, func, *args):
+        # Drop-in for root.after in code that runs on worker threads
+        if ms:
+            self.post(self.root.after, ms, func, *args)
+        else:
+            self.post(func, *args)
+
+    def _drain(self):
+        # Only what is queued now runs, so a busy producer cannot starve Tk
+        for _ in range(self._queue.qsize()):
+            func, args = self._queue.get_nowait()
+            try:
+                func(*args)
+            except Exception:
+                traceback.print_exc()
+        if not self._closed:
+            self.root.after(self.interval_ms, self._drain)
+
+    def close(self):
+        self._closed = True
+
+
+def event_bus(widget):
+    # The EventBus of the widget's Tk root, created on first use (so call it
+    # on the Tk thread). Anything that is not a Tk widget, such as the CLI's
+    # immediate dispatcher, is already safe and is returned as is.
+    if not isinstance(widget, tk.Misc):
+        return widget
+    root = widget._root()
+    bus = getattr(root, "_event_bus", None)
+    if bus is None:
+        bus = root._event_bus = EventBus(root)
+    return bus
+
+
+class CancelToken:
+    # Stops one capture session. Loops sleep on the token so they wake as
+    # soon as it is cancelled, and mark it finished when they exit.
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def sleep(self, seconds):
+        # Returns True if cancelled meanwhile
+        return self._cancelled.wait(max(0.0, seconds))
+
+    def finish(self):
+        self._finished.set()
+
+    def join(self, timeout=None):
+        return self._finished.wait(timeout)
@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from core.events import event_bus
+from core.tiled_export import LARGE_WRITERS, TIFF_TILE, partial_file
+
+
+class ExportOptions:
+    def __init__(
+        self,
+        png_compression=3,
+        webp_lossless=True,
+        webp_quality=90,
+        tile_size=TIFF_TILE,
+        strip_height=4096,
+        strip_format=".png",
+        page_height=None,
+        workers=None,
+    ):
+        self.png_compression = png_compression  # 0 (fastest) .. 9 (smallest)
+        self.webp_lossless = webp_lossless
+        self.webp_quality = webp_quality
+
+        # Tiled outputs only (TIFF, strips, PDF); deflate uses png_compression
+        self.tile_size = tile_size  # TIFF tile edge, a multiple of 16
+        self.strip_height = strip_height
+        self.strip_format = strip_format  # ".png" or ".webp"
+        self.page_height = page_height  # PDF page in pixels; None = A4 shape
+        self.workers = workers  # Encoding threads; None = one per core
+
+    def imwrite_params(self, ext):
+        if ext == ".png":
+            return [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression]
+        if ext == ".webp":
+            # OpenCV switches WebP to lossless for quality above 100
+            quality = 101 if self.webp_lossless else self.webp_quality
+            return [cv2.IMWRITE_WEBP_QUALITY, quality]
+        return []
+
+
+EXPORT_PRESETS = {
+    "Balanced": ExportOptions(png_compression=3),
+    "Smallest file": ExportOptions(png_compression=9),
+    "Fastest save": ExportOptions(png_compression=0),
+}
+
+EXPORT_FILETYPES = [
+    ("PNG Image", "*.png"),
+    ("WebP Image (lossless)", "*.webp"),
+    ("Uncompressed BMP", "*.bmp"),
+    ("Tiled pyramidal TIFF", "*.tif"),
+    ("PNG strips + JSON manifest", "*.json"),
+    ("Paged PDF", "*.pdf"),
+]
+
+WRITE_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def encode_image(image, save_path, options=None, on_progress=None):
+    # on_progress(fraction, stage); fraction is None while a stage cannot
+    # measure its progress, such as a single imencode call
+    options = options or ExportOptions()
+    report = on_progress or (lambda fraction, stage: None)
+    ext = os.path.splitext(save_path)[1].lower() or ".png"
+
+    if callable(image):
+        # Deferred image, e.g. a composite built off the Tk thread
+        report(None, "Compositing")
+        image = image()
+
+    if isinstance(image, Image.Image):
+        image = cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2BGR)
+
+    writer = LARGE_WRITERS.get(ext)
+    if writer is not None:
+        # Written piece by piece across cores; no single encoded buffer
+        report(0.0, "Encoding")
+        writer(image, save_path, options, report)
+        report(1.0, "Done")
+        return
+
+    # Single-buffer formats need the whole image; array-likes such as a
+    # panorama's CanvasImage are made dense only here
+    image = np.asarray(image)
+    report(None, "Encoding")
+    ok, data = cv2.imencode(ext, image, options.imwrite_params(ext))
+    if not ok:
+        raise ValueError(f"Could not encode image as {ext}")
+
+    # Write to a temp file first so a failed save never leaves half a file
+    data = data.reshape(-1)
+    tmp_path = save_path + ".part"
+    with partial_file(tmp_path) as f:
+        for offset in range(0, len(data), WRITE_CHUNK_BYTES):
+            f.write(data[offset : offset + WRITE_CHUNK_BYTES])
+            written = min(offset + WRITE_CHUNK_BYTES, len(data))
+            report(written / len(data), "Writing")
+    os.replace(tmp_path, save_path)
+    report(1.0, "Done")
+
+
+def export_image_async(
+    root,
+    image,
+    save_path,
+    options=None,
+    on_progress=None,
+    on_done=None,
+    on_error=None,
+    metrics=None,
+):
+    # Encodes and writes on a worker thread; callbacks run on the Tk thread.
+    # With `metrics`, each stage is recorded as an "export.<stage>" span.
+    root = event_bus(root)
+    current = [None, 0.0]  # Stage being timed, and when it started
+
+    def report(fraction, stage):
+        if metrics is not None and stage != current[0]:
+            now = time.perf_counter()
+            if current[0] is not None:
+                metrics.record(
+                    f"export.{current[0].lower()}", current[1], now - current[1]
+                )
+            current[:] = [stage, now]
+        if on_progress:
+            root.after(0, on_progress, fraction, stage)
+
+    def work():
+        try:
+            encode_image(image, save_path, options, report)
+        except Exception as e:
+            if on_error:
+                root.after(0, on_error, e)
+            return
+        if on_done:
+            root.after(0, on_done, save_path)
+
+    thread = threading.Thread(target=work, daemon=True)
+    thread.start()
+    return thread
+
+
+def show_progress_in_title(window):
+    base_title = window.title()
+
+    def on_progress(fraction, stage):
+        if fraction is None:
+            window.title(f"{base_title} — {stage}…")
+        elif fraction >= 1.0:
+            window.title(base_title)
+        else:
+            window.title(f"{base_title} — {stage} {fraction:.0%}")
+
+    return on_progress
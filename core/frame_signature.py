@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+
+from core.stitcher import band_hashes, find_vertical_offset
+
+# A frame signature is a small grayscale thumbnail (for change detection)
+# plus band hashes (one per row per vertical band) of a column-subsampled
+# copy of the frame (for scroll and motion estimation). Both are built from
+# 1/column_step of the pixels, so comparing two signatures never touches the
+# full-resolution frames again.
+
+THUMB_WIDTH = 64
+COLUMN_STEP = 8
+
+
+class FrameSignature:
+    __slots__ = ("thumb", "rows", "shape")
+
+    def __init__(self, thumb, rows, shape):
+        self.thumb = thumb
+        self.rows = rows
+        self.shape = shape
+
+    def to_dict(self):
+        # For a session journal, so a resumed session need not recompute it
+        return {"thumb": self.thumb, "rows": self.rows, "shape": list(self.shape)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["thumb"], data["rows"], tuple(data["shape"]))
+
+
+def compute_signature(frame, thumb_width=THUMB_WIDTH, column_step=COLUMN_STEP):
+    # Nearest-neighbour resize is a much faster column subsample than slicing
+    width = max(1, frame.shape[1] // column_step)
+    columns = cv2.resize(
+        frame, (width, frame.shape[0]), interpolation=cv2.INTER_NEAREST
+    )
+    rows = band_hashes(columns)
+
+    gray = columns if columns.ndim == 2 else cv2.cvtColor(columns, cv2.COLOR_BGR2GRAY)
+    thumb_width = min(thumb_width, gray.shape[1])
+    thumb_height = max(1, round(frame.shape[0] * thumb_width / frame.shape[1]))
+    thumb = cv2.resize(gray, (thumb_width, thumb_height), interpolation=cv2.INTER_AREA)
+    return FrameSignature(thumb, rows, frame.shape)
+
+
+def change_fraction(prev, curr, tolerance=12):
+    # Fraction of the region that changed, measured on the thumbnails
+    if prev.shape != curr.shape:
+        return 1.0
+    diff = cv2.absdiff(prev.thumb, curr.thumb)
+    return np.count_nonzero(diff > tolerance) / diff.size
+
+
+def is_new_content(prev, curr, threshold=0.005):
+    return change_fraction(prev, curr) > threshold
+
+
+def scroll_delta(prev, curr, min_overlap=16):
+    # Rows `curr` is scrolled down relative to `prev`, or None if unknown
+    if prev.shape != curr.shape:
+        return None
+    return find_vertical_offset(prev.rows, curr.rows, min_overlap)
+
+
+def is_scroll_progress(prev, curr, max_animated=0.5, min_overlap=16):
+    # True when `curr` shows content `prev` did not: the page scrolled, or
+    # most of the region changed at once. Changes that no scroll explains and
+    # that leave most row bands in place (spinners, carets, video, a sticky
+    # header updating) are animation, not progress.
+    if prev.shape != curr.shape:
+        return True
+    shift = find_vertical_offset(prev.rows, curr.rows, min_overlap)
+    if shift is not None:
+        return shift > 0
+    changed = np.count_nonzero(prev.rows != curr.rows) / prev.rows.size
+    return changed >= max_animated
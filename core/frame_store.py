@@ -0,0 +1,301 @@
+import base64
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+JOURNAL_DATA = "frames.raw"
+JOURNAL_INDEX = "index.jsonl"
+JOURNAL_META = "session.json"
+SESSION_MAX_AGE = 7 * 24 * 3600  # Unsaved sessions are kept this many seconds
+
+
+def session_root():
+    return os.environ.get("SCREENSHOT_SESSIONS") or os.path.join(
+        os.path.expanduser("~"), ".screenshot_app", "sessions"
+    )
+
+
+def prune_sessions(max_age=SESSION_MAX_AGE):
+    # Deletes session journals nothing was written to for `max_age` seconds:
+    # they hold raw frames and are never saved or discarded otherwise.
+    # Returns the directories removed.
+    root = session_root()
+    if not os.path.isdir(root):
+        return []
+    cutoff = time.time() - max_age
+    removed = []
+    for name in os.listdir(root):
+        directory = os.path.join(root, name)
+        index_path = os.path.join(directory, JOURNAL_INDEX)
+        latest = index_path if os.path.exists(index_path) else directory
+        try:
+            if not os.path.isdir(directory) or os.path.getmtime(latest) > cutoff:
+                continue
+        except OSError:
+            continue  # Removed meanwhile
+        shutil.rmtree(directory, ignore_errors=True)
+        removed.append(directory)
+    return removed
+
+
+def _encode(value):
+    # Details as JSON; arrays become base64 with their dtype and shape
+    if isinstance(value, np.ndarray):
+        return {
+            "base64": base64.b64encode(np.ascontiguousarray(value)).decode(),
+            "dtype": value.dtype.str,
+            "shape": list(value.shape),
+        }
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        if "base64" in value:
+            data = base64.b64decode(value["base64"])
+            return np.frombuffer(data, np.dtype(value["dtype"])).reshape(value["shape"])
+        return {key: _decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+
+def new_session_dir():
+    # Named by start time; the random suffix keeps sessions started within
+    # the same second apart
+    root = session_root()
+    os.makedirs(root, exist_ok=True)
+    return tempfile.mkdtemp(dir=root, prefix=time.strftime("%Y%m%d-%H%M%S-"))
+
+
+class FrameStore:
+    # Keeps the `max_in_memory` most recent frames as arrays and spills older
+    # ones, in order, to one raw file. Spilled frames are read back as
+    # read-only np.memmap views, so nothing is decoded or copied on access.
+    #
+    # With `journal_dir` the raw file is a session journal instead: every
+    # frame is written through as it is appended and then recorded in an
+    # append-only index, so a crashed or closed session survives. Passing
+    # the directory of an existing journal reopens it; its frames start out
+    # spilled, so reopening costs one pass over the index, not the frames.
+    # Details appended with a frame (its signature, where it was stitched)
+    # are kept in the index too and handed back by take_details().
+    def __init__(self, max_in_memory=16, spill_dir=None, journal_dir=None, meta=None):
+        self.max_in_memory = max_in_memory
+        self.spill_dir = spill_dir
+        self.journal_dir = journal_dir
+        self.meta = meta or {}  # Session details kept next to the journal
+
+        # Each entry is an ndarray, or (offset, shape, dtype) once spilled.
+        # Only the oldest frames spill, so spilled entries are a prefix.
+        self._entries = []
+        self._spilled = 0
+        self._file = None
+        self._file_end = 0
+        self._lock = threading.Lock()
+        self._offsets = []  # Journal offset of every frame
+        self._index = None
+        self._details = []  # Of the frames a reopened journal held
+        if journal_dir is not None:
+            self._open_journal()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.get(index)
+
+    def _spill_file(self):
+        if self._file is None:
+            self._file = tempfile.NamedTemporaryFile(
+                prefix="frames-", suffix=".raw", dir=self.spill_dir, delete=False
+            )
+        return self._file
+
+    def _write(self, frame):
+        frame = np.ascontiguousarray(frame)
+        offset = self._file_end
+        f = self._spill_file()
+        f.seek(offset)
+        f.write(memoryview(frame).cast("B"))
+        f.flush()
+        self._file_end += frame.nbytes
+        return offset
+
+    def _spill_oldest(self):
+        frame = self._entries[self._spilled]
+        if self._index is not None:
+            offset = self._offsets[self._spilled]  # Already in the journal
+        else:
+            offset = self._write(frame)
+        self._entries[self._spilled] = (offset, frame.shape, frame.dtype)
+        self._spilled += 1
+
+    # ---- Session journal ----
+
+    def _open_journal(self):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        data_path = os.path.join(self.journal_dir, JOURNAL_DATA)
+        index_path = os.path.join(self.journal_dir, JOURNAL_INDEX)
+        meta_path = os.path.join(self.journal_dir, JOURNAL_META)
+
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = {**json.load(f), **self.meta}
+        with open(meta_path + ".part", "w") as f:
+            json.dump(self.meta, f)
+        os.replace(meta_path + ".part", meta_path)
+
+        records = []
+        if os.path.exists(index_path):
+            records = self._replay(index_path, data_path)
+        # The index is rewritten compacted (no pops, no torn tail) before
+        # anything is appended to it
+        with open(index_path + ".part", "w") as f:
+            f.writelines(json.dumps(record) + "\n" for record in records)
+        os.replace(index_path + ".part", index_path)
+
+        self._file = open(data_path, "r+b" if os.path.exists(data_path) else "w+b")
+        self._index = open(index_path, "a")
+        for record in records:
+            entry = (
+                record["offset"],
+                tuple(record["shape"]),
+                np.dtype(record["dtype"]),
+            )
+            self._entries.append(entry)
+            self._offsets.append(entry[0])
+            self._details.append(_decode(record.get("details")))
+        self._spilled = len(self._entries)
+        if records:
+            offset, shape, dtype = self._entries[-1]
+            self._file_end = offset + int(np.prod(shape)) * dtype.itemsize
+
+    @staticmethod
+    def _replay(index_path, data_path):
+        # A crash can leave a torn last line, or a record whose frame never
+        # fully reached the data file; both end the replay
+        size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+        records = []
+        with open(index_path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if record.get("pop"):
+                    if records:
+                        records.pop()
+                    continue
+                nbytes = (
+                    int(np.prod(record["shape"])) * np.dtype(record["dtype"]).itemsize
+                )
+                if record["offset"] + nbytes > size:
+                    break
+                records.append(record)
+        return records
+
+    def _log(self, record):
+        # The frame data is flushed before its record, so the index never
+        # points at bytes that are not there. Flushing (not fsync) survives
+        # an app crash; close() syncs to disk.
+        self._index.write(json.dumps(record) + "\n")
+        self._index.flush()
+
+    def append(self, frame, details=None):
+        # `details` (JSON values and arrays) is only kept in a journal
+        with self._lock:
+            if self._index is not None:
+                offset = self._write(frame)
+                self._offsets.append(offset)
+                record = {
+                    "offset": offset,
+                    "shape": list(frame.shape),
+                    "dtype": frame.dtype.str,
+                }
+                if details is not None:
+                    record["details"] = _encode(details)
+                self._log(record)
+            self._entries.append(frame)
+            while len(self._entries) - self._spilled > self.max_in_memory:
+                self._spill_oldest()
+            return len(self._entries) - 1
+
+    def get(self, index):
+        with self._lock:
+            entry = self._entries[index]
+            if isinstance(entry, np.ndarray):
+                return entry
+            offset, shape, dtype = entry
+            return np.memmap(
+                self._file, dtype=dtype, mode="r", offset=offset, shape=shape
+            )
+
+    def pop(self):
+        with self._lock:
+            if not self._entries:
+                return False
+            entry = self._entries.pop()
+            del self._details[len(self._entries) :]
+            if self._index is not None:
+                self._log({"pop": True})
+                self._file_end = self._offsets.pop()
+            elif not isinstance(entry, np.ndarray):
+                # Space at the end of the file is reused by the next spill
+                self._file_end = entry[0]
+            if not isinstance(entry, np.ndarray):
+                self._spilled -= 1
+            return True
+
+    def take_details(self):
+        # Details of the frames the journal held when it was reopened, None
+        # for frames journaled without any; handed over once
+        with self._lock:
+            details, self._details = self._details, []
+            return details
+
+    def nbytes_in_memory(self):
+        with self._lock:
+            return sum(frame.nbytes for frame in self._entries[self._spilled :])
+
+    def close(self):
+        # Temporary spill files are deleted; a journal is kept for resuming
+        with self._lock:
+            self._entries = []
+            self._offsets = []
+            self._details = []
+            self._spilled = 0
+            if self._index is not None:
+                self._index.close()
+                self._index = None
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+            elif self._file is not None:
+                self._file.close()
+                try:
+                    os.remove(self._file.name)
+                except OSError:
+                    pass  # Still mapped somewhere (Windows); left in temp dir
+                self._file = None
+            self._file_end = 0
+
+    def discard(self):
+        # Closes the store and deletes its journal, once it is not needed
+        self.close()
+        if self.journal_dir is not None:
+            shutil.rmtree(self.journal_dir, ignore_errors=True)
+
+
+def is_journal(directory):
+    return os.path.exists(os.path.join(directory, JOURNAL_INDEX))
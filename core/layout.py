@@ -0,0 +1,158 @@
+from collections import defaultdict
+
+import numpy as np
+
+
+class ImageLayout:
+    # Positions, sizes and z-order of placed images in world pixels, kept in
+    # parallel numpy arrays (one slot per image) plus a uniform grid that
+    # maps each cell to the images overlapping it. Hit tests, viewport
+    # queries and snapping only look at the images in the touched cells.
+    def __init__(self, cell_size=512, capacity=64):
+        self.cell_size = cell_size
+        self._rects = np.zeros((capacity, 4), np.float64)  # x, y, w, h
+        self._z = np.zeros(capacity, np.int64)
+        self._ids = np.zeros(capacity, np.int64)
+        self._slots = {}  # image_id → slot
+        self._count = 0
+        self._next_z = 0
+        self._grid = defaultdict(set)  # (cell_x, cell_y) → image_ids
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, image_id):
+        return image_id in self._slots
+
+    def _cells(self, x, y, w, h):
+        size = self.cell_size
+        x0, y0 = int(x // size), int(y // size)
+        x1, y1 = int((x + w) // size), int((y + h) // size)
+        return [(cx, cy) for cy in range(y0, y1 + 1) for cx in range(x0, x1 + 1)]
+
+    def _index(self, image_id, add):
+        x, y, w, h = self._rects[self._slots[image_id]]
+        for cell in self._cells(x, y, w, h):
+            if add:
+                self._grid[cell].add(image_id)
+            else:
+                self._grid[cell].discard(image_id)
+                if not self._grid[cell]:
+                    del self._grid[cell]
+
+    def add(self, image_id, x, y, w, h):
+        if self._count == len(self._ids):
+            grow = len(self._ids)
+            self._rects = np.concatenate([self._rects, np.zeros((grow, 4))])
+            self._z = np.concatenate([self._z, np.zeros(grow, np.int64)])
+            self._ids = np.concatenate([self._ids, np.zeros(grow, np.int64)])
+
+        slot = self._count
+        self._count += 1
+        self._rects[slot] = (x, y, w, h)
+        self._z[slot] = self._next_z
+        self._ids[slot] = image_id
+        self._next_z += 1
+        self._slots[image_id] = slot
+        self._index(image_id, add=True)
+
+    def remove(self, image_id):
+        # The last slot moves into the hole, so removal is O(1)
+        self._index(image_id, add=False)
+        slot = self._slots.pop(image_id)
+        last = self._count - 1
+        if slot != last:
+            self._rects[slot] = self._rects[last]
+            self._z[slot] = self._z[last]
+            self._ids[slot] = self._ids[last]
+            self._slots[int(self._ids[slot])] = slot
+        self._count = last
+
+    def move(self, image_id, x, y):
+        self._index(image_id, add=False)
+        self._rects[self._slots[image_id], :2] = (x, y)
+        self._index(image_id, add=True)
+
+    def rect(self, image_id):
+        x, y, w, h = self._rects[self._slots[image_id]]
+        return float(x), float(y), float(w), float(h)
+
+    def raise_to_top(self, image_id):
+        self._z[self._slots[image_id]] = self._next_z
+        self._next_z += 1
+
+    def ordered(self, image_ids=None):
+        # Bottom to top; all images, or just the given ones
+        if image_ids is None:
+            slots = np.arange(self._count)
+        else:
+            slots = np.fromiter(
+                (self._slots[i] for i in image_ids), np.int64, len(image_ids)
+            )
+        slots = slots[np.argsort(self._z[slots], kind="stable")]
+        return [int(i) for i in self._ids[slots]]
+
+    def query(self, x0, y0, x1, y1):
+        # image_ids whose rectangles intersect the given world rectangle
+        found = set()
+        for cell in self._cells(x0, y0, x1 - x0, y1 - y0):
+            found |= self._grid.get(cell, set())
+        result = []
+        for image_id in found:
+            x, y, w, h = self._rects[self._slots[image_id]]
+            if x < x1 and x + w > x0 and y < y1 and y + h > y0:
+                result.append(image_id)
+        return result
+
+    def hit_test(self, x, y):
+        # Topmost image containing the world point, or None
+        candidates = self._grid.get(
+            (int(x // self.cell_size), int(y // self.cell_size)), ()
+        )
+        best = None
+        for image_id in candidates:
+            slot = self._slots[image_id]
+            rx, ry, rw, rh = self._rects[slot]
+            if rx <= x < rx + rw and ry <= y < ry + rh:
+                if best is None or self._z[slot] > self._z[self._slots[best]]:
+                    best = image_id
+        return best
+
+    def snap(self, image_id, x, y, threshold):
+        # Nudges (x, y) so an edge lines up with a neighbouring image's edge
+        # when it is within `threshold` world pixels
+        _, _, w, h = self.rect(image_id)
+        neighbours = [
+            i
+            for i in self.query(
+                x - threshold, y - threshold, x + w + threshold, y + h + threshold
+            )
+            if i != image_id
+        ]
+        if not neighbours:
+            return x, y
+
+        slots = np.fromiter((self._slots[i] for i in neighbours), np.int64)
+        nx, ny, nw, nh = self._rects[slots].T
+        return (
+            x + self._best_offset(x, w, nx, nw, threshold),
+            y + self._best_offset(y, h, ny, nh, threshold),
+        )
+
+    @staticmethod
+    def _best_offset(start, size, n_start, n_size, threshold):
+        targets = np.concatenate([n_start, n_start + n_size])
+        offsets = np.concatenate([targets - start, targets - (start + size)])
+        best = offsets[np.argmin(np.abs(offsets))]
+        return float(best) if abs(best) <= threshold else 0.0
+
+    def bounds(self):
+        if not self._count:
+            return None
+        rects = self._rects[: self._count]
+        return (
+            float(rects[:, 0].min()),
+            float(rects[:, 1].min()),
+            float((rects[:, 0] + rects[:, 2]).max()),
+            float((rects[:, 1] + rects[:, 3]).max()),
+        )
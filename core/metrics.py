@@ -0,0 +1,175 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+
+class Metrics:
+    # Timers and counters for one capture session, safe to use from any
+    # thread. Spans also go into a bounded ring for trace export; per-stage
+    # totals are kept separately, so summaries stay exact when it wraps.
+    def __init__(self, max_events=100_000):
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=max_events)  # (name, thread, start, secs)
+        self._stats = {}  # name → [count, total secs, max secs]
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter() - start)
+
+    def timed(self, name, func, *args):
+        # For pool.submit: times func(*args) on the worker that runs it
+        with self.span(name):
+            return func(*args)
+
+    def record(self, name, start, seconds):
+        with self._lock:
+            self._events.append((name, threading.get_ident(), start, seconds))
+            stats = self._stats.get(name)
+            if stats is None:
+                self._stats[name] = [1, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = max(stats[2], seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def rate(self, name, window=1.0):
+        # Spans of `name` per second over the last `window` seconds
+        cutoff = time.perf_counter() - window
+        with self._lock:
+            recent = 0
+            for event_name, _, start, _ in reversed(self._events):
+                if start < cutoff:
+                    break
+                recent += event_name == name
+        return recent / window
+
+    def summary(self):
+        with self._lock:
+            stages = {
+                name: {
+                    "count": count,
+                    "total_ms": total * 1e3,
+                    "mean_ms": total / count * 1e3,
+                    "max_ms": longest * 1e3,
+                }
+                for name, (count, total, longest) in self._stats.items()
+            }
+            return {"stages": stages, "counters": dict(self.counters)}
+
+    def chrome_trace(self):
+        # Chrome trace event format (chrome://tracing, Perfetto); the
+        # summary rides along in otherData
+        with self._lock:
+            events = list(self._events)
+        pid = os.getpid()
+        trace = [
+            {
+                "name": name,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": seconds * 1e6,
+                "pid": pid,
+                "tid": thread,
+            }
+            for name, thread, start, seconds in events
+        ]
+        return {
+            "traceEvents": trace,
+            "displayTimeUnit": "ms",
+            "otherData": self.summary(),
+        }
+
+    def save_trace(self, path):
+        with open(path + ".part", "w") as f:
+            json.dump(self.chrome_trace(), f)
+        os.replace(path + ".part", path)
+
+
+def hud_text(metrics, pipeline=None):
+    # One line for the capture window: grab rate, kept and skipped frames,
+    # backlog and memory
+    parts = [
+        f"{metrics.rate('grab'):.1f} fps",
+        f"{metrics.counters['frames']} kept",
+        f"{metrics.counters['duplicates']} skipped",
+    ]
+    if pipeline is not None:
+        parts.append(f"queue {pipeline.backlog()}")
+    rss = rss_bytes()
+    if rss:
+        parts.append(f"{rss / 2**20:.0f} MB")
+    return "📈 " + " · ".join(parts)
+
+
+def trace_path(name):
+    # Where a session's trace goes, if $SCREENSHOT_TRACE_DIR asks for one
+    directory = os.environ.get("SCREENSHOT_TRACE_DIR")
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{name}-trace.json")
+
+
+# ---- Process memory ----
+
+
+def rss_bytes():
+    # Current resident set size, or None where it cannot be read cheaply
+    if sys.platform == "win32":
+        return _windows_memory_counters().WorkingSetSize
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return _windows_memory_counters().PeakWorkingSetSize
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _windows_memory_counters():
+    import ctypes
+    from ctypes import wintypes
+
+    class Counters(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = Counters()
+    counters.cb = ctypes.sizeof(counters)
+    ctypes.windll.psapi.GetProcessMemoryInfo(
+        ctypes.windll.kernel32.GetCurrentProcess(),
+        ctypes.byref(counters),
+        counters.cb,
+    )
+    return counters
@@ -16,8 +16,18 @@ class OverlayBox:
         self.overlay.attributes("-alpha", 0.3)
 
         self._dragging = False
+        self._destroyed = False
         self._init_resize_handle()
         self._bind_drag()
+        # The window reports every move and resize, so region() never has to
+        # ask Tk or parse a geometry string
+        self.overlay.bind("<Configure>", self._on_configure)
+
+    def _on_configure(self, event):
+        # Undecorated, so the event's position is already on the screen
+        if event.widget is self.overlay:
+            self.x1, self.y1 = event.x, event.y
+            self.x2, self.y2 = event.x + event.width, event.y + event.height
 
     def _init_resize_handle(self):
         handle_size = 15
@@ -81,6 +91,10 @@ class OverlayBox:
         self.overlay.after(100, lambda: self.overlay.attributes("-topmost", False))
 
     def focus_overlay(self):
+        # Grab threads post this and deiconify through the event bus; the
+        # session may have destroyed the overlay by the time they run
+        if self._destroyed:
+            return
         self.overlay.lift()
         self.overlay.focus_force()
 
@@ -88,13 +102,20 @@ class OverlayBox:
         self.overlay.withdraw()
 
     def deiconify(self):
-        self.overlay.deiconify()
+        if not self._destroyed:
+            self.overlay.deiconify()
 
     def destroy(self):
-        self.overlay.destroy()
+        if not self._destroyed:
+            self._destroyed = True
+            self.overlay.destroy()
 
     def geometry(self):
         return self.overlay.geometry()
 
+    def region(self):
+        # (x1, y1, x2, y2) in Tk screen coordinates, as of the last move
+        return self.x1, self.y1, self.x2, self.y2
+
     def get_widget(self):
         return self.overlay
@@ -0,0 +1,364 @@
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from core.stitcher import VerticalStitcher
+
+# Stitching for content that scrolls sideways or both ways (spreadsheets,
+# timelines, diagrams). Offsets between frames come from a coarse-to-fine
+# search over grayscale pyramids, and tiles are laid out on a sparse canvas
+# that only allocates the parts some frame covers.
+
+TILE_SIZE = 512
+MIN_PYRAMID_SIDE = 128  # Coarsest level is the last one at least this big
+
+
+class FramePyramid:
+    # Grayscale levels of a frame, full resolution first, plus the spectra
+    # of the coarsest level that the exhaustive search correlates against
+    __slots__ = ("levels", "spectrum", "squares_spectrum")
+
+    def __init__(self, levels):
+        self.levels = levels
+        coarse = levels[-1].astype(np.float64)
+        shape = _padded(coarse.shape)
+        self.spectrum = np.fft.rfft2(coarse, shape)
+        self.squares_spectrum = np.fft.rfft2(coarse**2, shape)
+
+
+def build_pyramid(frame, min_side=MIN_PYRAMID_SIDE):
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    levels = [gray]
+    while min(levels[-1].shape) >= 2 * min_side:
+        levels.append(cv2.pyrDown(levels[-1]))
+    return FramePyramid(levels)
+
+
+def _padded(shape):
+    # Zero padding to twice the size keeps the FFT correlation from wrapping
+    return (2 * shape[0], 2 * shape[1])
+
+
+_overlap_cache = {}
+
+
+def _overlap_terms(shape):
+    # Per coarse shape: spectrum of an all-ones frame, and the overlap area
+    # of every shift
+    terms = _overlap_cache.get(shape)
+    if terms is None:
+        padded = _padded(shape)
+        ones = np.fft.rfft2(np.ones(shape), padded)
+        area = np.rint(np.fft.irfft2(ones * np.conj(ones), padded))
+        terms = _overlap_cache[shape] = (ones, area)
+    return terms
+
+
+def _overlap_error(prev, curr, dx, dy):
+    # Mean absolute difference where curr, placed at (dx, dy) in prev's
+    # coordinates, overlaps prev, and the overlap area; None without overlap
+    height, width = prev.shape
+    x0, x1 = max(0, dx), min(width, dx + curr.shape[1])
+    y0, y1 = max(0, dy), min(height, dy + curr.shape[0])
+    if x1 <= x0 or y1 <= y0:
+        return None
+    diff = cv2.absdiff(prev[y0:y1, x0:x1], curr[y0 - dy : y1 - dy, x0 - dx : x1 - dx])
+    return float(diff.mean()), (x1 - x0) * (y1 - y0)
+
+
+def _coarse_offset(prev, curr, min_area):
+    # Exhaustive search on the coarsest level: the squared difference over
+    # the overlap, sum(p²) + sum(c²) - 2·sum(p·c), is a sum of three
+    # correlations, so one inverse FFT scores every shift at once. The best
+    # shift with at least min_area pixels of overlap wins.
+    shape = prev.levels[-1].shape
+    padded = _padded(shape)
+    ones, area = _overlap_terms(shape)
+    error = np.fft.irfft2(
+        prev.squares_spectrum * np.conj(ones)
+        + ones * np.conj(curr.squares_spectrum)
+        - 2 * prev.spectrum * np.conj(curr.spectrum),
+        padded,
+    ) / np.maximum(area, 1)
+    error[area < min_area] = np.inf
+
+    dy, dx = np.unravel_index(np.argmin(error), padded)
+    if not np.isfinite(error[dy, dx]):
+        return None
+    # Indices past the frame size are negative shifts that wrapped around
+    return (
+        int(dx - padded[1] if dx >= shape[1] else dx),
+        int(dy - padded[0] if dy >= shape[0] else dy),
+    )
+
+
+def find_offset_2d(prev_pyramid, curr_pyramid, min_overlap=0.1, max_error=2.0):
+    # (dx, dy) such that curr[y, x] == prev[y + dy, x + dx], or None. Every
+    # shift is tried on the coarsest level; each finer level only checks ±1
+    # pixel around the doubled estimate, so the full-resolution frames are
+    # compared at 9 shifts.
+    if prev_pyramid.levels[0].shape != curr_pyramid.levels[0].shape:
+        return None
+    coarse = prev_pyramid.levels[-1]
+    offset = _coarse_offset(prev_pyramid, curr_pyramid, min_overlap * coarse.size)
+    if offset is None:
+        return None
+
+    dx, dy = offset
+    for level in range(len(prev_pyramid.levels) - 2, -1, -1):
+        prev, curr = prev_pyramid.levels[level], curr_pyramid.levels[level]
+        min_area = min_overlap * prev.size
+        center_x, center_y = dx * 2, dy * 2
+        best = None
+        for y in range(center_y - 1, center_y + 2):
+            for x in range(center_x - 1, center_x + 2):
+                scored = _overlap_error(prev, curr, x, y)
+                if scored is None or scored[1] < min_area:
+                    continue
+                if best is None or scored[0] < best[0]:
+                    best = (scored[0], x, y)
+        if best is None:
+            return None
+        _, dx, dy = best
+
+    error = _overlap_error(prev_pyramid.levels[0], curr_pyramid.levels[0], dx, dy)
+    if error is None or error[0] > max_error:
+        return None
+    return dx, dy
+
+
+class TileCanvas:
+    # Sparse image in square tiles, allocated when a frame first covers
+    # them. Each tile has a coverage mask; pasting only fills pixels that
+    # are not covered yet, so the first frame to show a spot keeps it.
+    def __init__(self, tile_size=TILE_SIZE):
+        self.tile_size = tile_size
+        self.channels = ()  # Trailing pixel shape and dtype, from the frames
+        self.dtype = np.uint8
+        self._tiles = {}  # (tile row, tile col) → [pixels, covered]
+
+    def __len__(self):
+        return len(self._tiles)
+
+    @property
+    def nbytes(self):
+        return sum(
+            pixels.nbytes + covered.nbytes for pixels, covered in self._tiles.values()
+        )
+
+    def _spans(self, start, length):
+        # (tile index, slice in tile, slice in source) along one axis
+        size = self.tile_size
+        end = start + length
+        for tile in range(start // size, -(-end // size)):
+            lo, hi = max(start, tile * size), min(end, (tile + 1) * size)
+            yield tile, slice(lo - tile * size, hi - tile * size), slice(
+                lo - start, hi - start
+            )
+
+    def paste(self, frame, x, y):
+        # Returns the mask of pixels this frame covered first
+        self.channels, self.dtype = frame.shape[2:], frame.dtype
+        fresh = np.zeros(frame.shape[:2], dtype=bool)
+        for row, tile_rows, frame_rows in self._spans(y, frame.shape[0]):
+            for col, tile_cols, frame_cols in self._spans(x, frame.shape[1]):
+                part = frame[frame_rows, frame_cols]
+                tile = self._tiles.get((row, col))
+                if tile is None:
+                    size = self.tile_size
+                    tile = self._tiles[row, col] = [
+                        np.zeros((size, size) + frame.shape[2:], dtype=frame.dtype),
+                        np.zeros((size, size), dtype=bool),
+                    ]
+                pixels, covered = tile
+                new = ~covered[tile_rows, tile_cols]
+                if new.all():
+                    pixels[tile_rows, tile_cols] = part
+                else:
+                    pixels[tile_rows, tile_cols][new] = part[new]
+                covered[tile_rows, tile_cols] |= new
+                fresh[frame_rows, frame_cols] = new
+        return fresh
+
+    def erase(self, x, y, fresh):
+        # Undoes a paste given the mask it returned
+        for row, tile_rows, frame_rows in self._spans(y, fresh.shape[0]):
+            for col, tile_cols, frame_cols in self._spans(x, fresh.shape[1]):
+                tile = self._tiles.get((row, col))
+                if tile is None:
+                    continue
+                pixels, covered = tile
+                mask = fresh[frame_rows, frame_cols]
+                pixels[tile_rows, tile_cols][mask] = 0
+                covered[tile_rows, tile_cols] &= ~mask
+                if not covered.any():
+                    del self._tiles[row, col]
+
+    def bounds(self):
+        # (x0, y0, x1, y1) of the covered pixels, or None
+        if not self._tiles:
+            return None
+        size = self.tile_size
+        x0 = y0 = float("inf")
+        x1 = y1 = float("-inf")
+        for (row, col), (_, covered) in self._tiles.items():
+            rows = np.flatnonzero(covered.any(axis=1))
+            cols = np.flatnonzero(covered.any(axis=0))
+            y0, y1 = min(y0, row * size + rows[0]), max(y1, row * size + rows[-1] + 1)
+            x0, x1 = min(x0, col * size + cols[0]), max(x1, col * size + cols[-1] + 1)
+        return int(x0), int(y0), int(x1), int(y1)
+
+    def read(self, x0, y0, x1, y1):
+        # Dense copy of a window; uncovered pixels are black
+        out = None
+        for row, tile_rows, out_rows in self._spans(y0, y1 - y0):
+            for col, tile_cols, out_cols in self._spans(x0, x1 - x0):
+                tile = self._tiles.get((row, col))
+                if tile is None:
+                    continue
+                pixels = tile[0]
+                if out is None:
+                    out = np.zeros((y1 - y0, x1 - x0) + pixels.shape[2:], pixels.dtype)
+                out[out_rows, out_cols] = pixels[tile_rows, tile_cols]
+        return out
+
+
+class CanvasImage:
+    # Array-like window onto a TileCanvas. Slicing it as image[rows, cols]
+    # reads only the tiles the slice touches, so exporters can write a huge
+    # panorama without ever holding it densely; np.asarray(image) builds the
+    # dense copy for formats that need one.
+    def __init__(self, canvas, bounds):
+        self.canvas = canvas
+        self.x0, self.y0, x1, y1 = bounds
+        self.shape = (y1 - self.y0, x1 - self.x0) + canvas.channels
+        self.ndim = len(self.shape)
+        self.dtype = np.dtype(canvas.dtype)
+
+    @property
+    def nbytes(self):
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def __getitem__(self, key):
+        rows, cols = key if isinstance(key, tuple) else (key, slice(None))
+        y0, y1, _ = rows.indices(self.shape[0])
+        x0, x1, _ = cols.indices(self.shape[1])
+        y1, x1 = max(y0, y1), max(x0, x1)
+        window = None
+        if y1 > y0 and x1 > x0:
+            window = self.canvas.read(
+                self.x0 + x0, self.y0 + y0, self.x0 + x1, self.y0 + y1
+            )
+        if window is None:
+            window = np.zeros((y1 - y0, x1 - x0) + self.shape[2:], self.dtype)
+        return window
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self[:, :]
+        return dense if dtype is None else dense.astype(dtype)
+
+
+class PanoramaStitcher:
+    # Same interface as VerticalStitcher, for horizontal and 2D captures.
+    # Each frame is matched against the last few frames (a grid captured
+    # row by row overlaps the row above, not the frame before it); a frame
+    # that matches none is placed below everything so far.
+    def __init__(self, min_overlap=0.1, max_error=2.0, search_recent=8):
+        self.min_overlap = min_overlap  # Share of the frame that must overlap
+        self.max_error = max_error  # Mean gray difference accepted as a match
+        self.search_recent = search_recent
+
+        self.canvas = TileCanvas()
+        self._history = []  # Per frame: (x, y, packed first-covered mask, shape)
+        # Frame index → pyramid, recent only. A replayed frame is kept as is
+        # until a new frame is matched against it.
+        self._pyramids = OrderedDict()
+
+    def __len__(self):
+        return len(self._history)
+
+    def _place(self, pyramid):
+        for index in list(reversed(self._pyramids)):
+            recent = self._pyramids[index]
+            if not isinstance(recent, FramePyramid):
+                recent = self._pyramids[index] = build_pyramid(recent)
+            offset = find_offset_2d(recent, pyramid, self.min_overlap, self.max_error)
+            if offset is not None:
+                x, y = self._history[index][:2]
+                return x + offset[0], y + offset[1]
+        bounds = self.canvas.bounds()
+        return (0, 0) if bounds is None else (bounds[0], bounds[3])
+
+    def add(self, frame):
+        # Returns the frame's (x, y) on the canvas
+        pyramid = build_pyramid(frame)
+        x, y = self._place(pyramid)
+        self._paste(frame, x, y, pyramid)
+        return x, y
+
+    def _paste(self, frame, x, y, pyramid):
+        fresh = self.canvas.paste(frame, x, y)
+        self._pyramids[len(self._history)] = pyramid
+        while len(self._pyramids) > self.search_recent:
+            self._pyramids.popitem(last=False)
+        self._history.append((x, y, np.packbits(fresh), fresh.shape))
+
+    def placement(self):
+        # Where the newest frame went, for a journal to replay it
+        x, y = self._history[-1][:2]
+        return {"x": int(x), "y": int(y)}
+
+    def replay(self, frame, placement):
+        # Re-adds a frame at its recorded position, without matching it
+        self._paste(frame, placement["x"], placement["y"], frame)
+
+    def pop(self):
+        if not self._history:
+            return False
+        x, y, packed, shape = self._history.pop()
+        self._pyramids.pop(len(self._history), None)
+        fresh = np.unpackbits(packed, count=shape[0] * shape[1]).reshape(shape)
+        self.canvas.erase(x, y, fresh.astype(bool))
+        return True
+
+    def positions(self):
+        # (x, y) of every frame, relative to the canvas' top-left corner
+        bounds = self.canvas.bounds()
+        if bounds is None:
+            return []
+        return [(x - bounds[0], y - bounds[1]) for x, y, _, _ in self._history]
+
+    def result(self):
+        # Dense composite; exporters take image() instead
+        bounds = self.canvas.bounds()
+        if bounds is None:
+            return None
+        return self.canvas.read(*bounds)
+
+    def image(self):
+        # The composite as a CanvasImage, read tile by tile, or None
+        bounds = self.canvas.bounds()
+        if bounds is None:
+            return None
+        return CanvasImage(self.canvas, bounds)
+
+
+LAYOUTS = {
+    "vertical": VerticalStitcher,
+    "panorama": PanoramaStitcher,
+}
+
+
+def create_stitcher(layout="vertical", feather=0):
+    if layout == "vertical":
+        return VerticalStitcher(feather=feather)
+    return LAYOUTS[layout]()  # Tiles keep the first frame's pixels; no seams
+
+
+def stitch_panorama(frames, min_overlap=0.1, max_error=2.0):
+    # A CanvasImage: exporters write it piecewise, np.asarray makes it dense
+    stitcher = PanoramaStitcher(min_overlap, max_error)
+    for frame in frames:
+        stitcher.add(frame)
+    return stitcher.image()
@@ -0,0 +1,203 @@
+import queue
+import threading
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import cv2
+from PIL import Image
+
+from core.dedupe import DuplicateIndex
+from core.events import event_bus
+from core.frame_signature import compute_signature
+from core.metrics import Metrics
+
+THUMB_SIZE = (240, 180)
+
+_STOP = object()
+_RESTORE = object()
+
+
+def make_thumbnail(frame, size=THUMB_SIZE):
+    height, width = frame.shape[:2]
+    scale = min(size[0] / width, size[1] / height, 1.0)
+    small = cv2.resize(
+        frame,
+        (max(1, int(width * scale)), max(1, int(height * scale))),
+        interpolation=cv2.INTER_AREA,
+    )
+    return Image.fromarray(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+
+
+def _resolved(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+class CapturePipeline:
+    # grab -> signature (pool) -> dedupe + store + stitch (in order) ->
+    # thumbnail (pool) -> deliver to Tk. Stages are joined by bounded queues,
+    # so a slow stage applies backpressure instead of letting frames pile up.
+    # Results reach the Tk thread only through the root's EventBus, a queue
+    # it polls with after(): workers never wait on Tk, so drain() and
+    # submit() may block the Tk thread without deadlocking.
+    def __init__(
+        self,
+        root,
+        stitcher,
+        store,
+        on_frame,
+        on_duplicate=None,
+        workers=2,
+        max_pending=8,
+        duplicate_threshold=0.0,
+        metrics=None,
+    ):
+        self.root = event_bus(root)  # after() is safe from the worker threads
+        self.stitcher = stitcher
+        self.store = store
+        self.on_frame = on_frame  # (frame_index, thumb, signature) on the Tk thread
+        # (index of the earlier frame) on the Tk thread
+        self.on_duplicate = on_duplicate
+        self.duplicate_threshold = duplicate_threshold
+        self.metrics = metrics or Metrics()  # Per-session stage timings
+
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._analyze_queue = queue.Queue(maxsize=max_pending)
+        self._deliver_queue = queue.Queue(maxsize=max_pending)
+        # Every kept frame, so a view captured twice is skipped even when
+        # other frames came in between
+        self.duplicates = DuplicateIndex()
+        # Guards the store, the stitcher and the duplicate index, which the
+        # analyze thread appends to while the Tk thread may undo
+        self._lock = threading.Lock()
+
+        self._threads = [
+            threading.Thread(target=self._analyze_loop, daemon=True),
+            threading.Thread(target=self._deliver_loop, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, frame, signature=None):
+        # Blocks while the pipeline is full; that wait is timed as backpressure
+        if signature is None:
+            pending = self._pool.submit(
+                self.metrics.timed, "signature", compute_signature, frame
+            )
+        else:
+            pending = _resolved(signature)
+        with self.metrics.span("submit_wait"):
+            self._analyze_queue.put((frame, pending))
+
+    def backlog(self):
+        return self._analyze_queue.qsize() + self._deliver_queue.qsize()
+
+    def _analyze_loop(self):
+        while True:
+            item = self._analyze_queue.get()
+            try:
+                if item is _STOP:
+                    self._deliver_queue.put(_STOP)
+                    return
+
+                frame, pending = item
+                if frame is _RESTORE:
+                    self._restore(*pending)
+                    continue
+                signature = pending.result()
+                metrics = self.metrics
+                with self._lock:
+                    with metrics.span("dedupe"):
+                        match = self.duplicates.find(
+                            signature, self.duplicate_threshold
+                        )
+                    if match is not None:
+                        metrics.count("duplicates")
+                        if self.on_duplicate:
+                            self.root.after(0, self.on_duplicate, match)
+                        continue
+
+                    # Stored only once stitched, and unstitched if storing
+                    # fails, so undo() always pops the same frame from both
+                    with metrics.span("stitch"):
+                        self.stitcher.add(frame)
+                    # A journal keeps both, so a resumed session is rebuilt
+                    # without hashing or matching its frames again
+                    details = {
+                        "signature": signature.to_dict(),
+                        "placement": self.stitcher.placement(),
+                    }
+                    try:
+                        # With a journal this writes the raw frame to disk
+                        # right here, holding the lock; the "store" span
+                        # shows what that costs the stage
+                        with metrics.span("store"):
+                            index = self.store.append(frame, details)
+                    except Exception:
+                        self.stitcher.pop()
+                        raise
+                    self.duplicates.add(index, signature)
+                    metrics.count("frames")
+                thumb = self._pool.submit(
+                    metrics.timed, "thumbnail", make_thumbnail, frame
+                )
+                self._deliver_queue.put((index, thumb, signature))
+            except Exception:
+                traceback.print_exc()
+            finally:
+                self._analyze_queue.task_done()
+
+    def _deliver_loop(self):
+        while True:
+            item = self._deliver_queue.get()
+            try:
+                if item is _STOP:
+                    return
+                index, thumb, signature = item
+                self.root.after(0, self.on_frame, index, thumb.result(), signature)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                self._deliver_queue.task_done()
+
+    def restore(self, signatures, placements=()):
+        # Rebuilds the stitcher and the duplicate index for the frames
+        # already in the store, e.g. of a resumed session. It runs as a job
+        # of the analyze stage, so the caller does not wait for it and new
+        # frames are stitched after it.
+        self._analyze_queue.put((_RESTORE, (signatures, placements)))
+
+    def _restore(self, signatures, placements):
+        # Frames are replayed where the journal recorded them; only those
+        # journaled without a placement are matched again
+        with self._lock:
+            with self.metrics.span("restore"):
+                for index, placement in enumerate(placements):
+                    frame = self.store.get(index)
+                    if placement is None:
+                        self.stitcher.add(frame)
+                    else:
+                        self.stitcher.replay(frame, placement)
+            for index, signature in signatures.items():
+                self.duplicates.add(index, signature)
+
+    def undo(self):
+        # Drops the newest frame from the stitcher, the store and the
+        # duplicate index together
+        with self._lock:
+            if not self.stitcher.pop():
+                return False
+            self.store.pop()
+            self.duplicates.remove(len(self.store))
+            return True
+
+    def drain(self):
+        self._analyze_queue.join()
+        self._deliver_queue.join()
+
+    def close(self):
+        self._analyze_queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._pool.shutdown(wait=True)
@@ -1,142 +1,325 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 
-from PIL import Image, ImageTk
+import cv2
+import numpy as np
+from PIL import ImageTk
+
+from core.arrange import arrange
+from core.compositor import composite
+from core.export import (
+    EXPORT_FILETYPES,
+    EXPORT_PRESETS,
+    export_image_async,
+    show_progress_in_title,
+)
+from core.frame_signature import compute_signature
+from core.layout import ImageLayout
+from core.tiles import TILE_SIZE, ImagePyramid, TileCache
+
+MIN_ZOOM = 0.05
+MAX_ZOOM = 4.0
+RENDER_INTERVAL_MS = 16  # ~60 fps while panning, zooming or dragging
+SNAP_DISTANCE = 8  # Screen pixels within which dragged edges snap
+
+
+class _PlacedImage:
+    def __init__(self, image, signature=None):
+        self.image = image  # Full-resolution PIL image
+        self.pyramid = ImagePyramid(image)
+        self.signature = signature  # FrameSignature, computed on first arrange
+
+    def get_signature(self):
+        if self.signature is None:
+            # Same BGR input the capture pipeline signs, so both kinds match
+            rgb = np.asarray(self.image.convert("RGB"))
+            self.signature = compute_signature(cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+        return self.signature
 
 
 class ImagePreviewCanvas:
+    # Images live in world coordinates (full-resolution pixels) in an
+    # ImageLayout. The view maps them to the screen with `zoom` and
+    # `offset_x/offset_y`, and only the tiles that intersect the visible
+    # area are materialized.
     def __init__(self, parent_frame):
         self.canvas = tk.Canvas(parent_frame, bg="#1e1e1e")
         self.canvas.pack(fill="both", expand=True)
 
-        self.images = []  # List of ImageTk references
-        self.image_items = []  # List of canvas item IDs
-        self.image_meta = {}  # Dict: canvas_item_id → full PIL image
+        self.placed = {}  # Dict: image_id → _PlacedImage
+        self.layout = ImageLayout()  # Positions, sizes and z-order
+        self._next_id = 0
+
+        self.zoom = 0.5  # Screen pixels per world pixel
+        self.offset_x = 0
+        self.offset_y = 0
+        self.tiles = TileCache()
+        self._displayed = {}  # Dict: tile key → (canvas item, PhotoImage)
+        self._render_pending = None
+
         self.drag_data = {}  # Temporary drag state
+        self.export_options = EXPORT_PRESETS["Balanced"]
+        self.blend_mode = "replace"  # Or "average" to blend overlaps
 
         # Bind mouse events
         self.canvas.bind("<ButtonPress-1>", self.on_press)
         self.canvas.bind("<B1-Motion>", self.on_drag)
-
-    def add_image(self, pil_image):
+        self.canvas.bind("<ButtonRelease-1>", self.on_release)
+        self.canvas.bind("<ButtonPress-2>", self.on_pan_start)
+        self.canvas.bind("<B2-Motion>", self.on_pan)
+        self.canvas.bind("<Control-MouseWheel>", self.on_zoom)
+        self.canvas.bind("<Control-Button-4>", self.on_zoom)
+        self.canvas.bind("<Control-Button-5>", self.on_zoom)
+        self.canvas.bind("<Configure>", lambda e: self.schedule_render())
+
+    def add_image(self, pil_image, signature=None):
         full_img = pil_image.copy()
 
-        # Resize proportionally (half the original size)
-        scale_factor = 0.5
-        thumb_width = int(full_img.width * scale_factor)
-        thumb_height = int(full_img.height * scale_factor)
-        thumb_img = full_img.resize(
-            (thumb_width, thumb_height), Image.Resampling.LANCZOS
-        )
-
-        tk_img = ImageTk.PhotoImage(thumb_img)
+        # New images appear near the top-left of the current view
+        x = (50 - self.offset_x) / self.zoom
+        y = (50 - self.offset_y) / self.zoom
 
-        # Add to canvas
-        x, y = 50, 50
-        item_id = self.canvas.create_image(x, y, image=tk_img, anchor="nw")
-
-        self.images.append(tk_img)
-        self.image_items.append(item_id)
-        self.image_meta[item_id] = full_img  # ✅ Dict instead of list
+        image_id = self._next_id
+        self._next_id += 1
+        self.placed[image_id] = _PlacedImage(full_img, signature)
+        self.layout.add(image_id, x, y, full_img.width, full_img.height)
 
         # Right-click to delete
         self.canvas.tag_bind(
-            item_id, "<Button-3>", lambda e, item=item_id: self.remove_image(item)
+            self._tag(image_id),
+            "<Button-3>",
+            lambda e, image_id=image_id: self.remove_image(image_id),
         )
+        self.schedule_render()
+        return image_id
 
-    def remove_image(self, item_id):
-        if item_id in self.image_items:
-            index = self.image_items.index(item_id)
-            self.canvas.delete(item_id)
+    def remove_image(self, image_id):
+        if image_id not in self.placed:
+            return
+        self.canvas.delete(self._tag(image_id))
+        for key in [key for key in self._displayed if key[0] == image_id]:
+            del self._displayed[key]
+        self.tiles.discard_image(image_id)
+        del self.placed[image_id]
+        self.layout.remove(image_id)
+
+    def auto_arrange(self, gap=20):
+        # Overlapping scroll captures stack at their detected offsets; other
+        # shots are packed into a mosaic. Ids grow in the order images were
+        # added, which is the order chains are built in.
+        items = [
+            (image_id, placed.image.width, placed.image.height, placed.get_signature())
+            for image_id, placed in sorted(self.placed.items())
+        ]
+        for image_id, (x, y) in arrange(items, gap).items():
+            self.layout.move(image_id, x, y)
+            self.layout.raise_to_top(image_id)  # Later parts cover the overlap
+        self.fit_to_view()
+
+    def fit_to_view(self, margin=20):
+        bounds = self.layout.bounds()
+        if bounds is None:
+            return
+        x0, y0, x1, y1 = bounds
+        view_w = max(self.canvas.winfo_width() - 2 * margin, 1)
+        view_h = max(self.canvas.winfo_height() - 2 * margin, 1)
+        zoom = min(view_w / max(x1 - x0, 1), view_h / max(y1 - y0, 1), 1.0)
+        self.zoom = min(max(zoom, MIN_ZOOM), MAX_ZOOM)
+        self.offset_x = margin - x0 * self.zoom
+        self.offset_y = margin - y0 * self.zoom
+        self._clear_tiles()
+        self.schedule_render()
+
+    # ---- View transform and rendering ----
+
+    def _tag(self, image_id):
+        return f"img{image_id}"
+
+    def _screen_origin(self, image_id):
+        x, y, _, _ = self.layout.rect(image_id)
+        return (
+            round(x * self.zoom + self.offset_x),
+            round(y * self.zoom + self.offset_y),
+        )
 
-            del self.image_items[index]
-            del self.images[index]
-            if item_id in self.image_meta:
-                del self.image_meta[item_id]
+    def _to_world(self, screen_x, screen_y):
+        return (
+            (screen_x - self.offset_x) / self.zoom,
+            (screen_y - self.offset_y) / self.zoom,
+        )
+
+    def schedule_render(self):
+        if self._render_pending is None:
+            self._render_pending = self.canvas.after(RENDER_INTERVAL_MS, self._render)
+
+    def _render(self):
+        self._render_pending = None
+        view_w = self.canvas.winfo_width()
+        view_h = self.canvas.winfo_height()
+
+        # Only images in the visible world rectangle are considered
+        x0, y0 = self._to_world(0, 0)
+        x1, y1 = self._to_world(view_w, view_h)
+        visible = self.layout.ordered(self.layout.query(x0, y0, x1, y1))
+
+        wanted = set()
+        for image_id in visible:
+            placed = self.placed[image_id]
+            screen_x, screen_y = self._screen_origin(image_id)
+            cols, rows = placed.pyramid.tile_range(
+                self.zoom, screen_x, screen_y, view_w, view_h
+            )
+            for ty in rows:
+                for tx in cols:
+                    key = (image_id, self.zoom, tx, ty)
+                    wanted.add(key)
+                    if key not in self._displayed:
+                        self._show_tile(key, placed, screen_x, screen_y)
+
+        for key in [key for key in self._displayed if key not in wanted]:
+            item, _ = self._displayed.pop(key)
+            self.canvas.delete(item)
+
+        for image_id in visible:
+            self.canvas.tag_raise(self._tag(image_id))
+
+    def _show_tile(self, key, placed, screen_x, screen_y):
+        image_id, zoom, tx, ty = key
+        photo = self.tiles.get(key)
+        if photo is None:
+            photo = ImageTk.PhotoImage(placed.pyramid.render_tile(zoom, tx, ty))
+            self.tiles.put(key, photo)
+
+        item = self.canvas.create_image(
+            screen_x + tx * TILE_SIZE,
+            screen_y + ty * TILE_SIZE,
+            image=photo,
+            anchor="nw",
+            tags=("tile", self._tag(image_id)),
+        )
+        self._displayed[key] = (item, photo)
+
+    def _clear_tiles(self):
+        self.canvas.delete("tile")
+        self._displayed.clear()
+
+    # ---- Mouse handling ----
+
+    def image_at(self, x, y):
+        # Topmost image under the screen point, or None
+        return self.layout.hit_test(*self._to_world(x, y))
 
     def on_press(self, event):
-        item = self.canvas.find_closest(event.x, event.y)[0]
-        self.drag_data["item"] = item
+        image_id = self.image_at(event.x, event.y)
+        self.drag_data["item"] = image_id
         self.drag_data["x"] = event.x
         self.drag_data["y"] = event.y
+        if image_id is not None:
+            self.layout.raise_to_top(image_id)
+            self.canvas.tag_raise(self._tag(image_id))
+            x, y, _, _ = self.layout.rect(image_id)
+            self.drag_data["start"] = (event.x, event.y, x, y)
 
     def on_drag(self, event):
-        item = self.drag_data.get("item")
-        if item:
-            dx = event.x - self.drag_data["x"]
-            dy = event.y - self.drag_data["y"]
-            self.canvas.move(item, dx, dy)
+        image_id = self.drag_data.get("item")
+        if image_id is None:
+            # Dragging empty space pans the view
+            self._pan_by(
+                event.x - self.drag_data.get("x", event.x),
+                event.y - self.drag_data.get("y", event.y),
+            )
             self.drag_data["x"] = event.x
             self.drag_data["y"] = event.y
-
-    def get_widget(self):
-        return self.canvas
-
-    def export_canvas_as_image(self, save_path=None):
-        if not self.image_items:
-            messagebox.showwarning("Empty", "No images to export.")
             return
 
-        scale_factor = 0.5  # Matches scaling used in add_image()
-        upscale_factor = 1.0  # You can adjust this to control final image size
-
-        image_boxes = []
+        press_x, press_y, start_x, start_y = self.drag_data["start"]
+        x = start_x + (event.x - press_x) / self.zoom
+        y = start_y + (event.y - press_y) / self.zoom
+        x, y = self.layout.snap(image_id, x, y, SNAP_DISTANCE / self.zoom)
 
-        for item_id in self.image_items:
-            coords = self.canvas.coords(item_id)
-            if not coords or item_id not in self.image_meta:
-                continue
+        old_x, old_y = self._screen_origin(image_id)
+        self.layout.move(image_id, x, y)
+        new_x, new_y = self._screen_origin(image_id)
+        self.canvas.move(self._tag(image_id), new_x - old_x, new_y - old_y)
+        self.schedule_render()
 
-            thumb_x, thumb_y = map(int, coords)
-            full_img = self.image_meta[item_id]
+    def on_release(self, event):
+        self.drag_data.clear()
 
-            # 1. Convert position to full image coordinates
-            full_x = int(thumb_x / scale_factor)
-            full_y = int(thumb_y / scale_factor)
+    def on_pan_start(self, event):
+        self.drag_data["x"] = event.x
+        self.drag_data["y"] = event.y
 
-            # 2. Resize full image (upscale)
-            enlarged_img = full_img.resize(
-                (
-                    int(full_img.width * upscale_factor),
-                    int(full_img.height * upscale_factor),
-                ),
-                Image.Resampling.LANCZOS,  # type: ignore
-            )
+    def on_pan(self, event):
+        self._pan_by(event.x - self.drag_data["x"], event.y - self.drag_data["y"])
+        self.drag_data["x"] = event.x
+        self.drag_data["y"] = event.y
 
-            # 3. Adjust position for upscaled image
-            adj_x = int(full_x * upscale_factor)
-            adj_y = int(full_y * upscale_factor)
+    def _pan_by(self, dx, dy):
+        self.offset_x += dx
+        self.offset_y += dy
+        self.canvas.move("tile", dx, dy)
+        self.schedule_render()
+
+    def on_zoom(self, event):
+        zoom_in = event.num == 4 or getattr(event, "delta", 0) > 0
+        self.set_zoom(self.zoom * (1.25 if zoom_in else 0.8), event.x, event.y)
+
+    def set_zoom(self, zoom, anchor_x=0, anchor_y=0):
+        # Keeps the world point under (anchor_x, anchor_y) in place
+        zoom = min(max(zoom, MIN_ZOOM), MAX_ZOOM)
+        world_x = (anchor_x - self.offset_x) / self.zoom
+        world_y = (anchor_y - self.offset_y) / self.zoom
+        self.zoom = zoom
+        self.offset_x = anchor_x - world_x * zoom
+        self.offset_y = anchor_y - world_y * zoom
+        self._clear_tiles()
+        self.schedule_render()
 
-            image_boxes.append(
-                (enlarged_img, adj_x, adj_y, enlarged_img.width, enlarged_img.height)
-            )
+    def get_widget(self):
+        return self.canvas
 
-        if not image_boxes:
-            messagebox.showerror("Error", "No images found on canvas.")
+    def export_canvas_as_image(self, save_path=None):
+        if not self.placed:
+            messagebox.showwarning("Empty", "No images to export.")
             return
 
-        # Compute bounding box
-        min_x = min(x for _, x, y, w, h in image_boxes)
-        min_y = min(y for _, x, y, w, h in image_boxes)
-        max_x = max(x + w for _, x, y, w, h in image_boxes)
-        max_y = max(y + h for _, x, y, w, h in image_boxes)
-
-        export_width = max_x - min_x
-        export_height = max_y - min_y
+        upscale_factor = 1.0  # You can adjust this to control final image size
 
-        # Create final canvas
-        final_image = Image.new("RGB", (export_width, export_height), color=(0, 0, 0))
+        # Snapshot the layout on the Tk thread; compositing runs in the worker
+        layers = [
+            (self.placed[image_id].image,) + self.layout.rect(image_id)[:2]
+            for image_id in self.layout.ordered()
+        ]
+        blend = self.blend_mode
 
-        for img, x, y, w, h in image_boxes:
-            paste_x = x - min_x
-            paste_y = y - min_y
-            final_image.paste(img, (paste_x, paste_y))
+        def build_final_image():
+            pixels = [(np.asarray(img), round(x), round(y)) for img, x, y in layers]
+            return composite(pixels, scale=upscale_factor, blend=blend)
 
         if not save_path:
             save_path = filedialog.asksaveasfilename(
-                defaultextension=".png", filetypes=[("PNG Image", "*.png")]
+                defaultextension=".png", filetypes=EXPORT_FILETYPES
             )
 
         if save_path:
-            final_image.save(save_path)
-            messagebox.showinfo("Exported", f"Image saved to:\n{save_path}")
+            # Encoding runs in the background; progress shows in the title
+            window = self.canvas.winfo_toplevel()
+            on_progress = show_progress_in_title(window)
+
+            def on_saved(path):
+                messagebox.showinfo("Exported", f"Image saved to:\n{path}")
+
+            def on_failed(error):
+                on_progress(1.0, "Failed")
+                messagebox.showerror("Error", f"Could not export image:\n{error}")
+
+            export_image_async(
+                window,
+                build_final_image,
+                save_path,
+                self.export_options,
+                on_progress=on_progress,
+                on_done=on_saved,
+                on_error=on_failed,
+            )
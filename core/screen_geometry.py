@@ -0,0 +1,361 @@
+import ctypes
+import ctypes.util
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Monitors, as Tk sees them and in physical pixels. Tk works in the
+# process's own coordinates, which on Windows are scaled per monitor unless
+# the process is DPI aware; screen grabs need physical pixels. The layout is
+# enumerated once and cached until it changes.
+
+
+class Monitor:
+    __slots__ = ("name", "logical", "physical", "primary")
+
+    def __init__(self, name, logical, physical=None, primary=False):
+        self.name = name
+        self.logical = logical  # (x1, y1, x2, y2) in Tk coordinates
+        self.physical = physical or logical  # The same area in device pixels
+        self.primary = primary
+
+    def __repr__(self):
+        return f"Monitor({self.name!r}, {self.logical}, {self.physical})"
+
+    @property
+    def scale(self):
+        # Physical pixels per Tk pixel
+        return (self.physical[2] - self.physical[0]) / max(
+            1, self.logical[2] - self.logical[0]
+        )
+
+    def to_physical(self, x, y):
+        lx, ly, lx2, ly2 = self.logical
+        px, py, px2, py2 = self.physical
+        return (
+            px + round((x - lx) * (px2 - px) / max(1, lx2 - lx)),
+            py + round((y - ly) * (py2 - py) / max(1, ly2 - ly)),
+        )
+
+
+def _overlap(a, b):
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    return max(0, width) * max(0, height)
+
+
+def _intersect(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    if x1 >= x2 or y1 >= y2:
+        return None
+    return x1, y1, x2, y2
+
+
+def _union(rects):
+    return (
+        min(r[0] for r in rects),
+        min(r[1] for r in rects),
+        max(r[2] for r in rects),
+        max(r[3] for r in rects),
+    )
+
+
+# ---- Enumeration ----
+
+
+class _RECT(ctypes.Structure):
+    _fields_ = [
+        ("left", ctypes.c_long),
+        ("top", ctypes.c_long),
+        ("right", ctypes.c_long),
+        ("bottom", ctypes.c_long),
+    ]
+
+
+class _MONITORINFOEXW(ctypes.Structure):
+    _fields_ = [
+        ("cbSize", ctypes.c_ulong),
+        ("rcMonitor", _RECT),
+        ("rcWork", _RECT),
+        ("dwFlags", ctypes.c_ulong),
+        ("szDevice", ctypes.c_wchar * 32),
+    ]
+
+
+_DPI_AWARENESS_PER_MONITOR_V2 = -4
+_SM_VIRTUAL_SCREEN = (76, 77, 78, 79, 80)  # x, y, width, height, monitor count
+
+
+def _windows_rects(user32):
+    # HMONITOR → (rect, primary, device name) in the calling thread's DPI view
+    found = {}
+    callback_type = ctypes.WINFUNCTYPE(
+        ctypes.c_int,
+        ctypes.c_void_p,
+        ctypes.c_void_p,
+        ctypes.POINTER(_RECT),
+        ctypes.c_ssize_t,
+    )
+
+    def callback(handle, dc, rect, data):
+        info = _MONITORINFOEXW()
+        info.cbSize = ctypes.sizeof(info)
+        if user32.GetMonitorInfoW(ctypes.c_void_p(handle), ctypes.byref(info)):
+            r = info.rcMonitor
+            found[handle] = (
+                (r.left, r.top, r.right, r.bottom),
+                bool(info.dwFlags & 1),
+                info.szDevice,
+            )
+        return 1
+
+    user32.EnumDisplayMonitors(None, None, callback_type(callback), 0)
+    return found
+
+
+@contextmanager
+def physical_pixels():
+    # Makes the calling thread per-monitor DPI aware meanwhile, so Windows
+    # reports and grabs in physical pixels. Yields False where there is no
+    # per-thread awareness (before Windows 10 1607), and there it changes
+    # nothing.
+    user32 = ctypes.windll.user32
+    try:
+        set_context = user32.SetThreadDpiAwarenessContext
+    except AttributeError:
+        yield False
+        return
+    set_context.restype = ctypes.c_void_p
+    set_context.argtypes = [ctypes.c_void_p]
+    previous = set_context(_DPI_AWARENESS_PER_MONITOR_V2)
+    try:
+        yield True
+    finally:
+        set_context(previous)
+
+
+def _windows_monitors():
+    # Enumerated twice, in the process's view and per-monitor aware; the
+    # two rects of each monitor give its scale. Without per-thread
+    # awareness, Tk coordinates are taken as physical.
+    user32 = ctypes.windll.user32
+    logical = _windows_rects(user32)
+    physical = logical
+    with physical_pixels() as aware:
+        if aware:
+            physical = _windows_rects(user32)
+
+    return [
+        Monitor(name, rect, physical.get(handle, (rect,))[0], primary)
+        for handle, (rect, primary, name) in logical.items()
+    ]
+
+
+def _windows_layout_key():
+    metrics = ctypes.windll.user32.GetSystemMetrics
+    return tuple(metrics(index) for index in _SM_VIRTUAL_SCREEN)
+
+
+class _XRRMonitorInfo(ctypes.Structure):
+    _fields_ = [
+        ("name", ctypes.c_ulong),
+        ("primary", ctypes.c_int),
+        ("automatic", ctypes.c_int),
+        ("noutput", ctypes.c_int),
+        ("x", ctypes.c_int),
+        ("y", ctypes.c_int),
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("mwidth", ctypes.c_int),
+        ("mheight", ctypes.c_int),
+        ("outputs", ctypes.c_void_p),
+    ]
+
+
+def _x11_monitors():
+    # X has no coordinate scaling (HiDPI there is font and toolkit scaling),
+    # so Tk and grabs agree; XRandR only tells the monitors apart
+    x11_path = ctypes.util.find_library("X11")
+    xrandr_path = ctypes.util.find_library("Xrandr")
+    if not x11_path or not xrandr_path:
+        return []
+    x11 = ctypes.CDLL(x11_path)
+    xrandr = ctypes.CDLL(xrandr_path)
+    x11.XOpenDisplay.restype = ctypes.c_void_p
+    x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+    x11.XDefaultRootWindow.restype = ctypes.c_ulong
+    x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+    if not hasattr(xrandr, "XRRGetMonitors"):
+        return []  # XRandR before 1.5
+    xrandr.XRRGetMonitors.restype = ctypes.POINTER(_XRRMonitorInfo)
+    xrandr.XRRGetMonitors.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_ulong,
+        ctypes.c_int,
+        ctypes.POINTER(ctypes.c_int),
+    ]
+    xrandr.XRRFreeMonitors.argtypes = [ctypes.POINTER(_XRRMonitorInfo)]
+
+    display = x11.XOpenDisplay(None)
+    if not display:
+        return []
+    try:
+        count = ctypes.c_int()
+        found = xrandr.XRRGetMonitors(
+            display, x11.XDefaultRootWindow(display), 1, ctypes.byref(count)
+        )
+        if not found:
+            return []
+        try:
+            return [
+                Monitor(
+                    f"monitor{i}",
+                    (m.x, m.y, m.x + m.width, m.y + m.height),
+                    primary=bool(m.primary),
+                )
+                for i, m in enumerate(found[: count.value])
+            ]
+        finally:
+            xrandr.XRRFreeMonitors(found)
+    finally:
+        x11.XCloseDisplay(display)
+
+
+def _primary_screen():
+    # Anywhere else: the one screen pyautogui knows about, unscaled
+    try:
+        import pyautogui
+
+        width, height = pyautogui.size()
+    except Exception:
+        return []
+    return [Monitor("screen", (0, 0, width, height), primary=True)]
+
+
+def enumerate_monitors():
+    monitors = []
+    try:
+        if hasattr(ctypes, "windll"):
+            monitors = _windows_monitors()
+        elif sys.platform.startswith("linux"):
+            monitors = _x11_monitors()
+    except OSError:
+        monitors = []
+    return monitors or _primary_screen()
+
+
+def layout_key():
+    # Something cheap that changes when monitors are added, moved or
+    # rescaled, or None where there is no such query
+    if hasattr(ctypes, "windll"):
+        return _windows_layout_key()
+    return None
+
+
+# ---- Cached service ----
+
+
+class ScreenGeometry:
+    # The monitor list is built once and reused until invalidate() or until
+    # layout_key() changes, which is polled at most every `check_interval`
+    # seconds. Without a key it is rebuilt after `max_age` seconds instead.
+    def __init__(
+        self,
+        enumerate=enumerate_monitors,
+        key=layout_key,
+        check_interval=1.0,
+        max_age=30.0,
+    ):
+        self._enumerate = enumerate
+        self._key = key
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._monitors = None
+        self._key_value = None
+        self._built = self._checked = 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self._monitors = None
+
+    def monitors(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._monitors is not None and now - self._checked >= (
+                self.check_interval
+            ):
+                self._checked = now
+                key = self._key()
+                if key != self._key_value or (
+                    key is None and now - self._built >= self.max_age
+                ):
+                    self._monitors = None
+            if self._monitors is None:
+                self._key_value = self._key()
+                self._monitors = self._enumerate()
+                self._built = self._checked = now
+            return self._monitors
+
+    def virtual_bounds(self, physical=False):
+        # Bounding box of every monitor, e.g. for a selection window
+        monitors = self.monitors()
+        if not monitors:
+            return None
+        return _union([m.physical if physical else m.logical for m in monitors])
+
+    def monitor_for(self, region, physical=False):
+        # The monitor holding most of the region; the primary one (or the
+        # first) when the region is off every monitor
+        monitors = self.monitors()
+        if not monitors:
+            return None
+        return max(
+            monitors,
+            key=lambda m: (
+                _overlap(m.physical if physical else m.logical, region),
+                m.primary,
+            ),
+        )
+
+    def to_physical(self, region):
+        # Tk region → physical pixels, scaled by the monitor holding most of
+        # it; a region straddling two monitors with different scales keeps
+        # that monitor's scale throughout
+        monitor = self.monitor_for(region)
+        if monitor is None:
+            return tuple(region)
+        x1, y1 = monitor.to_physical(region[0], region[1])
+        x2, y2 = monitor.to_physical(region[2], region[3])
+        return (x1, y1, max(x2, x1 + 1), max(y2, y1 + 1))
+
+    def clip(self, region):
+        # Part of a physical region inside the bounding box of all monitors
+        # (on X11 that lies within the root window), or None if it is
+        # entirely off-screen; unknown layouts pass through
+        bounds = self.virtual_bounds(physical=True)
+        if bounds is None:
+            return tuple(region)
+        return _intersect(region, bounds)
+
+    def visible_parts(self, region):
+        # The region's overlap with each monitor, in physical pixels; what
+        # is in none of them is a gap in the desktop
+        monitors = self.monitors()
+        if not monitors:
+            return [tuple(region)]
+        parts = (_intersect(m.physical, region) for m in monitors)
+        return [part for part in parts if part is not None]
+
+
+_default_geometry = None
+
+
+def get_screen_geometry():
+    global _default_geometry
+    if _default_geometry is None:
+        _default_geometry = ScreenGeometry()
+    return _default_geometry
@@ -10,10 +10,13 @@ import pyautogui
 from PIL import Image, ImageTk
 
 from core.overlay import show_overlay_box
-from core.screenshot_auto import start_auto_scroll_screenshot, stop_auto_scroll_capture
+from core.frame_store import FrameStore
+from core.pipeline import CapturePipeline
+from core.screenshot_auto import start_auto_scroll_screenshot
+from core.stitcher import VerticalStitcher
 
 long_screenshot_coords = None
-long_screenshot_images = []
+long_screenshot_stitcher = VerticalStitcher()
 thumbnail_refs = []
 
 
@@ -96,10 +99,10 @@ def show_long_screenshot_window(root, big_preview_label, thumbnail_container):
 
         # 1. Convert and store full image (OpenCV format for merging)
         img_np = cv2.cvtColor(np.array(cropped), cv2.COLOR_RGB2BGR)
-        long_screenshot_images.append(img_np)
+        long_screenshot_stitcher.add(img_np)
 
         overlay.deiconify()
-        status_label.config(text=f"✅ Captured {len(long_screenshot_images)} parts")
+        status_label.config(text=f"✅ Captured {len(long_screenshot_stitcher)} parts")
 
         # 2. Create thumbnail for preview
         thumb = cropped.copy()
@@ -123,35 +126,34 @@ def show_long_screenshot_window(root, big_preview_label, thumbnail_container):
 
         thumb_label.bind("<Button-1>", lambda e: on_thumbnail_click())
 
+    auto_token = None  # CancelToken of the running auto-scroll session
+    # One pipeline per capture session, shared by every auto-scroll run
+    frames = FrameStore()
+    pipeline = CapturePipeline(
+        root, long_screenshot_stitcher, frames, lambda *args: None
+    )
+
+    def stop_auto():
+        if auto_token is not None:
+            auto_token.cancel()
+            auto_token.join()  # Its last frame is submitted
+
+    def end_session():
+        stop_auto()
+        pipeline.close()
+        frames.close()
+
     def finish_and_save():
+        global long_screenshot_stitcher
         overlay.destroy()
-        stop_auto_scroll_capture()
-        if not long_screenshot_images:
+        stop_auto()
+        pipeline.drain()
+        if not len(long_screenshot_stitcher):
             messagebox.showwarning("Empty", "No captures taken.")
             return
 
-        max_width = max(img.shape[1] for img in long_screenshot_images)
-
-        padded_images = []
-        for img in long_screenshot_images:
-            height, width, channels = img.shape
-            if width < max_width:
-
-                pad_width = max_width - width
-                padded = cv2.copyMakeBorder(
-                    img,
-                    top=0,
-                    bottom=0,
-                    left=0,
-                    right=pad_width,
-                    borderType=cv2.BORDER_CONSTANT,
-                    value=(0, 0, 0),
-                )
-                padded_images.append(padded)
-            else:
-                padded_images.append(img)
-
-        final = np.vstack(padded_images)
+        # Frames were stitched into the canvas as they arrived
+        final = long_screenshot_stitcher.result()
         save_path = filedialog.asksaveasfilename(
             defaultextension=".png", filetypes=[("PNG Image", "*.png")]
         )
@@ -160,26 +162,28 @@ def show_long_screenshot_window(root, big_preview_label, thumbnail_container):
             messagebox.showinfo("Saved", f"Long screenshot saved:\n{save_path}")
 
         window.destroy()
-        long_screenshot_images.clear()
+        end_session()
+        long_screenshot_stitcher = VerticalStitcher()
         root.deiconify()
 
     def undo_last_capture():
-        if long_screenshot_images:
-            long_screenshot_images.pop()
+        if long_screenshot_stitcher.pop():
             status_label.config(
-                text=f"⏪ Undid last capture. {len(long_screenshot_images)} left."
+                text=f"⏪ Undid last capture. {len(long_screenshot_stitcher)} left."
             )
         else:
             messagebox.showinfo("Nothing to undo", "No captured images to undo.")
 
     def handle_auto_scroll():
+        nonlocal auto_token
         overlay.withdraw()
-        start_auto_scroll_screenshot(
-            root, long_screenshot_coords, long_screenshot_images
+        stop_auto()
+        auto_token = start_auto_scroll_screenshot(
+            root, long_screenshot_coords, pipeline
         )
 
     def on_close_capture_window():
-        stop_auto_scroll_capture()
+        end_session()
         overlay.destroy()
         window.destroy()
         root.deiconify()
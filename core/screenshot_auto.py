@@ -1,54 +1,317 @@
 import threading
 import time
-from tkinter import filedialog, messagebox
+import traceback
+from collections import deque
+from tkinter import messagebox
 
-import cv2
-import numpy as np
-import pyautogui
-from PIL import Image, ImageChops, ImageStat
+from core.capture_backend import get_capture_backend
+from core.events import CancelToken, event_bus
+from core.frame_signature import compute_signature, is_scroll_progress, scroll_delta
+from core.panorama import PanoramaStitcher, build_pyramid, find_offset_2d
 
-is_auto_capture_active = True
 
+class AutoCaptureSettings:
+    def __init__(
+        self,
+        max_fps=30.0,
+        max_idle_interval=0.25,
+        settle_time=0.15,
+        max_shift=0.5,
+        max_animated=0.5,
+        scroll_mode="wheel",
+        target_overlap=0.2,
+        initial_clicks=3,
+        max_clicks=40,
+        settle_timeout=1.0,
+        end_repeats=2,
+    ):
+        self.max_fps = max_fps  # Polling rate while content is moving
+        self.max_idle_interval = max_idle_interval  # Backoff cap when idle
+        self.settle_time = settle_time  # Stillness needed before a keyframe
+        self.max_shift = max_shift  # Force a keyframe past this much scroll
+        self.max_animated = max_animated  # Unscrolled change share = animation
 
-def start_auto_scroll_screenshot(root, coords, storage_list):
-    global is_auto_capture_active
-    is_auto_capture_active = True
-    threading.Thread(
-        target=_manual_scroll_capture_loop, args=(root, coords, storage_list)
-    ).start()
+        # Driven mode only
+        self.scroll_mode = scroll_mode  # "wheel" clicks or "page" (PageDown)
+        self.target_overlap = target_overlap  # Share of the region kept per step
+        self.initial_clicks = initial_clicks
+        self.max_clicks = max_clicks
+        self.settle_timeout = settle_timeout  # Give up waiting for stillness
+        self.end_repeats = end_repeats  # Steps without progress = end of page
 
 
-def stop_auto_scroll_capture():
-    global is_auto_capture_active
-    is_auto_capture_active = False
+class AdaptiveScheduler:
+    # Polls at max_fps while frames change, doubles the interval up to
+    # max_idle_interval while idle, and reports when motion has settled.
+    def __init__(self, settings):
+        self.settings = settings
+        self.interval = 1.0 / settings.max_fps
+        self.pending = False  # Motion seen since the last keyframe
+        self._last_motion = 0.0
 
+    def update(self, moved, now):
+        fast = 1.0 / self.settings.max_fps
+        if moved:
+            self.pending = True
+            self._last_motion = now
+            self.interval = fast
+            return False
 
-def _manual_scroll_capture_loop(root, coords, storage_list):
-    global is_auto_capture_active
-    x1, y1, x2, y2 = coords
+        if self.pending:
+            self.interval = fast
+            if now - self._last_motion >= self.settings.settle_time:
+                self.pending = False
+                return True  # Settled: take the keyframe now
+            return False
 
-    prev_img = None
-    scroll_threshold = 30  # Minimum Y-difference in pixels
+        self.interval = min(self.interval * 2, self.settings.max_idle_interval)
+        return False
 
-    while is_auto_capture_active:
-        screenshot = pyautogui.screenshot()
-        cropped = screenshot.crop((x1, y1, x2, y2))
-        current_np = np.array(cropped)
-        print(cropped)
-        if prev_img is None:
-            prev_img = current_np
-            storage_list.append(cv2.cvtColor(current_np, cv2.COLOR_RGB2BGR))
-        else:
-            # Compare a small vertical slice
-            diff = cv2.absdiff(prev_img, current_np)
-            gray_diff = cv2.cvtColor(diff, cv2.COLOR_RGB2GRAY)
-            non_zero_count = np.count_nonzero(gray_diff)
 
-            if non_zero_count > 10000:  # Tune this threshold for sensitivity
-                storage_list.append(cv2.cvtColor(current_np, cv2.COLOR_RGB2BGR))
-                prev_img = current_np
+class _RateMeter:
+    def __init__(self, window=1.0):
+        self.window = window
+        self._ticks = deque()
 
-        time.sleep(0.5)
+    def tick(self, now):
+        self._ticks.append(now)
+        while self._ticks[0] < now - self.window:
+            self._ticks.popleft()
 
-    # Done capturing
-    root.after(0, lambda: messagebox.showinfo("Done", "Auto scroll capture finished."))
+    def rate(self):
+        if len(self._ticks) < 2:
+            return 0.0
+        return (len(self._ticks) - 1) / max(self._ticks[-1] - self._ticks[0], 1e-6)
+
+
+def start_auto_scroll_screenshot(
+    root,
+    coords,
+    pipeline,
+    backend=None,
+    settings=None,
+    on_status=None,
+    on_done=None,
+    token=None,
+):
+    # Follows manual scrolling until the returned token is cancelled
+    return _start_session(
+        _manual_scroll_capture_loop,
+        root,
+        coords,
+        pipeline,
+        backend,
+        settings,
+        on_status,
+        on_done,
+        token,
+    )
+
+
+def start_driven_scroll_screenshot(
+    root,
+    coords,
+    pipeline,
+    backend=None,
+    settings=None,
+    on_status=None,
+    on_done=None,
+    token=None,
+):
+    # Scrolls by itself until the end of the page or until cancelled
+    return _start_session(
+        _driven_scroll_capture_loop,
+        root,
+        coords,
+        pipeline,
+        backend,
+        settings,
+        on_status,
+        on_done,
+        token,
+    )
+
+
+def _start_session(
+    loop, root, coords, pipeline, backend, settings, on_status, on_done, token
+):
+    # Each session gets its own token, so sessions never stop each other.
+    # Callbacks go through the event bus and run on the Tk thread.
+    token = token or CancelToken()
+    dispatch = event_bus(root)
+
+    def run():
+        try:
+            loop(
+                dispatch,
+                coords,
+                pipeline,
+                backend or get_capture_backend(),
+                settings or AutoCaptureSettings(),
+                on_status,
+                token,
+            )
+        except Exception:
+            traceback.print_exc()
+        finally:
+            token.finish()
+            dispatch.after(0, on_done or _show_done_message)
+
+    threading.Thread(target=run, daemon=True).start()
+    return token
+
+
+def _show_done_message():
+    messagebox.showinfo("Done", "Auto scroll capture finished.")
+
+
+def _manual_scroll_capture_loop(
+    root, coords, pipeline, backend, settings, on_status, token
+):
+    scheduler = AdaptiveScheduler(settings)
+    meter = _RateMeter()
+    animated = settings.max_animated
+    prev_sig = None  # Previous poll, for motion detection
+    keyframe_sig = None  # Last frame handed to the stitcher
+    keyframe = keyframe_pyramid = None  # Its pixels, for 2D layouts
+    panorama = isinstance(pipeline.stitcher, PanoramaStitcher)
+    last_status = 0.0
+
+    metrics = pipeline.metrics
+    while not token.cancelled:
+        with metrics.span("grab"):
+            current_np = backend.grab(coords)
+        now = time.perf_counter()
+        meter.tick(now)
+        with metrics.span("signature"):
+            sig = compute_signature(current_np)
+
+        submit = keyframe_sig is None
+        if not submit:
+            # Only scroll progress counts; animated page chrome is ignored
+            moved = is_scroll_progress(prev_sig, sig, animated)
+            if scheduler.update(moved, now):
+                submit = is_scroll_progress(keyframe_sig, sig, animated)
+            elif moved and panorama:
+                # Sideways motion has no vertical shift, so measure it the
+                # way the stitcher will
+                if keyframe_pyramid is None:
+                    keyframe_pyramid = build_pyramid(keyframe)
+                with metrics.span("offset"):
+                    submit = _panned_too_far(
+                        pipeline.stitcher, keyframe_pyramid, current_np, settings
+                    )
+            elif moved:
+                # Fast continuous scrolling: keep a keyframe before the
+                # overlap with the last one gets too small to stitch
+                shift = scroll_delta(keyframe_sig, sig)
+                submit = shift is None or shift > settings.max_shift * sig.shape[0]
+        if submit:
+            pipeline.submit(current_np, sig)
+            keyframe_sig = sig
+            keyframe, keyframe_pyramid = current_np, None
+        prev_sig = sig
+
+        if on_status and now - last_status >= 0.5:
+            last_status = now
+            text = f"🔄 Auto: {len(pipeline.stitcher)} parts · {meter.rate():.1f} fps"
+            root.after(0, on_status, text)
+
+        token.sleep(scheduler.interval - (time.perf_counter() - now))
+
+
+def _panned_too_far(stitcher, keyframe_pyramid, frame, settings):
+    # True once the frame's 2D offset from the keyframe passes max_shift of
+    # the region in either direction, or no offset is found
+    offset = find_offset_2d(
+        keyframe_pyramid, build_pyramid(frame), stitcher.min_overlap, stitcher.max_error
+    )
+    if offset is None:
+        return True
+    height, width = frame.shape[:2]
+    dx, dy = offset
+    return abs(dx) > settings.max_shift * width or abs(dy) > settings.max_shift * height
+
+
+def _grab_signed(backend, coords, metrics):
+    with metrics.span("grab"):
+        frame = backend.grab(coords)
+    with metrics.span("signature"):
+        return frame, compute_signature(frame)
+
+
+def _wait_for_settle(backend, coords, settings, token, metrics):
+    # Polls until nothing has scrolled for settle_time (animation does not
+    # count), settle_timeout passes or the session is cancelled, and returns
+    # the last frame
+    start = last_motion = time.perf_counter()
+    frame, sig = _grab_signed(backend, coords, metrics)
+    while not token.sleep(1.0 / settings.max_fps):
+        now = time.perf_counter()
+        next_frame, next_sig = _grab_signed(backend, coords, metrics)
+        if is_scroll_progress(sig, next_sig, settings.max_animated):
+            last_motion = now
+        frame, sig = next_frame, next_sig
+        if (
+            now - last_motion >= settings.settle_time
+            or now - start >= settings.settle_timeout
+        ):
+            break
+    return frame, sig
+
+
+def _driven_scroll_capture_loop(
+    root, coords, pipeline, backend, settings, on_status, token
+):
+    # Scroll, wait for stillness, capture, repeat. Each step is sized from
+    # the pixels per click measured so far, so consecutive frames keep about
+    # `target_overlap` of the region in common; a step that leaves no overlap
+    # is scrolled back and halved. Steps that stop moving end the run.
+    height = coords[3] - coords[1]
+    target = (1.0 - settings.target_overlap) * height  # New rows per step
+    clicks = settings.initial_clicks
+    pixels_per_click = None
+    stuck = 0
+
+    metrics = pipeline.metrics
+    if settings.scroll_mode == "page":
+        backend.focus(coords)  # Key presses go to the focused window
+    frame, sig = _grab_signed(backend, coords, metrics)
+    pipeline.submit(frame, sig)
+
+    while not token.cancelled:
+        with metrics.span("scroll"):
+            backend.send_scroll(coords, clicks, settings.scroll_mode)
+        with metrics.span("settle"):
+            frame, new_sig = _wait_for_settle(backend, coords, settings, token, metrics)
+        if token.cancelled:
+            break
+
+        if not is_scroll_progress(sig, new_sig, settings.max_animated):
+            stuck += 1
+            if stuck >= settings.end_repeats:
+                break  # End of page
+            continue
+        stuck = 0
+
+        shift = scroll_delta(sig, new_sig)
+        if shift is None and clicks > 1:
+            # Overshot: nothing left to stitch against
+            backend.send_scroll(coords, -clicks, settings.scroll_mode)
+            _, sig = _wait_for_settle(backend, coords, settings, token, metrics)
+            clicks = max(1, clicks // 2)
+            continue
+
+        pipeline.submit(frame, new_sig)
+        sig = new_sig
+        if shift:
+            measured = shift / clicks
+            if pixels_per_click is None:
+                pixels_per_click = measured
+            else:
+                pixels_per_click = (pixels_per_click + measured) / 2
+            clicks = int(min(max(target // pixels_per_click, 1), settings.max_clicks))
+
+        if on_status:
+            text = f"🤖 Driving: {len(pipeline.stitcher)} parts · {clicks} clicks/step"
+            root.after(0, on_status, text)
@@ -1,37 +1,90 @@
 import ctypes
+import os
 import threading
 import time
 import tkinter as tk
 from tkinter import filedialog, messagebox
 
 import cv2
-import numpy as np
-import pyautogui
-from PIL import Image, ImageTk
-
+from PIL import Image
+
+from core.capture_backend import get_capture_backend
+from core.events import event_bus
+from core.export import (
+    EXPORT_FILETYPES,
+    EXPORT_PRESETS,
+    export_image_async,
+    show_progress_in_title,
+)
+from core.frame_signature import FrameSignature, compute_signature
+from core.frame_store import (
+    FrameStore,
+    is_journal,
+    new_session_dir,
+    prune_sessions,
+    session_root,
+)
+from core.metrics import hud_text, trace_path
 from core.overlay import OverlayBox
-from core.screenshot_auto import start_auto_scroll_screenshot, stop_auto_scroll_capture
+from core.panorama import create_stitcher
+from core.pipeline import CapturePipeline, make_thumbnail
+from core.screen_geometry import get_screen_geometry
+from core.screenshot_auto import (
+    AutoCaptureSettings,
+    start_auto_scroll_screenshot,
+    start_driven_scroll_screenshot,
+)
+
+HUD_INTERVAL_MS = 500
 
 
 class ScreenshotManager:
-    def __init__(self, root, preview_canvas, thumbnail_container):
+    # Everything here runs on the Tk thread. Grabs, stitching and auto
+    # capture run on workers, which report back through the event bus.
+    def __init__(self, root, preview_canvas, thumbnails):
         self.root = root
+        self.bus = event_bus(root)
         self.preview_canvas = preview_canvas
-        self.thumbnail_container = thumbnail_container
-
-        self.coords = None
-        self.images = []
-        self.thumbnail_refs = []
+        self.thumbnails = thumbnails  # ThumbnailStrip, one row per frame
+
+        self.coords = None  # Selected region in Tk coordinates
+        self.geometry = get_screen_geometry()
+        self.layout = "vertical"  # Or "panorama" for sideways and 2D scrolling
+        self.stitcher = create_stitcher(self.layout)
+        self.signatures = {}  # Frame index → FrameSignature
+        self.export_options = EXPORT_PRESETS["Balanced"]
+        self.backend = get_capture_backend()
+        self.auto_settings = AutoCaptureSettings()
+        self.frames = None  # Store of the current or last session
+        self._discard_frames = False  # Its journal goes once it is released
+        self.pipeline = None
+        self.auto_token = None  # CancelToken of the running auto capture
+        # Unsaved sessions from long ago; off the Tk thread, they can be large
+        threading.Thread(target=prune_sessions, daemon=True).start()
 
     def start(self):
+        self._release_session()
+        self.stitcher = create_stitcher(self.layout)
+        self.geometry.invalidate()  # Monitors may have changed since last time
         self.root.withdraw()
-        threading.Thread(target=self._select_area).start()
+        self._select_area()
 
     def _select_area(self):
-        ctypes.windll.user32.ShowWindow(ctypes.windll.kernel32.GetConsoleWindow(), 0)
+        if hasattr(ctypes, "windll"):
+            ctypes.windll.user32.ShowWindow(
+                ctypes.windll.kernel32.GetConsoleWindow(), 0
+            )
 
-        screen = tk.Tk()
-        screen.attributes("-fullscreen", True)
+        # A Toplevel of the one Tk root, not a second Tk() on another thread,
+        # spanning every monitor (-fullscreen only covers one)
+        screen = tk.Toplevel(self.root)
+        bounds = self.geometry.virtual_bounds()
+        if bounds is None:
+            screen.attributes("-fullscreen", True)
+        else:
+            x1, y1, x2, y2 = bounds
+            screen.overrideredirect(True)
+            screen.geometry(f"{x2 - x1}x{y2 - y1}+{x1}+{y1}")
         screen.attributes("-alpha", 0.3)
         screen.config(bg="black")
         screen.lift()
@@ -40,129 +93,312 @@ class ScreenshotManager:
         canvas = tk.Canvas(screen, cursor="cross", bg="black")
         canvas.pack(fill=tk.BOTH, expand=True)
 
-        start_x = start_y = None
+        start = None  # Press position: (canvas x, canvas y, screen x, screen y)
 
         def on_click(event):
-            nonlocal start_x, start_y
-            start_x, start_y = event.x, event.y
+            nonlocal start
+            start = (event.x, event.y, event.x_root, event.y_root)
 
         def on_drag(event):
             canvas.delete("rect")
-            canvas.create_rectangle(start_x, start_y, event.x, event.y, outline="green", width=2, tag="rect")  # type: ignore
+            canvas.create_rectangle(start[0], start[1], event.x, event.y, outline="green", width=2, tag="rect")  # type: ignore
 
         def on_release(event):
-            canvas_x = screen.winfo_rootx()
-            canvas_y = screen.winfo_rooty()
-            x1, y1 = start_x + canvas_x, start_y + canvas_y  # type: ignore
-            x2, y2 = event.x + canvas_x, event.y + canvas_y
+            x1, y1 = start[2:]  # type: ignore
+            x2, y2 = event.x_root, event.y_root
             self.coords = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
             screen.withdraw()
-            screen.update_idletasks()
-            time.sleep(0.2)
+            screen.after(200, on_hidden)
+
+        def on_hidden():
             screen.destroy()
-            self.root.after(0, self._show_capture_ui)
+            self._show_capture_ui()
 
         canvas.bind("<ButtonPress-1>", on_click)
         canvas.bind("<B1-Motion>", on_drag)
         canvas.bind("<ButtonRelease-1>", on_release)
 
-        screen.mainloop()
+    def _release_session(self):
+        # The last session's thumbnails stay clickable until a new session
+        # starts, so its store is only closed then
+        self.thumbnails.clear()
+        self._release_frames()
+
+    def _release_frames(self):
+        if self.frames is None:
+            return
+        if self._discard_frames:
+            self.frames.discard()  # Saved; the journal is no longer needed
+        else:
+            self.frames.close()  # Kept, so the session can be resumed
+        self.frames = None
+        self._discard_frames = False
+
+    def _discard_journal(self, frames):
+        # Deleted when the store is released, or now if it already was and
+        # no newer store (a resume) has the same journal open
+        current = self.frames
+        if current is frames:
+            self._discard_frames = True
+        elif current is None or current.journal_dir != frames.journal_dir:
+            frames.discard()
+
+    def close(self):
+        # At exit, after the Tk root is gone
+        self._release_frames()
+
+    def _bind_thumbnails(self, frames, signatures):
+        # Rows read their own session's store, never whatever self.frames
+        # is by the time they load or are clicked
+        def load(index):
+            # Runs on the strip's loader thread; FrameStore.get is locked
+            return make_thumbnail(frames.get(index))
+
+        def select(index):
+            if index >= len(frames):
+                return
+            rgb = cv2.cvtColor(frames.get(index), cv2.COLOR_BGR2RGB)
+            # The signature lets auto-arrange skip re-reading the frame
+            self.preview_canvas.add_image(Image.fromarray(rgb), signatures.get(index))
+
+        self.thumbnails.loader = load
+        self.thumbnails.on_select = select
+
+    def resume(self):
+        # Reopens a session journal left by a crash or a closed window
+        directory = filedialog.askdirectory(
+            title="Resume capture session", initialdir=session_root()
+        )
+        if not directory:
+            return
+        if not is_journal(directory):
+            messagebox.showerror(
+                "Not a session", f"No capture session in:\n{directory}"
+            )
+            return
+
+        # The journal may be the one the last session's store still holds
+        self._release_session()
+        self.root.withdraw()
 
-    def _show_capture_ui(self):
+        def reopen():
+            # Reads only the index: frames stay memmapped in the journal,
+            # signatures come from it, and the pipeline rebuilds the stitcher
+            # from the recorded placements once the window is up. Frames
+            # journaled without details are hashed again.
+            frames = None
+            try:
+                frames = FrameStore(journal_dir=directory)
+                if "region" not in frames.meta:
+                    raise ValueError("The session has no capture region.")
+                signatures, placements = {}, []
+                for index, details in enumerate(frames.take_details()):
+                    if details is None:
+                        signature = compute_signature(frames.get(index))
+                        placements.append(None)
+                    else:
+                        signature = FrameSignature.from_dict(details["signature"])
+                        placements.append(details["placement"])
+                    signatures[index] = signature
+            except Exception as error:
+                self.bus.post(self._resume_failed, frames, error)
+                return
+            self.bus.post(self._resumed, frames, signatures, placements)
+
+        threading.Thread(target=reopen, daemon=True).start()
+
+    def _resumed(self, frames, signatures, placements):
+        self.coords = tuple(frames.meta["region"])
+        self.stitcher = create_stitcher(frames.meta.get("layout", "vertical"))
+        self._show_capture_ui(frames, signatures, placements)
+
+    def _resume_failed(self, frames, error):
+        # The root was withdrawn for the capture window that never came
+        if frames is not None:
+            frames.close()
+        self.root.deiconify()
+        messagebox.showerror("Error", f"Could not resume the session:\n{error}")
+
+    def _save_trace(self, metrics, frames):
+        # Written only when $SCREENSHOT_TRACE_DIR is set
+        path = trace_path(os.path.basename(frames.journal_dir or "session"))
+        if path:
+            metrics.save_trace(path)
+
+    def _stop_auto(self):
+        # Waits until the loop has exited, so it cannot submit to a pipeline
+        # that is draining or closed. Loops never wait on the Tk thread.
+        if self.auto_token is not None:
+            self.auto_token.cancel()
+            self.auto_token.join()
+            self.auto_token = None
+
+    def _show_capture_ui(self, frames=None, signatures=None, placements=()):
         overlay = OverlayBox(self.coords, self.root)
 
+        def on_frame_ready(index, thumb, signature):
+            if index >= len(self.frames):
+                return  # Undone before it reached the Tk thread
+            status_label.config(text=f"✅ Captured {index + 1} parts")
+            self.signatures[index] = signature
+            self.thumbnails.put(index, thumb)
+            self.thumbnails.set_count(len(self.frames))
+
+        def on_duplicate(match):
+            status_label.config(text=f"♻️ Same view as part {match + 1}, skipped")
+
+        # Frames are journaled to disk as they arrive, so the session can be
+        # resumed after a crash; thumbnails read them back on demand
+        if frames is None:
+            frames = FrameStore(
+                journal_dir=new_session_dir(),
+                meta={"region": list(self.coords), "layout": self.layout},
+            )
+        self.frames = frames
+        self.signatures = dict(signatures or {})
+        self.thumbnails.clear()
+        self._bind_thumbnails(self.frames, self.signatures)
+        self.thumbnails.set_count(len(self.frames))
+        self.pipeline = CapturePipeline(
+            self.root, self.stitcher, self.frames, on_frame_ready, on_duplicate
+        )
+        self.pipeline.restore(self.signatures, placements)
+
+        grabs = []  # Manual grab threads, possibly still running
+
+        def wait_for_grabs():
+            # Their frames are submitted before the pipeline drains or closes
+            for thread in grabs:
+                thread.join()
+            grabs.clear()
+
         def capture():
-            geo = overlay.geometry()
-            size_part, pos_part = geo.split("+", 1)
-            width, height = map(int, size_part.split("x"))
-            x, y = map(int, pos_part.split("+"))
+            region = self.geometry.to_physical(overlay.region())
+            pipeline = self.pipeline
 
             overlay.withdraw()
-            time.sleep(0.2)
-
-            screenshot = pyautogui.screenshot()
-            cropped = screenshot.crop((x, y, x + width, y + height))
-            img_np = cv2.cvtColor(np.array(cropped), cv2.COLOR_RGB2BGR)
-            self.images.append(img_np)
-
-            overlay.deiconify()
-            status_label.config(text=f"✅ Captured {len(self.images)} parts")
-
-            thumb = cropped.copy()
-            thumb.thumbnail((240, 180))
-            thumb_tk = ImageTk.PhotoImage(thumb)
-            self.thumbnail_refs.append(thumb_tk)
-
-            thumb_label = tk.Label(
-                self.thumbnail_container, image=thumb_tk, bg="#333333", cursor="hand2"
-            )
-            thumb_label.pack(pady=4, padx=4)
 
-            def on_click_thumb(image=cropped):
-                self.preview_canvas.add_image(image)  # Pass the PIL Image directly
+            def grab():
+                # Off the Tk thread, so the UI keeps repainting meanwhile
+                time.sleep(0.2)  # Let the overlay disappear from the screen
+                with pipeline.metrics.span("grab"):
+                    img_np = self.backend.grab(region)
+                self.bus.post(overlay.deiconify)
+                self.bus.post(overlay.focus_overlay)
+                pipeline.submit(img_np)
 
-            thumb_label.bind("<Button-1>", lambda e: on_click_thumb())
-            overlay.focus_overlay()
+            thread = threading.Thread(target=grab, daemon=True)
+            grabs[:] = [t for t in grabs if t.is_alive()]
+            grabs.append(thread)
+            thread.start()
 
         def finish():
             overlay.destroy()
-            stop_auto_scroll_capture()
-            if not self.images:
+            self._stop_auto()
+            wait_for_grabs()
+            self.pipeline.drain()
+            if not len(self.stitcher):
                 messagebox.showwarning("Empty", "No captures taken.")
                 return
 
-            max_width = max(img.shape[1] for img in self.images)
-            padded = [
-                (
-                    cv2.copyMakeBorder(
-                        img,
-                        0,
-                        0,
-                        0,
-                        max_width - img.shape[1],
-                        cv2.BORDER_CONSTANT,
-                        value=(0, 0, 0),
-                    )
-                    if img.shape[1] < max_width
-                    else img
-                )
-                for img in self.images
-            ]
-
-            final = np.vstack(padded)
+            # Frames were stitched into the canvas as they arrived
+            final = self.stitcher.image()
+            metrics, frames = self.pipeline.metrics, self.frames
             save_path = filedialog.asksaveasfilename(
-                defaultextension=".png", filetypes=[("PNG Image", "*.png")]
+                defaultextension=".png", filetypes=EXPORT_FILETYPES
             )
-            if save_path:
-                cv2.imwrite(save_path, final)
-                messagebox.showinfo("Saved", f"Long screenshot saved:\n{save_path}")
 
             window.destroy()
-            self.images.clear()
+            self.pipeline.close()
+            self.stitcher = create_stitcher(self.layout)
             self.root.deiconify()
+            if not save_path:
+                self._save_trace(metrics, frames)
+
+            if save_path:
+                # Encoding runs in the background; progress shows in the title
+                on_progress = show_progress_in_title(self.root)
+
+                def on_saved(path):
+                    self._save_trace(metrics, frames)  # With the export stages
+                    # Only a finished export makes the journal unnecessary
+                    self._discard_journal(frames)
+                    messagebox.showinfo("Saved", f"Long screenshot saved:\n{path}")
+
+                def on_failed(error):
+                    self._save_trace(metrics, frames)
+                    on_progress(1.0, "Failed")
+                    messagebox.showerror(
+                        "Error", f"Could not save screenshot:\n{error}"
+                    )
+
+                export_image_async(
+                    self.root,
+                    final,
+                    save_path,
+                    self.export_options,
+                    on_progress=on_progress,
+                    on_done=on_saved,
+                    on_error=on_failed,
+                    metrics=metrics,
+                )
 
         def undo():
-            if self.images:
-                self.images.pop()
+            wait_for_grabs()  # A capture just taken is the one to undo
+            self.pipeline.drain()
+            if self.pipeline.undo():
+                self.signatures.pop(len(self.frames), None)
+                self.thumbnails.set_count(len(self.frames))
                 status_label.config(
-                    text=f"⏪ Undid last capture. {len(self.images)} left."
+                    text=f"⏪ Undid last capture. {len(self.stitcher)} left."
                 )
             else:
                 messagebox.showinfo("Nothing to undo", "No captured images to undo.")
 
         def auto_scroll():
             overlay.withdraw()
-            start_auto_scroll_screenshot(self.root, self.coords, self.images)
+            self._stop_auto()
+            self.auto_token = start_auto_scroll_screenshot(
+                self.root,
+                self.geometry.to_physical(overlay.region()),
+                self.pipeline,
+                self.backend,
+                self.auto_settings,
+                on_status=lambda text: status_label.config(text=text),
+            )
+
+        def driven_scroll():
+            overlay.withdraw()
+            self._stop_auto()
+            self.auto_token = start_driven_scroll_screenshot(
+                self.root,
+                self.geometry.to_physical(overlay.region()),
+                self.pipeline,
+                self.backend,
+                self.auto_settings,
+                on_status=lambda text: status_label.config(text=text),
+            )
 
         def on_close():
-            stop_auto_scroll_capture()
+            self._stop_auto()
+            wait_for_grabs()
+            self.pipeline.close()
+            self._save_trace(self.pipeline.metrics, self.frames)
+            # Closing without saving keeps the journal for resuming, unless
+            # there is nothing in it or the user lets it go
+            if not len(self.frames) or not messagebox.askyesno(
+                "Keep session?",
+                "Keep these captures so the session can be resumed later?",
+                parent=window,
+            ):
+                self._discard_journal(self.frames)
             overlay.destroy()
             window.destroy()
             self.root.deiconify()
 
         window = tk.Toplevel(self.root)
         window.title("Long Screenshot Capture")
-        window.geometry("300x180")
+        window.geometry("300x265")
         window.resizable(False, False)
         window.protocol("WM_DELETE_WINDOW", on_close)
         window.protocol("")
@@ -170,6 +406,7 @@ class ScreenshotManager:
         tk.Label(window, text="Scroll and press capture repeatedly").pack(pady=10)
         tk.Button(window, text="📸 Capture Current View", command=capture).pack(pady=5)
         tk.Button(window, text="⚙️ Start Auto Scroll", command=auto_scroll).pack(pady=5)
+        tk.Button(window, text="🤖 Scroll For Me", command=driven_scroll).pack(pady=5)
         tk.Button(window, text="✅ Finish & Save", command=finish).pack(pady=5)
         tk.Button(window, text="⏪ Undo Last", command=undo).pack(pady=5)
 
@@ -181,6 +418,33 @@ class ScreenshotManager:
         overlay.get_widget().bind("<Control-a>", lambda e: auto_scroll())
         overlay.get_widget().bind("<Control-m>", lambda e: window.iconify())
 
-        global status_label
         status_label = tk.Label(window, text="No captures yet.")
         status_label.pack(pady=5)
+
+        # 📈 Optional live stats for this session
+        show_hud = tk.BooleanVar(value=False)
+        hud_label = tk.Label(window, text="", fg="#666666")
+
+        hud_pending = None  # after() id of the next HUD refresh
+
+        def toggle_hud():
+            nonlocal hud_pending
+            if hud_pending is not None:
+                window.after_cancel(hud_pending)
+                hud_pending = None
+            if show_hud.get():
+                hud_label.pack(pady=2)
+                update_hud()
+            else:
+                hud_label.pack_forget()
+
+        def update_hud():
+            nonlocal hud_pending
+            hud_pending = None
+            if show_hud.get() and window.winfo_exists():
+                hud_label.config(text=hud_text(self.pipeline.metrics, self.pipeline))
+                hud_pending = window.after(HUD_INTERVAL_MS, update_hud)
+
+        tk.Checkbutton(
+            window, text="Show performance", variable=show_hud, command=toggle_hud
+        ).pack()
@@ -0,0 +1,346 @@
+import cv2
+import numpy as np
+
+# Each row is hashed by viewing its raw bytes as uint64 words and projecting
+# them onto fixed random weights, so a whole frame hashes in a single matmul.
+# Weights are seeded by row length, so hashes agree across processes.
+_weights_cache = {}
+
+
+def _weights(n, seed):
+    key = (n, seed)
+    weights = _weights_cache.get(key)
+    if weights is None:
+        rng = np.random.default_rng((seed, n))
+        weights = rng.integers(1, 2**63, size=n, dtype=np.uint64) | np.uint64(1)
+        _weights_cache[key] = weights
+    return weights
+
+
+def row_hashes(frame):
+    rows = np.ascontiguousarray(frame).reshape(frame.shape[0], -1)
+    n_words = rows.shape[1] // 8
+    hashes = rows[:, : n_words * 8].view(np.uint64) @ _weights(n_words, 0)
+
+    tail = rows[:, n_words * 8 :]
+    if tail.shape[1]:
+        hashes += tail.astype(np.uint64) @ _weights(tail.shape[1], 1)
+    return hashes
+
+
+BANDS = 8  # Vertical bands of columns hashed separately by band_hashes
+
+
+def band_hashes(frame, bands=BANDS):
+    # One hash per row per vertical band, shape (rows, bands). A band that
+    # never changes (a sidebar) or changes on its own (an animated ad) can
+    # then be told apart from the columns that scroll.
+    rows = np.ascontiguousarray(frame).reshape(frame.shape[0], -1)
+    band_bytes = rows.shape[1] // bands
+    if not band_bytes:
+        return row_hashes(rows)[:, None]
+    cells = rows[:, : band_bytes * bands].reshape(-1, band_bytes)
+    hashes = row_hashes(cells).reshape(frame.shape[0], bands)
+    if rows.shape[1] > band_bytes * bands:
+        hashes[:, -1] += row_hashes(rows[:, band_bytes * bands :])
+    return hashes
+
+
+def static_rows(prev_hashes, curr_hashes):
+    # Rows whose hashes are unchanged at the same position, or None
+    if prev_hashes.shape != curr_hashes.shape:
+        return None
+    static = prev_hashes == curr_hashes
+    return static if static.ndim == 1 else static.all(axis=1)
+
+
+def sticky_bands(static):
+    # Heights of the unchanged runs at the top and bottom of a static mask:
+    # sticky headers and footers when the rows between them scrolled
+    if static is None or static.all():
+        return 0, 0
+    return int(np.argmin(static)), int(np.argmin(static[::-1]))
+
+
+def _unique_rows(hashes, ignore=None):
+    values, first_index, counts = np.unique(
+        hashes, return_index=True, return_counts=True
+    )
+    unique = counts == 1
+    if ignore is not None:
+        unique &= ~ignore[first_index]
+    return values[unique], first_index[unique]
+
+
+def _vote_offset(prev_hashes, curr_hashes, min_overlap, min_match, ignore=None):
+    # Rows that occur exactly once in both frames vote for a shift, and the
+    # most voted shifts are verified against the whole overlap. Rows flagged
+    # in `ignore` (unchanged at the same position in both frames) neither
+    # vote nor count when verifying.
+    prev_values, prev_index = _unique_rows(prev_hashes, ignore)
+    curr_values, curr_index = _unique_rows(curr_hashes, ignore)
+    _, ia, ib = np.intersect1d(
+        prev_values, curr_values, assume_unique=True, return_indices=True
+    )
+    if not len(ia):
+        return None
+
+    shifts = prev_index[ia] - curr_index[ib]
+    shifts = shifts[(shifts >= 0) & (shifts <= len(prev_hashes) - min_overlap)]
+    if not len(shifts):
+        return None
+
+    votes = np.bincount(shifts)
+    for shift in np.argsort(votes)[::-1][:5]:
+        if not votes[shift]:
+            break
+        overlap = min(len(prev_hashes) - shift, len(curr_hashes))
+        same = prev_hashes[shift : shift + overlap] == curr_hashes[:overlap]
+        if ignore is None:
+            matched, total = np.count_nonzero(same), overlap
+        else:
+            valid = ~(ignore[shift : shift + overlap] | ignore[:overlap])
+            matched, total = np.count_nonzero(same & valid), np.count_nonzero(valid)
+            if total < min_overlap:
+                continue
+        if matched >= min_match * total:
+            return int(shift)
+    return None
+
+
+def find_vertical_offset(prev_hashes, curr_hashes, min_overlap=16, min_match=0.9):
+    # How many rows `curr` is scrolled down relative to `prev`, or None.
+    # For band hashes each band votes on its own, ignoring the cells that
+    # did not change in place (sticky headers, footers and sidebars), and
+    # the shift most bands agree on wins, so one animated band is outvoted.
+    if prev_hashes.ndim == 1:
+        return _vote_offset(prev_hashes, curr_hashes, min_overlap, min_match)
+
+    static = None
+    if prev_hashes.shape == curr_hashes.shape:
+        static = prev_hashes == curr_hashes
+        if static.all():
+            return 0
+
+    # Whole rows first (band hashes sum to a row hash): the common case of
+    # a page without sticky or animated bands needs one vote, not one per band
+    shift = _vote_offset(
+        prev_hashes.sum(axis=1), curr_hashes.sum(axis=1), min_overlap, min_match
+    )
+    if shift is not None:
+        return shift
+
+    shifts = []
+    for band in range(min(prev_hashes.shape[1], curr_hashes.shape[1])):
+        ignore = None if static is None else static[:, band]
+        if ignore is not None and ignore.all():
+            continue  # Nothing in this band changed
+        shift = _vote_offset(
+            prev_hashes[:, band], curr_hashes[:, band], min_overlap, min_match, ignore
+        )
+        if shift is not None:
+            shifts.append(shift)
+    if not shifts:
+        return None
+    return int(np.bincount(shifts).argmax())
+
+
+class StitchCanvas:
+    # Output buffer that grows in chunks of rows as strips arrive. Growing
+    # uses ndarray.resize, which reallocates in place where the allocator
+    # allows, so the canvas is never held twice.
+    def __init__(self, chunk_rows=2048):
+        self.chunk_rows = chunk_rows
+        self.height = 0
+        self.width = 0
+        self._buffer = None
+
+    def _reserve(self, height, width, tail_shape, dtype):
+        if self._buffer is None:
+            rows = -(-height // self.chunk_rows) * self.chunk_rows
+            self._buffer = np.zeros((rows, width) + tail_shape, dtype=dtype)
+            return
+
+        rows, buffer_width = self._buffer.shape[:2]
+        if height <= rows and width <= buffer_width:
+            return
+
+        rows = max(rows, -(-height // self.chunk_rows) * self.chunk_rows)
+        if width <= buffer_width:
+            try:
+                self._buffer.resize((rows,) + self._buffer.shape[1:])
+                return
+            except ValueError:
+                pass  # Someone still holds a view of the buffer
+
+        # Wider frame (or shared buffer): copy into a new allocation
+        grown = np.zeros(
+            (rows, max(width, buffer_width)) + self._buffer.shape[2:],
+            dtype=self._buffer.dtype,
+        )
+        grown[: self.height, :buffer_width] = self._buffer[: self.height]
+        self._buffer = grown
+
+    def append(self, rows):
+        height = self.height + rows.shape[0]
+        self._reserve(height, rows.shape[1], rows.shape[2:], rows.dtype)
+        self._buffer[self.height : height, : rows.shape[1]] = rows
+        self._buffer[self.height : height, rows.shape[1] :] = 0
+        self.height = height
+        self.width = max(self.width, rows.shape[1])
+
+    def truncate(self, height, width):
+        self.height = height
+        self.width = width
+
+    def view(self):
+        if self._buffer is None or not self.height:
+            return None
+        return self._buffer[: self.height, : self.width]
+
+
+def seam_costs(errors, feather=0):
+    # Cost of cutting before each row 0..len(errors): the differences of the
+    # rows around the cut and of the `feather` rows blended above it. Cuts
+    # that leave no room for feathering are not offered.
+    prefix = np.concatenate(([0], np.cumsum(errors)))
+    cuts = np.arange(feather, len(errors) + 1)
+    first = np.maximum(cuts - feather - 1, 0)
+    last = np.minimum(cuts + 1, len(errors))
+    return cuts, prefix[last] - prefix[first]
+
+
+class VerticalStitcher:
+    def __init__(self, min_overlap=16, min_match=0.9, seams=True, feather=0):
+        self.min_overlap = min_overlap
+        self.min_match = min_match
+        self.seams = seams  # Cut where the overlap agrees best, not at its end
+        self.feather = feather  # Rows blended across each cut
+
+        self.canvas = StitchCanvas()
+        # Per frame: (canvas height, canvas width, band hashes, shape, rows
+        # at the end of the canvas that this frame replaced or blended into,
+        # (seam, rows cut, rows feathered))
+        self._history = []
+
+    def __len__(self):
+        return len(self._history)
+
+    def _choose_seam(self, frame, header, start, footer, changed):
+        # Canvas row height - footer - k shows what frame row start - k does,
+        # so the overlap is compared in place. The cut goes where the two
+        # agree best, nearest the middle of the overlap on ties; only the
+        # overlap rows are read. None when there is nothing to choose.
+        view = self.canvas.view()
+        rows = min(start - header, view.shape[0] - footer)
+        if rows <= self.feather or not changed[start - rows : start].any():
+            return None  # Overlap hashes alike: the usual cut is invisible
+        end = view.shape[0] - footer
+        old = view[end - rows : end, : frame.shape[1]]
+        diff = cv2.absdiff(old, frame[start - rows : start]).reshape(rows, -1)
+        errors = diff.sum(axis=1, dtype=np.int64)
+        if not errors.any():
+            return None  # Identical overlap: any cut is invisible
+
+        cuts, costs = seam_costs(errors, self.feather)
+        best = cuts[costs == costs.min()]
+        cut = best[np.argmin(np.abs(best - rows / 2))]
+        return start - rows + int(cut)
+
+    def _blend(self, frame, seam, feather):
+        # Fades from the canvas into `frame` over the rows above the cut
+        rows = self.canvas.view()[-feather:, : frame.shape[1]]
+        weights = np.arange(1, feather + 1, dtype=np.float32) / (feather + 1)
+        weights = weights.reshape((-1,) + (1,) * (rows.ndim - 1))
+        new = frame[seam - feather : seam]
+        rows[:] = np.rint(rows * (1 - weights) + new * weights).astype(rows.dtype)
+
+    def add(self, frame, hashes=None):
+        # Returns the number of leading rows skipped as overlap
+        if hashes is None:
+            hashes = band_hashes(frame)
+        start = footer = header = 0
+
+        if self._history:
+            _, _, prev_hashes, prev_shape, _, _ = self._history[-1]
+            if frame.shape[1:] == prev_shape:
+                shift = find_vertical_offset(
+                    prev_hashes, hashes, self.min_overlap, self.min_match
+                )
+                if shift is not None:
+                    # A sticky footer is already at the end of the canvas; it
+                    # is replaced rather than stored again for every frame,
+                    # and a sticky header is never appended again
+                    if shift:
+                        header, footer = sticky_bands(static_rows(prev_hashes, hashes))
+                        footer = min(footer, len(prev_hashes) - shift)
+                    start = max(
+                        min(len(prev_hashes) - shift, frame.shape[0]) - footer, header
+                    )
+
+        seam, feather = start, 0
+        if self.seams and header < start < frame.shape[0]:
+            # Rows the previous frame shows differently, by their hashes
+            changed = prev_hashes[shift : shift + start] != hashes[:start]
+            if changed.ndim > 1:
+                changed = changed.any(axis=1)
+            chosen = self._choose_seam(frame, header, start, footer, changed)
+            if chosen is not None:
+                seam, feather = chosen, self.feather
+
+        # Canvas rows the frame shows instead
+        self._apply(frame, hashes, seam, footer + start - seam, feather)
+        return seam
+
+    def _apply(self, frame, hashes, seam, cut, feather):
+        entry = (self.canvas.height, self.canvas.width, hashes, frame.shape[1:])
+        replaced = None
+        if cut + feather:
+            replaced = self.canvas.view()[-(cut + feather) :].copy()
+            self.canvas.truncate(self.canvas.height - cut, self.canvas.width)
+        if feather:
+            self._blend(frame, seam, feather)
+        self._history.append(entry + (replaced, (seam, cut, feather)))
+        if seam < frame.shape[0]:
+            self.canvas.append(frame[seam:])
+
+    def placement(self):
+        # How the newest frame was joined, for a journal to replay it
+        _, _, hashes, _, _, (seam, cut, feather) = self._history[-1]
+        return {"hashes": hashes, "seam": seam, "cut": cut, "feather": feather}
+
+    def replay(self, frame, placement):
+        # Re-adds a frame the way placement() recorded, without hashing or
+        # matching it again
+        self._apply(
+            frame,
+            placement["hashes"],
+            placement["seam"],
+            placement["cut"],
+            placement["feather"],
+        )
+
+    def pop(self):
+        if not self._history:
+            return False
+        height, width, _, _, replaced, _ = self._history.pop()
+        if replaced is None:
+            self.canvas.truncate(height, width)
+        else:
+            self.canvas.truncate(height - len(replaced), width)
+            self.canvas.append(replaced)
+        return True
+
+    def image(self):
+        # What exporters read; here the canvas already is one dense array
+        return self.result()
+
+    def result(self):
+        return self.canvas.view()
+
+
+def stitch_vertical(frames, min_overlap=16, min_match=0.9, feather=0):
+    stitcher = VerticalStitcher(min_overlap, min_match, feather=feather)
+    for frame in frames:
+        stitcher.add(frame)
+    return stitcher.result()
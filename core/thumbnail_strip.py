@@ -0,0 +1,175 @@
+import tkinter as tk
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import ttk
+
+from PIL import ImageTk
+
+from core.events import event_bus
+
+THUMB_SIZE = (240, 180)
+ROW_HEIGHT = THUMB_SIZE[1] + 8
+
+
+class ThumbnailStrip:
+    # Virtualized list of frame thumbnails. Rows are a fixed height, so the
+    # rows in view follow from the scroll position; only those have a Label,
+    # and Labels are recycled as rows scroll out. Thumbnails live in an LRU
+    # of PIL images; misses are made by `loader(index)` on a background
+    # thread and shown when they arrive.
+    def __init__(self, parent, loader=None, on_select=None, cache_size=128):
+        self.loader = loader  # index → PIL thumbnail, called off the Tk thread
+        self.on_select = on_select  # index, on click
+        self.cache_size = cache_size
+
+        self.canvas = tk.Canvas(
+            parent,
+            bg="#1e1e1e",
+            highlightthickness=0,
+            width=THUMB_SIZE[0] + 8,
+            yscrollincrement=ROW_HEIGHT // 2,
+        )
+        scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self._yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        self.canvas.pack(side="left", fill="y", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        self._count = 0
+        self._cache = OrderedDict()  # index → PIL thumbnail
+        self._rows = {}  # index → (window item, Label) for rows in view
+        self._spare = []  # Hidden (window item, Label) pairs for reuse
+        self._loading = set()
+        self._generation = 0  # Bumped when indices stop meaning the same frame
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        self._bus = event_bus(parent)
+
+        self.canvas.bind("<Configure>", lambda e: self._refresh())
+        self._bind_wheel(self.canvas)
+
+    def __len__(self):
+        return self._count
+
+    def put(self, index, thumb):
+        self._cache[index] = thumb
+        self._cache.move_to_end(index)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        if index in self._rows:
+            self._show(index)
+
+    def set_count(self, count):
+        # Call after frames are added or undone; rows past `count` go away
+        following = self._count == 0 or self.canvas.yview()[1] >= 0.999
+        if count < self._count:
+            self._generation += 1
+            self._loading.clear()
+            for index in [i for i in self._cache if i >= count]:
+                del self._cache[index]
+            for index in list(self._rows):
+                self._release(index)
+
+        self._count = count
+        self.canvas.configure(
+            scrollregion=(0, 0, THUMB_SIZE[0] + 8, count * ROW_HEIGHT)
+        )
+        if following:
+            self.canvas.yview_moveto(1.0)
+        self._refresh()
+
+    def clear(self):
+        self.set_count(0)
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+    # ---- Virtualization ----
+
+    def _yview(self, *args):
+        self.canvas.yview(*args)
+        self._refresh()
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel)
+        widget.bind("<Button-4>", self._on_wheel)
+        widget.bind("<Button-5>", self._on_wheel)
+
+    def _on_wheel(self, event):
+        up = event.num == 4 or getattr(event, "delta", 0) > 0
+        self.canvas.yview_scroll(-1 if up else 1, "units")
+        self._refresh()
+
+    def _refresh(self):
+        top = int(self.canvas.canvasy(0))
+        bottom = top + self.canvas.winfo_height()
+        first = max(0, top // ROW_HEIGHT)
+        last = min(self._count, bottom // ROW_HEIGHT + 1)
+
+        for index in [i for i in self._rows if not first <= i < last]:
+            self._release(index)
+        for index in range(first, last):
+            if index not in self._rows:
+                self._bind_row(index)
+
+    def _bind_row(self, index):
+        y = index * ROW_HEIGHT + 4
+        if self._spare:
+            item, label = self._spare.pop()
+            self.canvas.coords(item, 4, y)
+            self.canvas.itemconfigure(item, state="normal")
+        else:
+            label = tk.Label(self.canvas, bg="#333333", fg="#aaaaaa", cursor="hand2")
+            self._bind_wheel(label)
+            item = self.canvas.create_window(4, y, window=label, anchor="nw")
+        label.bind("<Button-1>", lambda e, index=index: self._select(index))
+        self._rows[index] = (item, label)
+        self._show(index)
+
+    def _release(self, index):
+        item, label = self._rows.pop(index)
+        self.canvas.itemconfigure(item, state="hidden")
+        label.configure(image="")
+        label.image = None
+        self._spare.append((item, label))
+
+    def _show(self, index):
+        _, label = self._rows[index]
+        thumb = self._cache.get(index)
+        if thumb is None:
+            label.configure(image="", text=f"Part {index + 1}…")
+            label.image = None
+            self._request(index)
+            return
+        self._cache.move_to_end(index)
+        photo = ImageTk.PhotoImage(thumb)
+        label.configure(image=photo, text="")
+        label.image = photo  # Only rows in view hold a PhotoImage
+
+    def _select(self, index):
+        if self.on_select and index < self._count:
+            self.on_select(index)
+
+    # ---- Background loading ----
+
+    def _request(self, index):
+        if self.loader is None or index in self._loading:
+            return
+        self._loading.add(index)
+        generation = self._generation
+        future = self._pool.submit(self.loader, index)
+        future.add_done_callback(
+            lambda f: self._bus.after(0, self._loaded, index, generation, f)
+        )
+
+    def _loaded(self, index, generation, future):
+        if generation != self._generation:
+            return  # Undone or cleared while loading
+        self._loading.discard(index)
+        if index >= self._count:
+            return
+        try:
+            thumb = future.result()
+        except Exception:
+            traceback.print_exc()
+            return
+        self.put(index, thumb)
@@ -0,0 +1,404 @@
+import json
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+# Writers for screenshots too long for one PNG: a tiled pyramidal TIFF, a
+# directory of fixed-height strips with a JSON manifest, and a paged PDF.
+# Tiles, strips and pages are compressed on a thread pool (zlib and OpenCV
+# release the GIL) and written in order as they finish.
+
+TIFF_TILE = 512
+BIGTIFF_OVER = 2**32 - 2**26  # Uncompressed bytes past which offsets need 64 bits
+DENSE_LEVEL_BYTES = 64 * 2**20  # Lazily read pyramid levels past this size
+BAND_ROWS = 1024  # Rows read at a time when scanning for page breaks
+
+# Every writer takes either an ndarray or an array-like that only supports
+# .shape, .ndim, .dtype, .nbytes and 2-D slicing, such as a panorama's
+# CanvasImage, and reads it one tile, strip or page at a time.
+
+
+def _ordered(pool, func, items, ahead):
+    # pool.map that keeps at most `ahead` results in flight
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(func, item))
+        if len(pending) >= ahead:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+@contextmanager
+def partial_file(path, mode="wb"):
+    # A temp file that is deleted again if writing it fails, so a failed
+    # save never leaves a .part behind
+    f = open(path, mode)
+    try:
+        with f:
+            yield f
+    except BaseException:
+        os.remove(path)
+        raise
+
+
+def _workers(options):
+    return options.workers or os.cpu_count() or 1
+
+
+def _rgb(pixels):
+    # Frames are BGR like everything OpenCV hands out
+    return pixels if pixels.ndim == 2 else pixels[..., ::-1]
+
+
+# ---- Tiled pyramidal TIFF ----
+
+
+class _Halved:
+    # A half-size level of an array-like image, shrunk window by window as
+    # its tiles are read, so a huge level is never held whole
+    def __init__(self, source):
+        self.source = source
+        height, width = source.shape[:2]
+        self.shape = (max(1, height // 2), max(1, width // 2)) + source.shape[2:]
+        self.ndim = len(self.shape)
+        self.dtype = source.dtype
+        self.nbytes = int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+
+    def __getitem__(self, key):
+        rows, cols = key if isinstance(key, tuple) else (key, slice(None))
+        y0, y1, _ = rows.indices(self.shape[0])
+        x0, x1, _ = cols.indices(self.shape[1])
+        window = self.source[2 * y0 : 2 * y1, 2 * x0 : 2 * x1]
+        return cv2.resize(
+            np.asarray(window),
+            (max(1, x1 - x0), max(1, y1 - y0)),
+            interpolation=cv2.INTER_AREA,
+        )
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self[:, :]
+        return dense if dtype is None else dense.astype(dtype)
+
+
+def _pyramid(image, tile):
+    # Full resolution, then halved until one tile covers the image. Levels
+    # of an array-like image stay lazy until they are small enough to hold.
+    levels = [image]
+    while max(levels[-1].shape[:2]) > tile:
+        level = levels[-1]
+        if not isinstance(level, np.ndarray):
+            level = _Halved(level)
+            if level.nbytes <= DENSE_LEVEL_BYTES:
+                level = np.asarray(level)
+            levels.append(level)
+            continue
+        height, width = level.shape[:2]
+        levels.append(
+            cv2.resize(
+                level,
+                (max(1, width // 2), max(1, height // 2)),
+                interpolation=cv2.INTER_AREA,
+            )
+        )
+    return levels
+
+
+def _tiles(image, tile):
+    height, width = image.shape[:2]
+    for y in range(0, height, tile):
+        for x in range(0, width, tile):
+            yield image[y : y + tile, x : x + tile]
+
+
+def _compress_tile(part, tile, level):
+    # Padded to a full tile, then horizontal differencing (TIFF predictor 2)
+    # so flat screenshot areas deflate to almost nothing
+    padded = np.zeros((tile, tile) + part.shape[2:], dtype=np.uint8)
+    padded[: part.shape[0], : part.shape[1]] = _rgb(part)
+    padded[:, 1:] -= padded[:, :-1].copy()
+    return zlib.compress(padded.tobytes(), level)
+
+
+def _ifd(entries, offset, big, last):
+    # One image file directory at `offset`, its out-of-line values right
+    # after it. entries: (tag, type, values), type 3 SHORT, 4 LONG, 16 LONG8.
+    formats = {3: "H", 4: "I", 16: "Q"}
+    count_format, entry_format, field = ("Q", "HHQ", 8) if big else ("H", "HHI", 4)
+    head_size = struct.calcsize("<" + count_format)
+    size = (
+        head_size + len(entries) * (struct.calcsize("<" + entry_format) + field) + field
+    )
+    extra = b""
+    body = struct.pack("<" + count_format, len(entries))
+    for tag, kind, values in sorted(entries):
+        data = struct.pack(f"<{len(values)}{formats[kind]}", *values)
+        body += struct.pack("<" + entry_format, tag, kind, len(values))
+        if len(data) <= field:
+            body += data.ljust(field, b"\0")
+        else:
+            body += struct.pack("<" + ("Q" if big else "I"), offset + size + len(extra))
+            extra += data + b"\0" * (len(data) % 2)
+    next_ifd = 0 if last else offset + size + len(extra)
+    body += struct.pack("<" + ("Q" if big else "I"), next_ifd)
+    return body + extra
+
+
+def write_tiled_tiff(image, save_path, options, report):
+    tile = options.tile_size
+    levels = _pyramid(image, tile)
+    big = sum(level.nbytes for level in levels) > BIGTIFF_OVER
+    offset_type = 16 if big else 4
+    samples = 1 if image.ndim == 2 else image.shape[2]
+
+    total = sum(
+        -(-level.shape[0] // tile) * -(-level.shape[1] // tile) for level in levels
+    )
+    done = 0
+    placed = []  # Per level: (tile offsets, tile byte counts)
+    tmp_path = save_path + ".part"
+
+    def compress(part):
+        return _compress_tile(part, tile, options.png_compression)
+
+    workers = _workers(options)
+    with partial_file(tmp_path) as f, ThreadPoolExecutor(workers) as pool:
+        f.write(
+            (b"II+\0" + struct.pack("<HHQ", 8, 0, 0)) if big else b"II*\0" + bytes(4)
+        )
+        for level in levels:
+            offsets, counts = [], []
+            for data in _ordered(pool, compress, _tiles(level, tile), 4 * workers):
+                offsets.append(f.tell())
+                counts.append(len(data))
+                f.write(data)
+                done += 1
+                report(0.95 * done / total, "Encoding")
+            placed.append((offsets, counts))
+
+        # Directories go last, when all tile offsets are known
+        if f.tell() % 2:
+            f.write(b"\0")
+        first_ifd = f.tell()
+        for index, (level, (offsets, counts)) in enumerate(zip(levels, placed)):
+            entries = [
+                (254, 4, [0 if index == 0 else 1]),  # Reduced-resolution copy
+                (256, 4, [level.shape[1]]),
+                (257, 4, [level.shape[0]]),
+                (258, 3, [8] * samples),
+                (259, 3, [8]),  # Deflate
+                (262, 3, [1 if samples == 1 else 2]),
+                (277, 3, [samples]),
+                (284, 3, [1]),
+                (317, 3, [2]),  # Horizontal differencing
+                (322, 4, [tile]),
+                (323, 4, [tile]),
+                (324, offset_type, offsets),
+                (325, offset_type, counts),
+            ]
+            f.write(_ifd(entries, f.tell(), big, index == len(levels) - 1))
+        f.seek(8 if big else 4)
+        f.write(struct.pack("<Q" if big else "<I", first_ifd))
+    os.replace(tmp_path, save_path)
+
+
+# ---- Strips and manifest ----
+
+
+def _previous_strips(save_path, base):
+    # Files in `base` that an earlier export to save_path wrote, so they can
+    # be replaced; anything else there is not ours to delete
+    if not os.path.lexists(base):
+        return []
+    owned = set()
+    prefix = os.path.basename(base) + "/"
+    try:
+        with open(save_path) as f:
+            strips = json.load(f)["strips"]
+        owned = {
+            s["file"][len(prefix) :] for s in strips if s["file"].startswith(prefix)
+        }
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    if os.path.isdir(base) and not os.path.islink(base):
+        names = os.listdir(base)
+        if set(names) <= owned:
+            return names
+    raise FileExistsError(
+        f"{base} already exists and is not a strip set of "
+        f"{os.path.basename(save_path)}; choose another name"
+    )
+
+
+def write_strips(image, save_path, options, report):
+    # save_path is the manifest; strips go in a directory named after it.
+    # They are written to a fresh directory that replaces the old set only
+    # once complete, so no stale strips from an earlier export remain. An
+    # existing directory is only replaced if that export's manifest lists
+    # everything in it.
+    base = os.path.splitext(save_path)[0]
+    directory = os.path.basename(base)
+    previous = _previous_strips(save_path, base)
+    tmp_dir = tempfile.mkdtemp(
+        dir=os.path.dirname(base) or ".", prefix=directory + ".part-"
+    )
+    ext = options.strip_format
+    params = options.imwrite_params(ext)
+    height = image.shape[0]
+    starts = range(0, height, options.strip_height)
+
+    def encode(y):
+        ok, data = cv2.imencode(ext, image[y : y + options.strip_height], params)
+        if not ok:
+            raise ValueError(f"Could not encode strip as {ext}")
+        return y, data
+
+    strips = []
+    workers = _workers(options)
+    try:
+        with ThreadPoolExecutor(workers) as pool:
+            for y, data in _ordered(pool, encode, starts, 2 * workers):
+                name = f"{len(strips):05d}{ext}"
+                data.tofile(os.path.join(tmp_dir, name))
+                strips.append(
+                    {
+                        "file": f"{directory}/{name}",
+                        "y": y,
+                        "height": min(options.strip_height, height - y),
+                    }
+                )
+                report(0.95 * len(strips) / len(starts), "Encoding")
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    # The old manifest goes first, so it never lists the new set's strips
+    if os.path.exists(save_path):
+        os.remove(save_path)
+    if os.path.isdir(base):
+        for name in previous:
+            os.remove(os.path.join(base, name))
+        os.rmdir(base)
+    os.replace(tmp_dir, base)
+
+    # The manifest is written last, so its presence means the set is complete
+    manifest = {
+        "width": image.shape[1],
+        "height": height,
+        "strip_height": options.strip_height,
+        "strips": strips,
+    }
+    with partial_file(save_path + ".part", "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(save_path + ".part", save_path)
+
+
+# ---- Paged PDF ----
+
+
+def find_page_breaks(image, page_height, slack=0.2, tolerance=16):
+    # Rows to start new pages at. Each break is searched in the last `slack`
+    # of the page: the row where the fewest pixels differ from the row above
+    # wins, the latest on ties, so pages end between lines of text.
+    height = image.shape[0]
+    if height <= page_height:
+        return []
+    # Counted in bands that overlap by a row, never converting the whole image
+    changed = np.zeros(height, dtype=np.int64)
+    for y in range(0, height, BAND_ROWS):
+        top = max(0, y - 1)
+        band = image[top : y + BAND_ROWS]
+        gray = band if band.ndim == 2 else cv2.cvtColor(band, cv2.COLOR_BGR2GRAY)
+        diff = cv2.absdiff(gray[1:], gray[:-1]) > tolerance
+        changed[top + 1 : top + len(gray)] = np.count_nonzero(diff, axis=1)
+
+    breaks = []
+    start = 0
+    while height - start > page_height:
+        lo = start + max(1, int(page_height * (1 - slack)))
+        hi = start + page_height
+        window = changed[lo : hi + 1]
+        best = np.flatnonzero(window == window.min())[-1]
+        start = lo + int(best)
+        breaks.append(start)
+    return breaks
+
+
+def write_paged_pdf(image, save_path, options, report):
+    # Pages are cut at content-aware break rows and each holds one lossless
+    # (Flate) image; 96 px per inch
+    width = image.shape[1]
+    page_height = options.page_height or round(width * 297 / 210)  # A4 shape
+    edges = [0] + find_page_breaks(image, page_height) + [image.shape[0]]
+    color = "/DeviceGray" if image.ndim == 2 else "/DeviceRGB"
+    pages = len(edges) - 1
+    level = options.png_compression
+
+    def encode(bounds):
+        pixels = np.ascontiguousarray(_rgb(image[bounds[0] : bounds[1]]))
+        return pixels.shape[1], pixels.shape[0], zlib.compress(pixels.tobytes(), level)
+
+    # Objects: 1 catalog, 2 page tree, then page, contents, image per page
+    tmp_path = save_path + ".part"
+    offsets = []
+    workers = _workers(options)
+    with partial_file(tmp_path) as f, ThreadPoolExecutor(workers) as pool:
+
+        def start_object():
+            offsets.append(f.tell())
+            f.write(f"{len(offsets)} 0 obj\n".encode())
+
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        start_object()
+        f.write(b"<< /Type /Catalog /Pages 2 0 R >>\nendobj\n")
+        start_object()
+        kids = " ".join(f"{3 + 3 * page} 0 R" for page in range(pages))
+        f.write(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>\nendobj\n".encode())
+
+        ranges = zip(edges[:-1], edges[1:])
+        for page, (w, h, data) in enumerate(_ordered(pool, encode, ranges, workers)):
+            number = 3 + 3 * page
+            points_w, points_h = w * 0.75, h * 0.75
+            start_object()
+            f.write(
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {points_w:g} {points_h:g}]"
+                f" /Resources << /XObject << /Im0 {number + 2} 0 R >> >>"
+                f" /Contents {number + 1} 0 R >>\nendobj\n".encode()
+            )
+            content = f"q {points_w:g} 0 0 {points_h:g} 0 0 cm /Im0 Do Q".encode()
+            start_object()
+            f.write(f"<< /Length {len(content)} >>\nstream\n".encode())
+            f.write(content + b"\nendstream\nendobj\n")
+            start_object()
+            f.write(
+                f"<< /Type /XObject /Subtype /Image /Width {w} /Height {h}"
+                f" /ColorSpace {color} /BitsPerComponent 8 /Filter /FlateDecode"
+                f" /Length {len(data)} >>\nstream\n".encode()
+            )
+            f.write(data + b"\nendstream\nendobj\n")
+            report(0.95 * (page + 1) / pages, "Encoding")
+
+        xref = f.tell()
+        f.write(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode())
+        for offset in offsets:
+            f.write(f"{offset:010d} 00000 n \n".encode())
+        f.write(
+            f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\n"
+            f"startxref\n{xref}\n%%EOF\n".encode()
+        )
+    os.replace(tmp_path, save_path)
+
+
+LARGE_WRITERS = {
+    ".tif": write_tiled_tiff,
+    ".tiff": write_tiled_tiff,
+    ".json": write_strips,
+    ".pdf": write_paged_pdf,
+}
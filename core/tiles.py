@@ -0,0 +1,87 @@
+import math
+from collections import OrderedDict
+
+from PIL import Image
+
+TILE_SIZE = 256  # Tile edge in screen pixels
+
+
+class ImagePyramid:
+    # Mipmap levels of one image, built lazily: level k is 1/2**k scale
+    def __init__(self, image):
+        self.levels = [image]
+
+    @property
+    def size(self):
+        return self.levels[0].size
+
+    def level_for(self, zoom):
+        # Smallest level that is still at least as large as the zoom
+        if zoom >= 1.0:
+            return 0
+        return int(math.floor(math.log2(1.0 / zoom)))
+
+    def level(self, k):
+        while len(self.levels) <= k and min(self.levels[-1].size) > 1:
+            self.levels.append(self.levels[-1].reduce(2))
+        return self.levels[min(k, len(self.levels) - 1)]
+
+    def scaled_size(self, zoom):
+        width, height = self.size
+        return max(1, round(width * zoom)), max(1, round(height * zoom))
+
+    def render_tile(self, zoom, tx, ty):
+        # Tile (tx, ty) of the image drawn at `zoom`, as a PIL image
+        scaled_w, scaled_h = self.scaled_size(zoom)
+        x0, y0 = tx * TILE_SIZE, ty * TILE_SIZE
+        x1, y1 = min(x0 + TILE_SIZE, scaled_w), min(y0 + TILE_SIZE, scaled_h)
+
+        k = self.level_for(zoom)
+        source = self.level(k)
+        # Screen pixels -> pixels of the chosen level
+        fx = source.width / scaled_w
+        fy = source.height / scaled_h
+        box = (x0 * fx, y0 * fy, x1 * fx, y1 * fy)
+        resample = Image.Resampling.NEAREST if zoom >= 2 else Image.Resampling.BILINEAR
+        return source.resize((x1 - x0, y1 - y0), resample, box=box)
+
+    def tile_range(self, zoom, screen_x, screen_y, view_w, view_h):
+        # Tiles of an image whose top-left is at (screen_x, screen_y) that
+        # intersect the view rectangle (0, 0, view_w, view_h)
+        scaled_w, scaled_h = self.scaled_size(zoom)
+        left = max(0, -screen_x)
+        top = max(0, -screen_y)
+        right = min(scaled_w, view_w - screen_x)
+        bottom = min(scaled_h, view_h - screen_y)
+        if right <= left or bottom <= top:
+            return range(0), range(0)
+        return (
+            range(left // TILE_SIZE, (right - 1) // TILE_SIZE + 1),
+            range(top // TILE_SIZE, (bottom - 1) // TILE_SIZE + 1),
+        )
+
+
+class TileCache:
+    # LRU of rendered tiles keyed by (image_id, zoom, tx, ty)
+    def __init__(self, capacity=512):
+        self.capacity = capacity
+        self._items = OrderedDict()
+
+    def get(self, key):
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+
+    def discard_image(self, image_id):
+        for key in [key for key in self._items if key[0] == image_id]:
+            del self._items[key]
+
+    def clear(self):
+        self._items.clear()
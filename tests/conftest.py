@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+
+class ImmediateDispatcher:
+    # Stands in for the Tk root: `after` callbacks run at once
+    def after(self, ms, func, *args):
+        func(*args)
+
+
+def text_page(height, width, seed=0):
+    # Text-like page: rows of random "glyph" blocks on white, blank line
+    # spacing in between, so no two lines repeat
+    rng = np.random.default_rng(seed)
+    ink = rng.random((height, -(-width // 4))) < 0.25
+    ink[np.arange(height) % 24 >= 16] = False
+    ink = np.repeat(ink, 4, axis=1)[:, :width]
+    page = np.full((height, width, 3), 255, np.uint8)
+    page[ink] = (40, 40, 40)
+    return page
+
+
+def blocky_image(height, width, seed=0, block=8):
+    # Detail in both directions, coarse enough to survive a few pyrDowns
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (-(-height // block), -(-width // block), 3))
+    image = np.repeat(np.repeat(coarse, block, axis=0), block, axis=1)
+    noise = rng.integers(0, 24, (height, width, 3))
+    return (image[:height, :width] + noise).clip(0, 255).astype(np.uint8)
+
+
+@pytest.fixture
+def dispatcher():
+    return ImmediateDispatcher()
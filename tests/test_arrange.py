@@ -0,0 +1,72 @@
+from core.arrange import arrange, build_chains
+from core.frame_signature import compute_signature
+from tests.conftest import text_page
+
+
+def shots(page, tops, first_id, height=300):
+    return [
+        (
+            first_id + i,
+            page.shape[1],
+            height,
+            compute_signature(page[top : top + height]),
+        )
+        for i, top in enumerate(tops)
+    ]
+
+
+def test_scrolled_parts_chain_at_their_offsets():
+    page = text_page(1200, 200, seed=1)
+    items = shots(page, [0, 120, 300, 500], 10)
+    assert build_chains(items) == [[(10, 0), (11, 120), (12, 300), (13, 500)]]
+
+
+def test_interleaved_captures_keep_separate_stacks():
+    first = text_page(1000, 200, seed=2)
+    second = text_page(1000, 240, seed=3)
+    a = shots(first, [0, 200, 400], 0)
+    b = shots(second, [0, 150, 300], 100)
+    lone = shots(text_page(300, 160, seed=4), [0], 200)
+    items = [a[0], b[0], a[1], lone[0], b[1], a[2], b[2]]
+    assert build_chains(items) == [
+        [(0, 0), (1, 200), (2, 400)],
+        [(100, 0), (101, 150), (102, 300)],
+        [(200, 0)],
+    ]
+
+
+def test_arranged_stacks_do_not_overlap():
+    items = []
+    for n, seed in enumerate(range(5, 11)):
+        page = text_page(900, 150 + 20 * n, seed=seed)
+        items += shots(page, [0, 200, 400][: 1 + n % 3], 10 * n)
+    positions = arrange(items, gap=20)
+    assert set(positions) == {image_id for image_id, *_ in items}
+
+    boxes = {}
+    for chain in build_chains(items):
+        xs = [positions[image_id][0] for image_id, _ in chain]
+        assert len(set(xs)) == 1  # A stack keeps its parts in one column
+        top = positions[chain[0][0]][1]
+        for image_id, offset in chain:
+            assert positions[image_id][1] == top + offset
+        width = max(w for i, w, _, _ in items if i in dict(chain))
+        height = max(offset + 300 for _, offset in chain)
+        boxes[chain[0][0]] = (xs[0], top, xs[0] + width, top + height)
+
+    rects = list(boxes.values())
+    assert min(r[0] for r in rects) == 0 and min(r[1] for r in rects) == 0
+    for i, a in enumerate(rects):
+        for b in rects[i + 1 :]:
+            apart_x = a[2] + 20 <= b[0] or b[2] + 20 <= a[0]
+            apart_y = a[3] + 20 <= b[1] or b[3] + 20 <= a[1]
+            assert apart_x or apart_y
+
+    # Roughly square rather than one long row
+    width = max(r[2] for r in rects)
+    height = max(r[3] for r in rects)
+    assert width < 3 * height and height < 3 * width
+
+
+def test_nothing_to_arrange():
+    assert arrange([]) == {}
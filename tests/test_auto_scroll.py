@@ -0,0 +1,110 @@
+import numpy as np
+
+from core.capture_backend import CaptureBackend
+from core.events import CancelToken
+from core.frame_store import FrameStore
+from core.panorama import PanoramaStitcher
+from core.pipeline import CapturePipeline
+from core.screenshot_auto import (
+    AdaptiveScheduler,
+    AutoCaptureSettings,
+    start_auto_scroll_screenshot,
+)
+from tests.conftest import blocky_image
+
+
+def test_idle_polling_backs_off_to_the_cap():
+    settings = AutoCaptureSettings(max_fps=20, max_idle_interval=0.4)
+    scheduler = AdaptiveScheduler(settings)
+    intervals = []
+    for step in range(6):
+        assert not scheduler.update(False, step * 0.1)
+        intervals.append(scheduler.interval)
+    assert intervals == [0.1, 0.2, 0.4, 0.4, 0.4, 0.4]
+
+
+def test_motion_polls_fast_until_settled():
+    settings = AutoCaptureSettings(max_fps=20, max_idle_interval=0.4, settle_time=0.15)
+    scheduler = AdaptiveScheduler(settings)
+    scheduler.update(False, 0.0)
+    scheduler.update(False, 0.1)
+
+    assert not scheduler.update(True, 1.0)
+    assert scheduler.interval == 0.05 and scheduler.pending
+    assert not scheduler.update(True, 1.05)
+    # Still, but not for settle_time yet
+    assert not scheduler.update(False, 1.1)
+    assert scheduler.interval == 0.05
+    # Settled exactly once, then back to idle backoff
+    assert scheduler.update(False, 1.25)
+    assert not scheduler.pending
+    assert not scheduler.update(False, 1.3)
+    assert scheduler.interval == 0.1
+
+
+def test_new_motion_restarts_the_settle_wait():
+    settings = AutoCaptureSettings(max_fps=10, settle_time=0.3)
+    scheduler = AdaptiveScheduler(settings)
+    scheduler.update(True, 0.0)
+    assert not scheduler.update(False, 0.2)
+    scheduler.update(True, 0.25)
+    assert not scheduler.update(False, 0.5)
+    assert scheduler.update(False, 0.55)
+
+
+class PanningBackend(CaptureBackend):
+    # A view that pans sideways by `step` pixels per grab, as a person
+    # dragging a wide sheet would, then holds still at the right edge and
+    # ends the session a few grabs later
+    def __init__(self, document, width, step, token):
+        self.document = document
+        self.width = width
+        self.step = step
+        self.token = token
+        self.left = 0
+        self.still = 0
+        self.grab_count = 0
+
+    def grab(self, region):
+        self.grab_count += 1
+        frame = self.document[:, self.left : self.left + self.width].copy()
+        end = self.document.shape[1] - self.width
+        if self.left == end:
+            self.still += 1
+            if self.still == 20:
+                self.token.cancel()
+        self.left = min(self.left + self.step, end)
+        return frame
+
+
+def test_sideways_panning_is_throttled_like_scrolling(dispatcher):
+    document = blocky_image(300, 2400, seed=4)
+    stitcher = PanoramaStitcher()
+    frames = FrameStore()
+    pipeline = CapturePipeline(dispatcher, stitcher, frames, lambda *args: None)
+    token = CancelToken()
+    backend = PanningBackend(document, 400, 40, token)
+    settings = AutoCaptureSettings(max_fps=500, settle_time=0.01)
+    try:
+        start_auto_scroll_screenshot(
+            dispatcher,
+            (0, 0, 400, 300),
+            pipeline,
+            backend,
+            settings,
+            on_done=lambda: None,
+            token=token,
+        )
+        assert token.join(30)
+        pipeline.drain()
+    finally:
+        pipeline.close()
+
+    # A keyframe every max_shift of the width, not one per moving grab
+    assert backend.grab_count > 60
+    assert len(stitcher) <= 12
+    xs = [x for x, _ in stitcher.positions()]
+    # Submitted on the first grab past half the width
+    assert all(0 < b - a <= 200 + 40 for a, b in zip(xs, xs[1:]))
+    assert np.array_equal(stitcher.result(), document)
+    frames.close()
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from core import compositor
+from core.compositor import composite
+
+
+def random_layers(seed, alpha):
+    # Overlapping layers taller than a band, some partly transparent, at
+    # negative and positive offsets
+    rng = np.random.default_rng(seed)
+    layers = []
+    for i in range(4):
+        channels = 4 if alpha and i % 2 else 3
+        pixels = rng.integers(0, 256, (300 + 40 * i, 120 + 30 * i, channels))
+        layers.append((pixels.astype(np.uint8), 70 * i - 50, 90 * i - 30))
+    return layers
+
+
+def reference(layers, background, blend):
+    # Pixel by pixel over the layers' bounding box, in RGB
+    x0 = min(x for _, x, _ in layers)
+    y0 = min(y for _, _, y in layers)
+    x1 = max(x + p.shape[1] for p, x, _ in layers)
+    y1 = max(y + p.shape[0] for p, _, y in layers)
+    out = np.empty((y1 - y0, x1 - x0, 3), np.float64)
+    out[...] = background
+    accum = np.zeros(out.shape)
+    weight = np.zeros(out.shape[:2] + (1,))
+    for pixels, x, y in layers:
+        area = (
+            slice(y - y0, y - y0 + pixels.shape[0]),
+            slice(x - x0, x - x0 + pixels.shape[1]),
+        )
+        alpha = pixels[..., 3:4] / 255.0 if pixels.shape[2] == 4 else 1.0
+        src = pixels[..., :3].astype(np.float64)
+        if blend == "average":
+            accum[area] += src * alpha
+            weight[area] += alpha
+        else:
+            out[area] = np.floor(src * alpha + out[area] * (1 - alpha) + 0.5)
+    if blend == "average":
+        covered = weight[..., 0] > 0
+        out[covered] = np.floor(accum[covered] / weight[covered] + 0.5)
+    return out.astype(np.uint8)[..., ::-1]  # BGR, like the compositor
+
+
+@pytest.mark.parametrize("blend", ["replace", "average"])
+@pytest.mark.parametrize("alpha", [False, True])
+def test_matches_a_pixel_by_pixel_composite(monkeypatch, blend, alpha):
+    monkeypatch.setattr(compositor, "BAND_ROWS", 64)  # Many bands
+    layers = random_layers(1, alpha)
+    background = (10, 20, 30)
+    expected = reference(layers, background, blend)
+
+    result = composite(layers, background=background, blend=blend, workers=4)
+    assert result.shape == expected.shape
+    # Alpha blending rounds in float32 here
+    assert np.abs(result.astype(int) - expected).max() <= 1
+    serial = composite(layers, background=background, blend=blend, workers=1)
+    assert np.array_equal(result, serial)
+
+
+def test_background_shows_where_no_layer_is():
+    red = np.zeros((10, 10, 3), np.uint8)
+    red[...] = (255, 0, 0)
+    result = composite([(red, 0, 0), (red, 20, 0)], background=(0, 0, 255))
+    assert result.shape == (10, 30, 3)
+    assert (result[:, :10] == (0, 0, 255)).all()  # Red, in BGR
+    assert (result[:, 10:20] == (255, 0, 0)).all()  # Blue background
+
+
+def test_scale_and_grayscale_layers():
+    gray = np.repeat(np.repeat(np.array([[0, 200], [100, 50]], np.uint8), 8, 0), 8, 1)
+    result = composite([(gray, 16, 32)], scale=0.5)
+    assert result.shape == (8, 8, 3)
+    assert (result[:4, :4] == 0).all() and (result[:4, 4:] == 200).all()
+    assert (result[4:, :4] == 100).all() and (result[4:, 4:] == 50).all()
+
+
+def test_no_layers():
+    assert composite([]) is None
@@ -0,0 +1,88 @@
+import numpy as np
+
+from core import dedupe
+from core.dedupe import DuplicateIndex, dhash, hamming
+from core.frame_signature import compute_signature
+from tests.conftest import text_page
+
+
+def noisy(frame, seed):
+    # The same view again, as a re-encoded or re-rendered grab would be
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(-3, 4, frame.shape)
+    return (frame.astype(int) + noise).clip(0, 255).astype(np.uint8)
+
+
+def test_hamming_and_dhash():
+    assert hamming(0b1011, 0b0110) == 3
+    frame = text_page(400, 400, seed=1)
+    assert hamming(dhash(compute_signature(frame).thumb), 0) > 0
+    assert dhash(compute_signature(frame).thumb) == dhash(
+        compute_signature(noisy(frame, 0)).thumb
+    )
+
+
+def test_near_duplicates_are_found_among_older_frames():
+    page = text_page(2400, 400, seed=2)
+    index = DuplicateIndex()
+    for i, top in enumerate(range(0, 2000, 300)):
+        index.add(i, compute_signature(page[top : top + 400]))
+
+    # The newest frame, then one from several frames back
+    assert index.find(compute_signature(noisy(page[1800:2200], 1))) == 6
+    assert index.find(compute_signature(noisy(page[600:1000], 2))) == 2
+
+
+def test_distinct_dense_text_frames_are_kept():
+    page = text_page(4000, 400, seed=3)
+    index = DuplicateIndex()
+    # Scrolled by as little as one text line each time
+    for i, top in enumerate(range(0, 3600, 24)):
+        signature = compute_signature(page[top : top + 400])
+        assert index.find(signature) is None
+        index.add(i, signature)
+    assert len(index) == 150
+    # Other pages of dense text never match either
+    for seed in range(4, 12):
+        assert index.find(compute_signature(text_page(400, 400, seed=seed))) is None
+
+
+def test_hash_distance_limit_is_inclusive(monkeypatch):
+    # Identical thumbnails, with hashes forced to differ by chosen bits; only
+    # hashes within max_distance are ever compared
+    frame = text_page(400, 400, seed=5)
+    hashes = {}
+    monkeypatch.setattr(dedupe, "dhash", lambda thumb: hashes[id(thumb)])
+
+    def signature(value):
+        result = compute_signature(frame)
+        hashes[id(result.thumb)] = value
+        return result
+
+    index = DuplicateIndex(max_distance=6)
+    base = 0x0123456789ABCDEF
+    index.add(0, signature(base))
+    # A different newest frame, so lookups go through the hash tables
+    other = compute_signature(text_page(400, 400, seed=6))
+    hashes[id(other.thumb)] = ~base & (2**64 - 1)
+    index.add(1, other)
+
+    spread = [1 << bit for bit in range(0, 64, 9)]  # One flip per chunk
+    assert index.find(signature(base ^ sum(spread[:6]))) == 0
+    assert index.find(signature(base ^ sum(spread[:7]))) is None
+    # Seven flips in one chunk still share the others, and are rejected on
+    # distance alone
+    assert index.find(signature(base ^ 0b1111111)) is None
+
+
+def test_removed_frames_are_not_found():
+    page = text_page(1200, 400, seed=7)
+    first, second = compute_signature(page[:400]), compute_signature(page[600:1000])
+    index = DuplicateIndex()
+    index.add(0, first)
+    index.add(1, second)
+    index.remove(1)
+    assert index.find(second) is None
+    assert index.find(first) == 0
+    index.clear()
+    assert len(index) == 0 and index.find(first) is None
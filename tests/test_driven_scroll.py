@@ -0,0 +1,79 @@
+import threading
+
+import numpy as np
+import pytest
+
+from core.capture_backend import FakeCaptureBackend
+from core.frame_store import FrameStore
+from core.pipeline import CapturePipeline
+from core.screenshot_auto import AutoCaptureSettings, start_driven_scroll_screenshot
+from core.stitcher import VerticalStitcher
+from tests.conftest import text_page
+
+REGION = (0, 100, 400, 500)
+
+
+def run_driven(dispatcher, backend, settings, timeout=30):
+    stitcher = VerticalStitcher()
+    frames = FrameStore()
+    pipeline = CapturePipeline(dispatcher, stitcher, frames, lambda *args: None)
+    done = threading.Event()
+    try:
+        token = start_driven_scroll_screenshot(
+            dispatcher, REGION, pipeline, backend, settings, on_done=done.set
+        )
+        assert done.wait(timeout), "driven scroll did not reach the end"
+        assert token.join(0)
+        pipeline.drain()
+    finally:
+        pipeline.close()
+    result = stitcher.result()
+    frames.close()
+    return result
+
+
+@pytest.mark.parametrize(
+    "mode, wheel_step, smooth_grabs",
+    [("wheel", 37, 0), ("wheel", 23, 3), ("page", 40, 0)],
+)
+def test_driven_scroll_captures_the_whole_page(
+    dispatcher, mode, wheel_step, smooth_grabs
+):
+    page = text_page(4000, 400, seed=7)
+    backend = FakeCaptureBackend(page, wheel_step=wheel_step, smooth_grabs=smooth_grabs)
+    settings = AutoCaptureSettings(max_fps=500, settle_time=0.01, scroll_mode=mode)
+    result = run_driven(dispatcher, backend, settings)
+
+    # From the region's top down to the end of the page, exactly
+    assert result.shape == (4000 - REGION[1], 400, 3)
+    assert np.array_equal(result, page[REGION[1] :])
+    # PageDown only reaches the page once it has focus
+    assert backend.focused == (REGION if mode == "page" else None)
+
+
+def test_overshooting_steps_are_undone_and_halved(dispatcher):
+    # Each click scrolls more than the region, so the first step overshoots
+    page = text_page(3000, 400, seed=8)
+    backend = FakeCaptureBackend(page, wheel_step=200)
+    settings = AutoCaptureSettings(
+        max_fps=500, settle_time=0.01, initial_clicks=4, target_overlap=0.5
+    )
+    result = run_driven(dispatcher, backend, settings)
+    assert np.array_equal(result, page[REGION[1] :])
+
+
+def test_cancel_stops_the_loop(dispatcher):
+    page = text_page(100_000, 400, seed=9)
+    backend = FakeCaptureBackend(page, wheel_step=10)
+    stitcher = VerticalStitcher()
+    frames = FrameStore()
+    pipeline = CapturePipeline(dispatcher, stitcher, frames, lambda *args: None)
+    settings = AutoCaptureSettings(max_fps=500, settle_time=0.01, max_clicks=1)
+    token = start_driven_scroll_screenshot(
+        dispatcher, REGION, pipeline, backend, settings, on_done=lambda: None
+    )
+    token.cancel()
+    assert token.join(5)
+    pipeline.close()
+    frames.close()
+    assert backend.scroll_y < 100_000 - 500
@@ -0,0 +1,106 @@
+import threading
+import time
+
+from core.events import CancelToken, EventBus, event_bus
+from tests.conftest import ImmediateDispatcher
+
+
+class FakeRoot:
+    # Records root.after calls; tick() runs the ones that are due, like one
+    # pass of the Tk main loop
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, func, *args):
+        self.scheduled.append((ms, func, args))
+
+    def tick(self):
+        due, self.scheduled = self.scheduled, []
+        for _, func, args in due:
+            func(*args)
+
+
+def test_posts_from_threads_run_in_order_on_the_drain():
+    root = FakeRoot()
+    bus = EventBus(root, interval_ms=5)
+    seen = []
+    threads = [
+        threading.Thread(
+            target=lambda n=n: [bus.post(seen.append, (n, i)) for i in range(100)]
+        )
+        for n in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert seen == []  # Nothing runs off the Tk thread
+
+    root.tick()
+    assert len(seen) == 400
+    for n in range(4):
+        assert [i for m, i in seen if m == n] == list(range(100))
+    assert [ms for ms, _, _ in root.scheduled] == [5]  # Next drain
+
+
+def test_each_drain_runs_only_what_was_queued():
+    root = FakeRoot()
+    bus = EventBus(root)
+    seen = []
+
+    def producer(n):
+        seen.append(n)
+        bus.post(producer, n + 1)  # Keeps the queue busy forever
+
+    bus.post(producer, 0)
+    root.tick()
+    root.tick()
+    assert seen == [0, 1]
+
+
+def test_delayed_callbacks_and_errors(capsys):
+    root = FakeRoot()
+    bus = EventBus(root)
+    seen = []
+    bus.after(250, seen.append, "later")
+    bus.post(lambda: 1 / 0)
+    bus.after(0, seen.append, "now")
+    root.tick()
+    # The error is reported and the rest still runs
+    assert seen == ["now"]
+    assert "ZeroDivisionError" in capsys.readouterr().err
+    assert sorted(ms for ms, _, _ in root.scheduled) == [16, 250]
+
+    bus.close()
+    root.tick()
+    assert seen == ["now", "later"]
+    root.tick()
+    assert root.scheduled == []  # Closed: no more drains
+
+
+def test_event_bus_passes_non_widgets_through():
+    dispatcher = ImmediateDispatcher()
+    assert event_bus(dispatcher) is dispatcher
+
+
+def test_cancel_wakes_a_sleeping_loop():
+    token = CancelToken()
+    assert not token.sleep(0.01) and not token.cancelled
+    assert not token.sleep(-1)
+
+    woke = []
+
+    def loop():
+        start = time.monotonic()
+        woke.append(token.sleep(30))
+        woke.append(time.monotonic() - start)
+        token.finish()
+
+    thread = threading.Thread(target=loop)
+    thread.start()
+    assert not token.join(0.05)
+    token.cancel()
+    assert token.join(5)
+    thread.join()
+    assert token.cancelled
+    assert woke[0] is True and woke[1] < 5
@@ -0,0 +1,104 @@
+import os
+import time
+
+import numpy as np
+
+from core.frame_store import (
+    JOURNAL_DATA,
+    JOURNAL_INDEX,
+    FrameStore,
+    is_journal,
+    new_session_dir,
+    prune_sessions,
+)
+
+
+def frame(value, height=20):
+    return np.full((height, 30, 3), value, np.uint8)
+
+
+def test_spills_old_frames_and_reads_them_back(tmp_path):
+    store = FrameStore(max_in_memory=2, spill_dir=tmp_path)
+    for value in range(5):
+        store.append(frame(value))
+    assert store.nbytes_in_memory() == 2 * frame(0).nbytes
+    assert [int(f[0, 0, 0]) for f in store] == [0, 1, 2, 3, 4]
+    assert store.pop()
+    store.append(frame(9))
+    assert [int(f[0, 0, 0]) for f in store] == [0, 1, 2, 3, 9]
+    store.close()
+
+
+def test_journal_replays_appends_and_pops(tmp_path):
+    directory = str(tmp_path / "session")
+    store = FrameStore(max_in_memory=1, journal_dir=directory, meta={"layout": "x"})
+    for value in range(4):
+        store.append(frame(value, height=10 + value))
+    store.pop()
+    store.append(frame(7))
+    store.close()
+
+    assert is_journal(directory)
+    reopened = FrameStore(journal_dir=directory)
+    assert reopened.meta == {"layout": "x"}
+    assert [int(f[0, 0, 0]) for f in reopened] == [0, 1, 2, 7]
+    assert [f.shape[0] for f in reopened] == [10, 11, 12, 20]
+
+    # Appending after a reopen continues the same journal
+    reopened.append(frame(8))
+    reopened.close()
+    again = FrameStore(journal_dir=directory)
+    assert [int(f[0, 0, 0]) for f in again] == [0, 1, 2, 7, 8]
+    again.close()
+
+
+def test_journal_replay_stops_at_a_torn_tail(tmp_path):
+    directory = str(tmp_path / "session")
+    store = FrameStore(journal_dir=directory)
+    for value in range(3):
+        store.append(frame(value))
+    store.close()
+
+    # A crash mid-write: half a record, and a record past the data's end
+    with open(os.path.join(directory, JOURNAL_INDEX), "a") as f:
+        f.write('{"offset": 999999, "shape": [20, 30, 3], "dtype": "|u1"}\n')
+        f.write('{"offset": 18')
+    reopened = FrameStore(journal_dir=directory)
+    assert len(reopened) == 3
+    reopened.close()
+
+    # The rewritten index is compacted and clean again
+    with open(os.path.join(directory, JOURNAL_INDEX)) as f:
+        assert len(f.readlines()) == 3
+
+
+def test_discard_removes_the_journal(tmp_path):
+    directory = str(tmp_path / "session")
+    store = FrameStore(journal_dir=directory)
+    store.append(frame(1))
+    assert os.path.exists(os.path.join(directory, JOURNAL_DATA))
+    store.discard()
+    assert not os.path.exists(directory)
+
+
+def test_sessions_started_together_get_their_own_journal(tmp_path, monkeypatch):
+    monkeypatch.setenv("SCREENSHOT_SESSIONS", str(tmp_path / "sessions"))
+    directories = {new_session_dir() for _ in range(5)}
+    assert len(directories) == 5
+    assert all(os.path.isdir(directory) for directory in directories)
+
+
+def test_prune_removes_only_stale_sessions(tmp_path, monkeypatch):
+    monkeypatch.setenv("SCREENSHOT_SESSIONS", str(tmp_path / "sessions"))
+    assert prune_sessions() == []  # No sessions yet
+    stale, fresh, empty = new_session_dir(), new_session_dir(), new_session_dir()
+    for directory in (stale, fresh):
+        store = FrameStore(journal_dir=directory)
+        store.append(frame(1))
+        store.close()
+    week_ago = time.time() - 8 * 24 * 3600
+    os.utime(os.path.join(stale, JOURNAL_INDEX), (week_ago, week_ago))
+    os.utime(empty, (week_ago, week_ago))
+
+    assert sorted(prune_sessions()) == sorted([stale, empty])
+    assert os.listdir(tmp_path / "sessions") == [os.path.basename(fresh)]
@@ -0,0 +1,83 @@
+import numpy as np
+
+from core.layout import ImageLayout
+
+
+def brute_query(rects, x0, y0, x1, y1):
+    return {
+        i
+        for i, (x, y, w, h) in rects.items()
+        if x < x1 and x + w > x0 and y < y1 and y + h > y0
+    }
+
+
+def brute_hit(rects, order, x, y):
+    hits = [i for i in order if rects[i][0] <= x < rects[i][0] + rects[i][2]]
+    hits = [i for i in hits if rects[i][1] <= y < rects[i][1] + rects[i][3]]
+    return hits[-1] if hits else None
+
+
+def test_grid_agrees_with_a_linear_scan():
+    # Past the initial capacity, with removals, moves and raises on the way
+    rng = np.random.default_rng(0)
+    layout = ImageLayout(cell_size=256, capacity=4)
+    rects, order = {}, []
+    for image_id in range(60):
+        x, y = rng.integers(-2000, 2000, 2)
+        w, h = rng.integers(10, 900, 2)
+        layout.add(image_id, x, y, w, h)
+        rects[image_id] = (x, y, w, h)
+        order.append(image_id)
+    for image_id in range(0, 60, 7):
+        layout.remove(image_id)
+        del rects[image_id]
+        order.remove(image_id)
+    for image_id in range(1, 60, 5):
+        if image_id not in rects:
+            continue
+        x, y = rng.integers(-2000, 2000, 2)
+        layout.move(image_id, x, y)
+        rects[image_id] = (x, y) + rects[image_id][2:]
+    for image_id in (3, 4, 33):
+        layout.raise_to_top(image_id)
+        order.remove(image_id)
+        order.append(image_id)
+
+    assert len(layout) == len(rects)
+    assert 0 not in layout and 1 in layout
+    assert layout.ordered() == order
+    assert layout.ordered([33, 2, 3]) == [2, 3, 33]
+    for image_id, rect in rects.items():
+        assert layout.rect(image_id) == tuple(float(v) for v in rect)
+
+    for _ in range(200):
+        x0, y0 = rng.integers(-2500, 2500, 2)
+        w, h = rng.integers(1, 1500, 2)
+        box = (x0, y0, x0 + w, y0 + h)
+        assert set(layout.query(*box)) == brute_query(rects, *box)
+        assert layout.hit_test(x0, y0) == brute_hit(rects, order, x0, y0)
+
+    xs = [r[0] for r in rects.values()]
+    ys = [r[1] for r in rects.values()]
+    x2s = [r[0] + r[2] for r in rects.values()]
+    y2s = [r[1] + r[3] for r in rects.values()]
+    assert layout.bounds() == (min(xs), min(ys), max(x2s), max(y2s))
+
+
+def test_snap_lines_up_nearby_edges_only():
+    layout = ImageLayout()
+    layout.add(1, 0, 0, 100, 100)
+    layout.add(2, 500, 500, 50, 50)
+    # Left edge 6 px right of image 1's right edge; top 3 px below its top
+    assert layout.snap(2, 106, 3, threshold=8) == (100.0, 0.0)
+    # Right edge meeting image 1's left edge
+    assert layout.snap(2, -54, 40, threshold=8) == (-50.0, 40.0)
+    # Too far away to snap
+    assert layout.snap(2, 120, 20, threshold=8) == (120, 20)
+
+
+def test_empty_layout():
+    layout = ImageLayout()
+    assert layout.bounds() is None
+    assert layout.query(0, 0, 100, 100) == []
+    assert layout.hit_test(5, 5) is None
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from core.panorama import (
+    PanoramaStitcher,
+    TileCanvas,
+    build_pyramid,
+    find_offset_2d,
+    stitch_panorama,
+)
+from tests.conftest import blocky_image, text_page
+
+
+@pytest.mark.parametrize("dx, dy", [(0, 0), (150, 0), (-90, 0), (0, 210), (123, -77)])
+def test_find_offset_2d(dx, dy):
+    image = blocky_image(1200, 1400)
+    x0, y0 = 500, 400
+    prev = image[y0 : y0 + 480, x0 : x0 + 640]
+    curr = image[y0 + dy : y0 + dy + 480, x0 + dx : x0 + dx + 640]
+    assert find_offset_2d(build_pyramid(prev), build_pyramid(curr)) == (dx, dy)
+
+
+def test_find_offset_2d_rejects_unrelated_frames():
+    prev = blocky_image(480, 640, seed=1)
+    curr = blocky_image(480, 640, seed=2)
+    assert find_offset_2d(build_pyramid(prev), build_pyramid(curr)) is None
+
+
+def test_grid_capture_rebuilds_the_image():
+    # Row by row, left to right: each row starts under the previous row
+    image = blocky_image(1000, 1600, seed=3)
+    height, width = 400, 600
+    tops = [0, 300, 600]
+    lefts = [0, 500, 1000]
+    frames = [image[y : y + height, x : x + width] for y in tops for x in lefts]
+    result = stitch_panorama(frames)
+    assert result.shape == (1000, 1600, 3)
+    assert np.array_equal(result, image[:1000, :1600])
+
+
+def test_sideways_scroll_and_positions():
+    page = np.ascontiguousarray(text_page(2000, 300, seed=5).transpose(1, 0, 2))
+    stitcher = PanoramaStitcher()
+    for left in range(0, 1400, 350):
+        stitcher.add(page[:, left : left + 600])
+    assert stitcher.positions() == [(x, 0) for x in range(0, 1400, 350)]
+    assert np.array_equal(stitcher.result(), page[:, :1650])
+
+
+def test_image_reads_the_canvas_in_windows():
+    image = blocky_image(900, 1300, seed=7)
+    stitcher = PanoramaStitcher()
+    stitcher.add(image[:600, :800])
+    stitcher.add(image[300:900, 500:1300])
+    view = stitcher.image()
+    assert view.shape == (900, 1300, 3) and view.dtype == np.uint8
+    assert np.array_equal(view[100:700, 200:1200], stitcher.result()[100:700, 200:1200])
+    assert np.array_equal(view[850:], stitcher.result()[850:])
+    # Nothing was pasted in the top right corner's tiles
+    assert view[:64, 1280:].max() == 0
+    assert PanoramaStitcher().image() is None
+
+
+def test_pop_restores_the_canvas():
+    image = blocky_image(600, 1500, seed=6)
+    stitcher = PanoramaStitcher()
+    stitcher.add(image[:, :600])
+    stitcher.add(image[:, 400:1000])
+    before = stitcher.result().copy()
+    stitcher.add(image[:, 800:1400])
+    assert stitcher.pop()
+    assert np.array_equal(stitcher.result(), before)
+    assert len(stitcher) == 2
+
+
+def test_tile_canvas_is_sparse_and_keeps_the_first_frame():
+    canvas = TileCanvas(tile_size=64)
+    first = np.full((100, 100, 3), 10, np.uint8)
+    second = np.full((100, 100, 3), 20, np.uint8)
+    canvas.paste(first, 0, 0)
+    fresh = canvas.paste(second, 50, 50)
+    canvas.paste(first, 10_000, 10_000)
+
+    assert canvas.read(50, 50, 100, 100).max() == 10
+    assert canvas.read(100, 100, 150, 150).min() == 20
+    assert fresh.sum() == 100 * 100 - 50 * 50
+    # Far-apart frames only allocate the tiles they touch
+    assert len(canvas) <= 4 + 5 + 4
+
+    canvas.erase(50, 50, fresh)
+    assert canvas.bounds() == (0, 0, 10_100, 10_100)
+    assert canvas.read(100, 100, 150, 150).max() == 0  # Uncovered again
@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+from core import panorama
+from core import pipeline as pipeline_module
+from core import stitcher as stitcher_module
+from core.frame_signature import FrameSignature
+from core.frame_store import FrameStore
+from core.panorama import create_stitcher
+from core.pipeline import CapturePipeline
+from core.stitcher import VerticalStitcher
+from tests.conftest import blocky_image, text_page
+
+
+class FailingStore(FrameStore):
+    # Refuses the append numbered `fail_at`
+    def __init__(self, fail_at):
+        super().__init__()
+        self.fail_at = fail_at
+        self.calls = 0
+
+    def append(self, frame, details=None):
+        self.calls += 1
+        if self.calls == self.fail_at:
+            raise OSError("disk full")
+        return super().append(frame, details)
+
+
+class FailingStitcher(VerticalStitcher):
+    def __init__(self, fail_at):
+        super().__init__()
+        self.fail_at = fail_at
+        self.calls = 0
+
+    def add(self, frame, hashes=None):
+        self.calls += 1
+        if self.calls == self.fail_at:
+            raise ValueError("bad frame")
+        return super().add(frame, hashes)
+
+
+@pytest.mark.parametrize("failing", ["store", "stitcher"])
+def test_a_failed_frame_leaves_store_and_stitcher_in_step(dispatcher, capsys, failing):
+    page = text_page(1600, 200)
+    store = FailingStore(3) if failing == "store" else FailingStore(0)
+    stitcher = FailingStitcher(3) if failing == "stitcher" else FailingStitcher(0)
+    pipeline = CapturePipeline(dispatcher, stitcher, store, lambda *args: None)
+    tops = range(0, 1000, 200)
+    try:
+        for top in tops:
+            pipeline.submit(page[top : top + 400])
+        pipeline.drain()
+        assert capsys.readouterr().err  # The failure was reported
+        assert len(stitcher) == len(store) == 4
+
+        # Undo drops the same frame from both
+        assert pipeline.undo()
+        assert len(stitcher) == len(store) == 3
+        assert (store.get(2) == page[600:1000]).all()
+    finally:
+        pipeline.close()
+        store.close()
+
+
+def capture(dispatcher, stitcher, store, frames, signatures=None, placements=()):
+    pipeline = CapturePipeline(dispatcher, stitcher, store, lambda *args: None)
+    try:
+        if signatures is not None:
+            pipeline.restore(signatures, placements)
+        for frame in frames:
+            pipeline.submit(frame)
+        pipeline.drain()
+    finally:
+        pipeline.close()
+
+
+@pytest.mark.parametrize("layout", ["vertical", "panorama"])
+def test_resume_replays_the_journal_without_matching(
+    dispatcher, tmp_path, monkeypatch, layout
+):
+    if layout == "vertical":
+        image = text_page(2000, 240, seed=8)
+        frames = [image[top : top + 400] for top in range(0, 1601, 200)]
+    else:
+        image = blocky_image(480, 2400, seed=8)
+        frames = [image[:, left : left + 640] for left in range(0, 1761, 352)]
+    directory = str(tmp_path / "session")
+
+    # A session, with an undo, then closed without saving
+    store = FrameStore(journal_dir=directory)
+    stitcher = create_stitcher(layout)
+    capture(dispatcher, stitcher, store, frames[:6])
+    assert stitcher.pop() and store.pop()
+    expected = np.asarray(stitcher.image()).copy()
+    store.close()
+
+    # Reopened: nothing is hashed, searched or re-signed
+    store = FrameStore(journal_dir=directory)
+    details = store.take_details()
+    assert len(details) == 5
+    signatures = {
+        index: FrameSignature.from_dict(entry["signature"])
+        for index, entry in enumerate(details)
+    }
+    placements = [entry["placement"] for entry in details]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("resume recomputed what the journal holds")
+
+    stitcher = create_stitcher(layout)
+    with monkeypatch.context() as patch:
+        patch.setattr(stitcher_module, "band_hashes", fail)
+        patch.setattr(panorama, "build_pyramid", fail)
+        patch.setattr(pipeline_module, "compute_signature", fail)
+        capture(dispatcher, stitcher, store, [], signatures, placements)
+    assert np.array_equal(np.asarray(stitcher.image()), expected)
+
+    # Capture carries on from the rebuilt state
+    capture(dispatcher, stitcher, store, frames[5:])
+    store.close()
+    assert len(stitcher) == len(frames)
+    assert np.array_equal(np.asarray(stitcher.image()), image)
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+from core import screen_geometry
+from core.capture_backend import CaptureBackend
+from core.screen_geometry import Monitor, ScreenGeometry
+
+# A wide monitor with a shorter one to its right: the bounding box of the
+# desktop has a gap under the second monitor
+LAYOUT = [
+    Monitor("left", (0, 0, 1920, 1080), primary=True),
+    Monitor("right", (1920, 0, 3200, 720)),
+]
+
+
+class RecordingBackend(CaptureBackend):
+    # The whole desktop is white; remembers what was read
+    def __init__(self):
+        self.reads = []
+
+    def _grab_visible(self, region):
+        self.reads.append(region)
+        x1, y1, x2, y2 = region
+        return np.full((y2 - y1, x2 - x1, 3), 255, np.uint8)
+
+
+@pytest.fixture
+def geometry(monkeypatch):
+    geometry = ScreenGeometry(enumerate=lambda: LAYOUT, key=lambda: None)
+    monkeypatch.setattr(screen_geometry, "_default_geometry", geometry)
+    return geometry
+
+
+def test_clip_keeps_every_monitor(geometry):
+    assert geometry.clip((1800, 500, 2100, 900)) == (1800, 500, 2100, 900)
+    assert geometry.clip((3000, -50, 3400, 100)) == (3000, 0, 3200, 100)
+    assert geometry.clip((4000, 0, 4100, 100)) is None
+    assert geometry.visible_parts((1800, 500, 2100, 900)) == [
+        (1800, 500, 1920, 900),
+        (1920, 500, 2100, 720),
+    ]
+
+
+def test_grab_within_one_monitor_reads_it_directly(geometry):
+    backend = RecordingBackend()
+    frame = backend.grab((100, 100, 500, 400))
+    assert backend.reads == [(100, 100, 500, 400)]
+    assert frame.shape == (300, 400, 3) and frame.min() == 255
+
+
+def test_grab_across_monitors_blacks_out_only_the_gap(geometry):
+    backend = RecordingBackend()
+    frame = backend.grab((1800, 500, 2100, 1200))
+    # One read of the visible box, spanning both monitors
+    assert backend.reads == [(1800, 500, 2100, 1080)]
+    assert frame.shape == (700, 300, 3)
+    assert frame[:580, :120].min() == 255  # Left monitor
+    assert frame[:220, 120:].min() == 255  # Right monitor
+    assert frame[220:, 120:].max() == 0  # Below the right monitor
+    assert frame[580:].max() == 0  # Below the desktop
+
+
+def test_grab_off_screen_is_black(geometry):
+    backend = RecordingBackend()
+    assert backend.grab((5000, 0, 5100, 50)).max() == 0
+    assert backend.reads == []
+
+
+# A 2x laptop screen and a 1.5x external one to its right. Physically there
+# is a 100 px gap between them that Tk coordinates don't show.
+SCALED = [
+    Monitor("laptop", (0, 0, 1280, 800), (0, 0, 2560, 1600), primary=True),
+    Monitor("external", (1280, 0, 2560, 720), (2660, 0, 4580, 1080)),
+]
+
+
+@pytest.fixture
+def scaled(monkeypatch):
+    geometry = ScreenGeometry(enumerate=lambda: SCALED, key=lambda: None)
+    monkeypatch.setattr(screen_geometry, "_default_geometry", geometry)
+    return geometry
+
+
+def test_to_physical_uses_each_monitors_scale(scaled):
+    assert [m.scale for m in SCALED] == [2.0, 1.5]
+    assert scaled.to_physical((100, 100, 500, 300)) == (200, 200, 1000, 600)
+    assert scaled.to_physical((1380, 100, 1480, 200)) == (2810, 150, 2960, 300)
+
+
+def test_to_physical_straddling_keeps_the_larger_parts_scale(scaled):
+    # 80 px on the laptop, 120 px on the external monitor
+    assert scaled.monitor_for((1200, 0, 1400, 100)).name == "external"
+    assert scaled.to_physical((1200, 0, 1400, 100)) == (2540, 0, 2840, 150)
+
+
+def test_to_physical_off_screen_and_empty_regions(scaled):
+    assert scaled.monitor_for((5000, 5000, 5100, 5100)).primary
+    assert scaled.to_physical((5000, 5000, 5100, 5100)) == (10000, 10000, 10200, 10200)
+    assert scaled.to_physical((10, 10, 10, 10)) == (20, 20, 21, 21)
+
+
+def test_visible_parts_skip_the_physical_gap(scaled):
+    assert scaled.monitor_for((2700, 0, 2800, 50), physical=True).name == "external"
+    assert scaled.visible_parts((2500, 1000, 2700, 1200)) == [
+        (2500, 1000, 2560, 1200),
+        (2660, 1000, 2700, 1080),
+    ]
+    assert scaled.visible_parts((2570, 0, 2650, 100)) == []
+
+
+def test_grab_across_the_gap_blacks_it_out(scaled):
+    backend = RecordingBackend()
+    frame = backend.grab((2500, 1000, 2700, 1200))
+    assert backend.reads == [(2500, 1000, 2700, 1200)]
+    assert frame[:, :60].min() == 255  # Laptop
+    assert frame[:, 60:160].max() == 0  # Between the monitors
+    assert frame[:80, 160:].min() == 255  # External monitor
+    assert frame[80:, 160:].max() == 0  # Below it
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from core.stitcher import VerticalStitcher, stitch_vertical
+from tests.conftest import text_page
+
+
+def frames_of(page, height, step):
+    return [page[top : top + height] for top in range(0, len(page) - height + 1, step)]
+
+
+@pytest.mark.parametrize("feather", [0, 8])
+def test_stitch_rebuilds_the_page(feather):
+    page = text_page(2400, 320)
+    result = stitch_vertical(frames_of(page, 400, 150), feather=feather)
+    assert np.array_equal(result, page[: result.shape[0]])
+    assert result.shape[0] == 400 + 150 * ((2400 - 400) // 150)
+
+
+def test_sticky_header_and_footer_appear_once():
+    page = text_page(3000, 300, seed=1)
+    header = np.full((40, 300, 3), (0, 0, 200), np.uint8)
+    footer = np.full((30, 300, 3), (200, 0, 0), np.uint8)
+
+    def frame(top):
+        return np.concatenate([header, page[top : top + 330], footer])
+
+    result = stitch_vertical([frame(top) for top in range(0, 1200, 200)])
+    assert np.array_equal(result[:40], header)
+    assert np.array_equal(result[-30:], footer)
+    body = result[40:-30]
+    assert np.array_equal(body, page[: body.shape[0]])
+
+
+@pytest.mark.parametrize("seams, feather", [(False, 0), (True, 0), (True, 6)])
+def test_pop_restores_the_previous_result(seams, feather):
+    page = text_page(2000, 256, seed=2)
+    # Slightly noisy frames, so seams and feathering change pixels
+    rng = np.random.default_rng(0)
+    frames = [
+        (f.astype(np.int16) + rng.integers(-3, 4, f.shape))
+        .clip(0, 255)
+        .astype(np.uint8)
+        for f in frames_of(page, 300, 120)
+    ]
+    stitcher = VerticalStitcher(seams=seams, feather=feather)
+    history = []
+    for frame in frames:
+        stitcher.add(frame)
+        history.append(stitcher.result().copy())
+
+    for expected in reversed(history[:-1]):
+        assert stitcher.pop()
+        assert np.array_equal(stitcher.result(), expected)
+    assert stitcher.pop()
+    assert stitcher.result() is None
+    assert not stitcher.pop()
+
+
+def test_unmatched_frame_is_appended_below():
+    first = text_page(300, 200, seed=3)
+    second = text_page(300, 200, seed=4)
+    result = stitch_vertical([first, second])
+    assert np.array_equal(result, np.concatenate([first, second]))
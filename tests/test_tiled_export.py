@@ -0,0 +1,173 @@
+import json
+import os
+import re
+import zlib
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from core import tiled_export
+from core.export import ExportOptions, encode_image
+from core.panorama import PanoramaStitcher
+from core.tiled_export import find_page_breaks
+from tests.conftest import blocky_image, text_page
+
+
+@pytest.mark.parametrize("channels", [3, 1])
+def test_tiled_tiff_round_trip(tmp_path, channels):
+    image = blocky_image(1300, 700, seed=1)
+    if channels == 1:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    path = str(tmp_path / "long.tif")
+    encode_image(image, path, ExportOptions(tile_size=256))
+
+    with Image.open(path) as tiff:
+        assert tiff.size == (700, 1300)
+        pixels = np.asarray(tiff)
+        expected = image if channels == 1 else image[..., ::-1]
+        assert np.array_equal(pixels, expected)
+
+        # Pyramid levels follow as reduced-resolution pages
+        tiff.seek(1)
+        assert tiff.size == (350, 650)
+    assert not os.path.exists(path + ".part")
+
+
+def test_strips_round_trip(tmp_path):
+    image = blocky_image(1000, 300, seed=2)
+    path = str(tmp_path / "long.json")
+    encode_image(image, path, ExportOptions(strip_height=256))
+
+    with open(path) as f:
+        manifest = json.load(f)
+    assert (manifest["width"], manifest["height"]) == (300, 1000)
+    parts = [cv2.imread(str(tmp_path / strip["file"])) for strip in manifest["strips"]]
+    assert [strip["y"] for strip in manifest["strips"]] == [0, 256, 512, 768]
+    assert np.array_equal(np.concatenate(parts), image)
+
+
+def _pdf_images(data):
+    # (width, height, pixels) of every Flate image XObject, in page order
+    images = []
+    pattern = re.compile(
+        rb"/Width (\d+) /Height (\d+) /ColorSpace /Device(\w+) .*?"
+        rb"/Length (\d+) >>\nstream\n"
+    )
+    for match in pattern.finditer(data):
+        width, height, length = (int(match.group(i)) for i in (1, 2, 4))
+        channels = 3 if match.group(3) == b"RGB" else 1
+        raw = zlib.decompress(data[match.end() : match.end() + length])
+        shape = (height, width, channels) if channels == 3 else (height, width)
+        images.append(np.frombuffer(raw, np.uint8).reshape(shape))
+    return images
+
+
+def test_paged_pdf_round_trip(tmp_path):
+    page = text_page(2600, 400, seed=3)
+    path = str(tmp_path / "long.pdf")
+    encode_image(page, path, ExportOptions(page_height=700))
+
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data.startswith(b"%PDF-1.4") and data.rstrip().endswith(b"%%EOF")
+
+    pages = _pdf_images(data)
+    assert len(pages) == 4
+    assert all(p.shape[0] <= 700 for p in pages)
+    assert np.array_equal(np.concatenate(pages), page[..., ::-1])
+
+    # The cross-reference table points at every object
+    xref = int(data.rsplit(b"startxref\n", 1)[1].split()[0])
+    offsets = re.findall(rb"(\d{10}) 00000 n", data[xref:])
+    for number, offset in enumerate(offsets, start=1):
+        assert data[int(offset) :].startswith(b"%d 0 obj" % number)
+
+
+def test_page_breaks_fall_between_lines():
+    page = text_page(3000, 400, seed=4)
+    breaks = find_page_breaks(page, 700)
+    assert breaks
+    for row in breaks:
+        # Lines are 16 rows of glyphs, then 8 blank rows
+        assert row % 24 >= 16 or row % 24 == 0
+
+
+def _panorama(image):
+    stitcher = PanoramaStitcher()
+    stitcher.add(image[:, :900])
+    stitcher.add(image[:, 636:])
+    return stitcher.image()
+
+
+def test_panorama_exports_without_a_dense_copy(tmp_path, monkeypatch):
+    # Every pyramid level stays lazy; tiles are read from the canvas
+    monkeypatch.setattr(tiled_export, "DENSE_LEVEL_BYTES", 0)
+    monkeypatch.setattr(tiled_export, "BAND_ROWS", 100)
+    image = blocky_image(1024, 1536, seed=5)
+    view = _panorama(image)
+    assert not isinstance(view, np.ndarray)
+    options = ExportOptions(tile_size=256, strip_height=300, page_height=400)
+
+    tif = str(tmp_path / "pano.tif")
+    encode_image(view, tif, options)
+    with Image.open(tif) as tiff:
+        assert np.array_equal(np.asarray(tiff), image[..., ::-1])
+        tiff.seek(1)
+        half = cv2.resize(image, (768, 512), interpolation=cv2.INTER_AREA)
+        assert np.array_equal(np.asarray(tiff), half[..., ::-1])
+
+    encode_image(view, str(tmp_path / "pano.json"), options)
+    with open(tmp_path / "pano.json") as f:
+        strips = json.load(f)["strips"]
+    parts = [cv2.imread(str(tmp_path / strip["file"])) for strip in strips]
+    assert np.array_equal(np.concatenate(parts), image)
+
+    pdf = tmp_path / "pano.pdf"
+    encode_image(view, str(pdf), options)
+    pages = _pdf_images(pdf.read_bytes())
+    assert np.array_equal(np.concatenate(pages), image[..., ::-1])
+    assert find_page_breaks(view, 400) == find_page_breaks(image, 400)
+
+    png = str(tmp_path / "pano.png")
+    encode_image(view, png, options)
+    assert np.array_equal(cv2.imread(png), image)
+
+
+@pytest.mark.parametrize("ext", [".tif", ".pdf", ".png", ".json"])
+def test_failed_export_leaves_no_part_files(tmp_path, ext):
+    def report(fraction, stage):
+        # Fails once part of the output has been written
+        if fraction:
+            raise OSError("disk full")
+
+    path = str(tmp_path / f"long{ext}")
+    with pytest.raises(OSError):
+        encode_image(blocky_image(600, 300), path, ExportOptions(), report)
+    assert os.listdir(tmp_path) == []
+
+
+def test_strips_replace_an_earlier_set(tmp_path):
+    path = str(tmp_path / "long.json")
+    encode_image(blocky_image(1000, 300), path, ExportOptions(strip_height=256))
+    encode_image(blocky_image(400, 300), path, ExportOptions(strip_height=256))
+    assert sorted(os.listdir(tmp_path / "long")) == ["00000.png", "00001.png"]
+    assert sorted(os.listdir(tmp_path)) == ["long", "long.json"]
+
+
+def test_strips_never_replace_a_foreign_directory(tmp_path):
+    (tmp_path / "long").mkdir()
+    (tmp_path / "long" / "notes.txt").write_text("keep me")
+    path = str(tmp_path / "long.json")
+    with pytest.raises(FileExistsError):
+        encode_image(blocky_image(400, 300), path, ExportOptions(strip_height=256))
+    assert (tmp_path / "long" / "notes.txt").read_text() == "keep me"
+    assert sorted(os.listdir(tmp_path)) == ["long"]
+
+    # Nor one that a manifest claims but that holds more than its strips
+    encode_image(blocky_image(400, 300), str(tmp_path / "other.json"))
+    (tmp_path / "other" / "notes.txt").write_text("keep me")
+    with pytest.raises(FileExistsError):
+        encode_image(blocky_image(400, 300), str(tmp_path / "other.json"))
+    assert (tmp_path / "other" / "notes.txt").exists()
@@ -1,8 +1,10 @@
 import tkinter as tk
-from tkinter import ttk
 
+from core.export import EXPORT_PRESETS
+from core.panorama import LAYOUTS
 from core.preview_canvas import ImagePreviewCanvas
 from core.screenshot_manager import ScreenshotManager
+from core.thumbnail_strip import ThumbnailStrip
 
 
 def start_ui():
@@ -37,23 +39,11 @@ def start_ui():
         pady=5
     )
 
-    # 🖱️ Scrollable thumbnail list
-    canvas = tk.Canvas(right_frame, bg="#1e1e1e", highlightthickness=0)
-    scrollbar = ttk.Scrollbar(right_frame, orient="vertical", command=canvas.yview)
-    thumbnail_frame = tk.Frame(canvas, bg="#1e1e1e")
-
-    thumbnail_frame.bind(
-        "<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-    )
-
-    canvas.create_window((0, 0), window=thumbnail_frame, anchor="nw")
-    canvas.configure(yscrollcommand=scrollbar.set)
-
-    canvas.pack(side="left", fill="y", expand=True)
-    scrollbar.pack(side="right", fill="y")
+    # 🖱️ Scrollable thumbnail list (only visible rows have widgets)
+    thumbnail_strip = ThumbnailStrip(right_frame)
 
     # ✅ Initialize Screenshot Manager (after all widgets are created)
-    manager = ScreenshotManager(root, preview_canvas, thumbnail_frame)
+    manager = ScreenshotManager(root, preview_canvas, thumbnail_strip)
 
     # 🔘 Button: Start Long Screenshot (calls class method)
     tk.Button(
@@ -67,6 +57,17 @@ def start_ui():
         relief=tk.FLAT,
     ).pack(side=tk.LEFT)
 
+    tk.Button(
+        button_frame,
+        text="📂 Resume Session",
+        command=manager.resume,
+        bg="#2c2c2c",
+        fg="#e0e0e0",
+        activebackground="#444444",
+        activeforeground="#e0e0e0",
+        relief=tk.FLAT,
+    ).pack(side=tk.LEFT)
+
     tk.Button(
         button_frame,
         text="🖼️ Export Canvas",
@@ -78,4 +79,51 @@ def start_ui():
         relief=tk.FLAT,
     ).pack(side=tk.LEFT)
 
+    tk.Button(
+        button_frame,
+        text="🧩 Auto Arrange",
+        command=preview_canvas.auto_arrange,
+        bg="#2c2c2c",
+        fg="#e0e0e0",
+        activebackground="#444444",
+        activeforeground="#e0e0e0",
+        relief=tk.FLAT,
+    ).pack(side=tk.LEFT)
+
+    # 💾 Save mode: trade file size for encode speed
+    def set_export_preset(name):
+        manager.export_options = EXPORT_PRESETS[name]
+        preview_canvas.export_options = EXPORT_PRESETS[name]
+
+    export_preset = tk.StringVar(value="Balanced")
+    preset_menu = tk.OptionMenu(
+        button_frame, export_preset, *EXPORT_PRESETS, command=set_export_preset
+    )
+    preset_menu.config(
+        bg="#2c2c2c",
+        fg="#e0e0e0",
+        activebackground="#444444",
+        activeforeground="#e0e0e0",
+        relief=tk.FLAT,
+        highlightthickness=0,
+    )
+    preset_menu.pack(side=tk.LEFT, padx=5)
+
+    # ↔️ Layout: vertical scrolling, or panorama for sideways and 2D content
+    def set_layout(name):
+        manager.layout = name
+
+    layout = tk.StringVar(value=manager.layout)
+    layout_menu = tk.OptionMenu(button_frame, layout, *LAYOUTS, command=set_layout)
+    layout_menu.config(
+        bg="#2c2c2c",
+        fg="#e0e0e0",
+        activebackground="#444444",
+        activeforeground="#e0e0e0",
+        relief=tk.FLAT,
+        highlightthickness=0,
+    )
+    layout_menu.pack(side=tk.LEFT, padx=5)
+
     root.mainloop()
+    manager.close()